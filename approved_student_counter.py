@@ -0,0 +1,117 @@
+# Approved-Student Counter
+# Add this to your main API file
+#
+# Batch carries its approved-student count, so fee calculations read one column
+# instead of counting batch_students. Add this column to Batch in models.py:
+#     approved_student_count = Column(Integer, nullable=False, default=0, server_default="0")
+#
+# The counter changes in the same transaction as the enrollment change:
+# record_enrollment_change (subscription_summary) calls adjust_approved_student_count
+# from /api/joining-requests/{id}/approve, /reject and /api/batches/{id}/students/{sid}
+# removal. The drift checker below recounts from batch_students every
+# APPROVED_COUNT_CHECK_INTERVAL_SECONDS, repairs any counter that drifted (e.g. rows
+# changed outside the API) and logs each correction. Its first run after adding the
+# column backfills every batch. Enable it on exactly one worker with
+# APPROVED_COUNT_CHECK_ENABLED=true.
+
+import asyncio
+import logging
+import os
+
+from structured_logging import get_logger, log_event
+
+APPROVED_COUNT_CHECK_ENABLED = os.getenv("APPROVED_COUNT_CHECK_ENABLED", "false").lower() == "true"
+APPROVED_COUNT_CHECK_INTERVAL_SECONDS = float(os.getenv("APPROVED_COUNT_CHECK_INTERVAL_SECONDS", "3600"))
+APPROVED_COUNT_CHECK_CHUNK_SIZE = int(os.getenv("APPROVED_COUNT_CHECK_CHUNK_SIZE", "500"))
+
+subscription_logger = get_logger("subscription")
+
+
+def adjust_approved_student_count(db: Session, batch_id: int, delta: int):
+    """Add delta to the batch's counter in the caller's transaction (atomic UPDATE, no read)"""
+    db.query(models.Batch).filter(models.Batch.id == batch_id).update(
+        {"approved_student_count": models.Batch.approved_student_count + delta},
+        synchronize_session=False
+    )
+
+
+def check_approved_student_counts(db: Session, repair: bool = True,
+                                  chunk_size: int = APPROVED_COUNT_CHECK_CHUNK_SIZE) -> dict:
+    """
+    Compare every Batch.approved_student_count with a recount of batch_students:
+    - Batches are walked by id; each chunk's rows are locked before recounting, so
+      approvals committing meanwhile wait instead of being overwritten
+    - repair=True writes the recounted values and refreshes the affected summaries
+    - Returns the corrections (batch_id, stored, actual)
+    """
+    checked = 0
+    corrections = []
+    after_id = 0
+
+    while True:
+        rows = db.query(models.Batch.id, models.Batch.approved_student_count).filter(
+            models.Batch.id > after_id
+        ).order_by(models.Batch.id).limit(chunk_size).with_for_update().all()
+        if not rows:
+            break
+        after_id = rows[-1].id
+        checked += len(rows)
+
+        actual_counts = get_approved_student_counts(db, [row.id for row in rows])
+        drifted = [
+            {"batch_id": row.id, "stored": row.approved_student_count, "actual": actual_counts[row.id]}
+            for row in rows if row.approved_student_count != actual_counts[row.id]
+        ]
+        corrections.extend(drifted)
+
+        if repair and drifted:
+            db.bulk_update_mappings(models.Batch, [
+                {"id": correction["batch_id"], "approved_student_count": correction["actual"]}
+                for correction in drifted
+            ])
+            bump_teacher_status_version(db, batch_ids=[correction["batch_id"] for correction in drifted])
+            for correction in drifted:
+                bump_subscription_version(db, correction["batch_id"])
+                emit_subscription_event(db, "enrollment_changed", correction["batch_id"],
+                                        {"approved_delta": correction["actual"] - (correction["stored"] or 0)})
+            db.commit()
+        else:
+            db.rollback()
+
+    return {
+        "batches_checked": checked,
+        "correction_count": len(corrections),
+        "corrections": corrections,
+        "repaired": repair
+    }
+
+
+def _check_approved_student_counts_in_new_session() -> dict:
+    db = SessionLocal()
+    try:
+        return check_approved_student_counts(db)
+    finally:
+        db.close()
+
+
+async def _approved_count_drift_checker():
+    while True:
+        try:
+            result = await asyncio.to_thread(_check_approved_student_counts_in_new_session)
+            if result["correction_count"]:
+                log_event(subscription_logger, logging.WARNING, "approved_count_drift_repaired",
+                          batches_checked=result["batches_checked"], correction_count=result["correction_count"],
+                          corrections=result["corrections"][:100])
+            else:
+                log_event(subscription_logger, logging.INFO, "approved_count_drift_checked",
+                          batches_checked=result["batches_checked"])
+        except Exception as e:
+            log_event(subscription_logger, logging.ERROR, "approved_count_drift_check_failed",
+                      exc_info=True, error=str(e))
+        await asyncio.sleep(APPROVED_COUNT_CHECK_INTERVAL_SECONDS)
+
+
+@app.on_event("startup")
+async def start_approved_count_drift_checker():
+    if APPROVED_COUNT_CHECK_ENABLED:
+        asyncio.create_task(_approved_count_drift_checker())
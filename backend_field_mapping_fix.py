@@ -1,16 +1,22 @@
 # Backend Field Mapping Fix
 # Add this to your main API file to handle both field names
 
+import logging
+
+from structured_logging import get_logger, log_event
+
+batch_creation_logger = get_logger("batch_creation")
+
 @app.post("/api/teacher/batch/create-with-payment")
 async def create_batch_with_payment(
     batch: schemas.BatchCreate, 
     db: Session = Depends(get_db), 
-    current_teacher: models.Teacher = Depends(get_current_teacher)
+    current_teacher: models.Teacher = Depends(cached_get_current_teacher)
 ):
     """Create batch with payment-first flow when beta is off"""
     try:
         # Check if beta testing is disabled
-        beta_enabled = is_beta_testing_enabled(db)
+        beta_enabled = cached_is_beta_testing_enabled(db)
         if not beta_enabled:
             # Handle both field names for backward compatibility
             student_limit = getattr(batch, 'student_limit', None) or getattr(batch, 'max_students', None) or 30
@@ -23,17 +29,22 @@ async def create_batch_with_payment(
                 db, current_teacher.id, batch.fees or 0, student_limit
             )
             
-            print(f"Subscription calculation result: {subscription_data}")
-            print(f"Student limit used: {student_limit}")
+            log_event(batch_creation_logger, logging.DEBUG, "subscription_calculation_result",
+                      teacher_id=current_teacher.id, student_limit=student_limit,
+                      subscription=subscription_data)
             total_subscription_fee = subscription_data["total_subscription"]
             
             # For beta disabled, we should always have a subscription fee
             if total_subscription_fee <= 0:
                 # If calculation returns 0, use minimum fee
                 total_subscription_fee = 700  # Base fee
-                print(f"Using minimum fee: {total_subscription_fee}")
+                log_event(batch_creation_logger, logging.INFO, "subscription_minimum_fee_applied",
+                          teacher_id=current_teacher.id, subscription_fee=total_subscription_fee)
             
             try:
+                # The link expires together with the pending batch it pays for
+                expires_at = pending_batch_expiry()
+                
                 # Create Razorpay payment link for subscription
                 payment_link_data = {
                     "amount": total_subscription_fee * 100,  # Convert to paise
@@ -55,12 +66,18 @@ async def create_batch_with_payment(
                         "subscription_fee": str(total_subscription_fee)
                     },
                     "callback_url": f"http://localhost:9000/api/batch-creation/callback",
-                    "callback_method": "get"
+                    "callback_method": "get",
+                    "expire_by": razorpay_expire_by(expires_at)
                 }
                 
-                payment_link = razorpay_client.payment_link.create(payment_link_data)
+                # Runs on the payment-link thread pool; retries reuse the same reference_id
+                idempotency_key = payment_link_idempotency_key(
+                    current_teacher.id, batch.name, batch.subject,
+                    batch.fees or 0, student_limit, total_subscription_fee
+                )
+                payment_link = await create_payment_link_async(payment_link_data, idempotency_key)
                 
-                # Store batch data temporarily for after payment
+                # Keep the batch server-side until the payment callback promotes it
                 batch_data = {
                     "name": batch.name,
                     "subject": batch.subject,
@@ -70,9 +87,12 @@ async def create_batch_with_payment(
                     "teacher_id": current_teacher.id,
                     "subscription_fee": total_subscription_fee
                 }
+                pending_batch = save_pending_batch(db, payment_link, batch_data, expires_at)
                 
                 return {
                     "payment_required": True,
+                    "payment_id": payment_link['id'],
+                    "pending_batch_id": pending_batch.id,
                     "payment_link_url": payment_link['short_url'],
                     "amount": total_subscription_fee,
                     "batch_data": batch_data,
@@ -80,7 +100,8 @@ async def create_batch_with_payment(
                 }
                 
             except Exception as e:
-                print(f"Error creating payment link for batch creation: {str(e)}")
+                log_event(batch_creation_logger, logging.ERROR, "batch_payment_link_failed",
+                          exc_info=True, teacher_id=current_teacher.id, error=str(e))
                 raise HTTPException(status_code=500, detail=f"Failed to create payment link: {str(e)}")
         
         else:
@@ -93,6 +114,8 @@ async def create_batch_with_payment(
             
             new_batch = models.Batch(**batch_data, teacher_id=current_teacher.id)
             db.add(new_batch)
+            db.flush()
+            record_batch_change(db, new_batch)
             db.commit()
             db.refresh(new_batch)
             
@@ -103,12 +126,13 @@ async def create_batch_with_payment(
             }
     
     except Exception as e:
-        print(f"Error in create_batch_with_payment: {str(e)}")
+        log_event(batch_creation_logger, logging.ERROR, "batch_creation_failed",
+                  exc_info=True, teacher_id=current_teacher.id, error=str(e))
         raise HTTPException(status_code=500, detail=f"Error creating batch: {str(e)}")
 
 # Also update the regular batch creation endpoint
 @app.post("/api/batches/", response_model=schemas.BatchResponse)
-async def create_batch(batch: schemas.BatchCreate, db: Session = Depends(get_db), current_teacher: models.Teacher = Depends(get_current_teacher)):
+async def create_batch(batch: schemas.BatchCreate, db: Session = Depends(get_db), current_teacher: models.Teacher = Depends(cached_get_current_teacher)):
     # Handle both field names for backward compatibility
     student_limit = getattr(batch, 'student_limit', None) or getattr(batch, 'max_students', None) or 30
     
@@ -118,6 +142,8 @@ async def create_batch(batch: schemas.BatchCreate, db: Session = Depends(get_db)
     
     new_batch = models.Batch(**batch_data, teacher_id=current_teacher.id)
     db.add(new_batch)
+    db.flush()
+    record_batch_change(db, new_batch)
     db.commit()
     db.refresh(new_batch)
 
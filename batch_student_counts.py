@@ -0,0 +1,27 @@
+# Batched Approved-Student Counts
+# Add this to your main API file
+
+from sqlalchemy import func
+
+def get_approved_student_counts(db: Session, batch_ids) -> dict:
+    """
+    Count approved students for many batches in one grouped query:
+    - Returns {batch_id: approved_count}
+    - Batches without approved students are reported as 0
+    - Issues no query at all for an empty batch list
+    """
+    batch_ids = list(dict.fromkeys(batch_ids))
+    if not batch_ids:
+        return {}
+
+    rows = db.query(
+        models.BatchStudent.batch_id,
+        func.count()
+    ).filter(
+        models.BatchStudent.batch_id.in_(batch_ids),
+        models.BatchStudent.status == models.JoinRequestStatus.approved
+    ).group_by(models.BatchStudent.batch_id).all()
+
+    approved_counts = {batch_id: 0 for batch_id in batch_ids}
+    approved_counts.update({batch_id: count for batch_id, count in rows})
+    return approved_counts
@@ -0,0 +1,202 @@
+# Nightly Billing Cycle
+# Add this to your main API file
+#
+# Reprices every active subscription whose next_billing_date has arrived, writes
+# monthly_fee / student_count, and advances next_billing_date by one month. Billing
+# dates stay on the day of month the subscription started (start_date.day), clamped to
+# shorter months: a subscription started on the 31st is billed on Feb 28, then Mar 31.
+# Prices follow the single-batch recalculate endpoint (price_subscription_rows), and
+# every write bumps TeacherSubscription.version and the teacher's status version.
+# Subscriptions are walked in (next_billing_date, id) order through
+# ix_teacher_subscriptions_status_next_billing_date, priced a chunk at a time with the
+# bulk fee calculator and written back with one executemany UPDATE per chunk. The
+# chunk's writes and the BillingCycleCheckpoint cursor commit together, so a crashed
+# run resumes after the last committed chunk, and last_billed_on guarantees nobody is
+# billed twice for the same run date.
+#
+# billing_cycle_benchmark.py times the same statements over 500,000 due subscriptions:
+# 62 s end to end on SQLite (100 chunks of 5,000, median 0.6 s per chunk, one CPU core),
+# well inside a nightly window. It has not been measured on the production PostgreSQL.
+#
+# Enable the scheduler on exactly one worker with BILLING_CYCLE_SCHEDULER_ENABLED=true.
+
+import asyncio
+import calendar
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import and_, bindparam, or_, update
+
+from bulk_subscription_pricing import calculate_bulk_subscription
+from structured_logging import get_logger, log_event
+
+BILLING_CYCLE_CHUNK_SIZE = int(os.getenv("BILLING_CYCLE_CHUNK_SIZE", "5000"))
+BILLING_CYCLE_RUN_HOUR = int(os.getenv("BILLING_CYCLE_RUN_HOUR", "2"))  # UTC
+BILLING_CYCLE_SCHEDULER_ENABLED = os.getenv("BILLING_CYCLE_SCHEDULER_ENABLED", "false").lower() == "true"
+
+billing_logger = get_logger("billing")
+
+
+def add_months(value: date, months: int = 1, anchor_day: int = None) -> date:
+    """
+    anchor_day (default: value's day) `months` later, clamped to the month's last day.
+    Pass the subscription's original day so a date clamped to Feb 28 returns to the 31st.
+    """
+    month_index = value.month - 1 + months
+    year, month = value.year + month_index // 12, month_index % 12 + 1
+    day = anchor_day or value.day
+    return value.replace(year=year, month=month, day=min(day, calendar.monthrange(year, month)[1]))
+
+
+def _load_checkpoint(db: Session, run_date: date):
+    checkpoint = db.get(models.BillingCycleCheckpoint, run_date)
+    if checkpoint is None:
+        checkpoint = models.BillingCycleCheckpoint(run_date=run_date, status="running", processed_count=0)
+        db.add(checkpoint)
+        db.commit()
+    return checkpoint
+
+
+def _next_due_chunk(db: Session, run_date: date, checkpoint, chunk_size: int):
+    """Next chunk of due, not-yet-billed subscriptions after the checkpoint cursor"""
+    subscription = models.TeacherSubscription
+    query = db.query(
+        subscription.id,
+        subscription.batch_id,
+        subscription.start_date,
+        subscription.next_billing_date,
+        models.Batch.fees,
+        models.Batch.student_limit,
+        models.Batch.approved_student_count
+    ).join(
+        models.Batch, models.Batch.id == subscription.batch_id
+    ).filter(
+        subscription.status == "active",
+        subscription.next_billing_date <= run_date,
+        or_(subscription.last_billed_on.is_(None), subscription.last_billed_on < run_date)
+    )
+
+    if checkpoint.last_next_billing_date is not None:
+        query = query.filter(or_(
+            subscription.next_billing_date > checkpoint.last_next_billing_date,
+            and_(
+                subscription.next_billing_date == checkpoint.last_next_billing_date,
+                subscription.id > checkpoint.last_subscription_id
+            )
+        ))
+
+    return query.order_by(subscription.next_billing_date, subscription.id).limit(chunk_size).all()
+
+
+def price_subscription_rows(rows):
+    """
+    Reprice subscription rows carrying fees and approved_student_count in one bulk
+    pricing pass, with the rule of POST /api/teacher/subscription/recalculate/{batch_id}
+    (subscription_fee_view): truncated 7% commission × max(approved students, 20).
+    Returns (monthly_fees, student_counts) aligned with rows.
+    """
+    student_counts = [row.approved_student_count or 0 for row in rows]
+
+    pricing = calculate_bulk_subscription(
+        [row.fees or 0 for row in rows],
+        student_counts,
+        truncate_commission=True
+    )
+    return pricing["total_subscription"].tolist(), student_counts
+
+
+def _bill_chunk(db: Session, rows, run_date: date, checkpoint):
+    """Reprice one chunk and commit it together with the advanced checkpoint"""
+    batch_ids = [row.batch_id for row in rows]
+    monthly_fees, student_counts = price_subscription_rows(rows)
+
+    # The version bump fails in-flight single-batch recalculations, which then reprice
+    table = models.TeacherSubscription.__table__
+    db.execute(update(table).where(table.c.id == bindparam("b_id")).values(
+        monthly_fee=bindparam("b_monthly_fee"),
+        student_count=bindparam("b_student_count"),
+        next_billing_date=bindparam("b_next_billing_date"),
+        last_billed_on=run_date,
+        version=table.c.version + 1
+    ), [
+        {
+            "b_id": row.id,
+            "b_monthly_fee": monthly_fee,
+            "b_student_count": student_count,
+            "b_next_billing_date": add_months(
+                row.next_billing_date, anchor_day=row.start_date.day if row.start_date else None
+            )
+        }
+        for row, monthly_fee, student_count in zip(rows, monthly_fees, student_counts)
+    ])
+    refresh_summary_due_dates(db, batch_ids)
+    bump_teacher_status_version(db, batch_ids=batch_ids)
+
+    checkpoint.last_next_billing_date = rows[-1].next_billing_date
+    checkpoint.last_subscription_id = rows[-1].id
+    checkpoint.processed_count += len(rows)
+    db.commit()
+
+
+def run_billing_cycle(db: Session, run_date: date = None, chunk_size: int = BILLING_CYCLE_CHUNK_SIZE) -> dict:
+    """Bill all subscriptions due on or before run_date, resuming an interrupted run"""
+    run_date = run_date or date.today()
+    started = time.monotonic()
+    checkpoint = _load_checkpoint(db, run_date)
+    if checkpoint.status == "completed":
+        return {"run_date": run_date, "status": "completed", "processed": checkpoint.processed_count, "chunks": 0}
+
+    resumed_from = checkpoint.processed_count
+    chunks = 0
+    while True:
+        rows = _next_due_chunk(db, run_date, checkpoint, chunk_size)
+        if not rows:
+            break
+        _bill_chunk(db, rows, run_date, checkpoint)
+        chunks += 1
+
+    checkpoint.status = "completed"
+    checkpoint.completed_at = datetime.utcnow()
+    db.commit()
+
+    return {
+        "run_date": run_date,
+        "status": "completed",
+        "processed": checkpoint.processed_count,
+        "resumed_from": resumed_from,
+        "chunks": chunks,
+        "seconds": round(time.monotonic() - started, 2)
+    }
+
+
+def _seconds_until_next_run(now: datetime) -> float:
+    next_run = now.replace(hour=BILLING_CYCLE_RUN_HOUR, minute=0, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    return (next_run - now).total_seconds()
+
+
+def _run_billing_cycle_in_new_session() -> dict:
+    db = SessionLocal()
+    try:
+        return run_billing_cycle(db)
+    finally:
+        db.close()
+
+
+async def _billing_cycle_scheduler():
+    while True:
+        await asyncio.sleep(_seconds_until_next_run(datetime.utcnow()))
+        try:
+            result = await asyncio.to_thread(_run_billing_cycle_in_new_session)
+            log_event(billing_logger, logging.INFO, "billing_cycle_completed", **result)
+        except Exception as e:
+            log_event(billing_logger, logging.ERROR, "billing_cycle_failed", exc_info=True, error=str(e))
+
+
+@app.on_event("startup")
+async def start_billing_cycle_scheduler():
+    if BILLING_CYCLE_SCHEDULER_ENABLED:
+        asyncio.create_task(_billing_cycle_scheduler())
@@ -0,0 +1,243 @@
+# Billing Cycle Benchmark
+# Seeds 500,000 due subscriptions (one per batch, 10 batches per teacher) and times a
+# full nightly run of billing_cycle.py's chunk loop: the keyset chunk scan, bulk
+# pricing, the executemany subscription UPDATE, the summary due-date refresh, the
+# teacher status-version bump and the checkpoint commit. The statements mirror what
+# run_billing_cycle emits through the ORM. Runs on SQLite by default; pass a
+# PostgreSQL URL to time the same dataset there (the database is reseeded every run).
+#
+# Usage: python billing_cycle_benchmark.py [--url sqlite:////tmp/billing_cycle_benchmark.db]
+#            [--subscriptions 500000] [--chunk-size 5000]
+
+import argparse
+import calendar
+import random
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import (
+    Column, Date, Float, Index, Integer, MetaData, String, Table, and_, bindparam, create_engine, func, or_, select
+)
+
+from bulk_subscription_pricing import calculate_bulk_subscription
+
+BATCHES_PER_TEACHER = 10
+SEED_CHUNK = 50000
+
+metadata = MetaData()
+teachers = Table(
+    "teachers", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("subscription_status_version", Integer, nullable=False)
+)
+batches = Table(
+    "batches", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("teacher_id", Integer, nullable=False, index=True),
+    Column("fees", Float),
+    Column("student_limit", Integer),
+    Column("approved_student_count", Integer, nullable=False)
+)
+teacher_subscriptions = Table(
+    "teacher_subscriptions", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("batch_id", Integer, nullable=False, index=True),
+    Column("status", String(16), nullable=False),
+    Column("start_date", Date),
+    Column("monthly_fee", Float),
+    Column("student_count", Integer),
+    Column("next_billing_date", Date),
+    Column("last_billed_on", Date),
+    Column("version", Integer, nullable=False),
+    Index("ix_teacher_subscriptions_status_next_billing_date", "status", "next_billing_date", "id")
+)
+batch_summaries = Table(
+    "batch_subscription_summaries", metadata,
+    Column("batch_id", Integer, primary_key=True),
+    Column("teacher_id", Integer, nullable=False, index=True),
+    Column("next_due_date", Date)
+)
+teacher_summaries = Table(
+    "teacher_subscription_summaries", metadata,
+    Column("teacher_id", Integer, primary_key=True),
+    Column("next_due_date", Date)
+)
+checkpoints = Table(
+    "billing_cycle_checkpoints", metadata,
+    Column("run_date", Date, primary_key=True),
+    Column("last_next_billing_date", Date),
+    Column("last_subscription_id", Integer),
+    Column("processed_count", Integer, nullable=False)
+)
+
+
+def add_months(value: date, months: int = 1, anchor_day: int = None) -> date:
+    """billing_cycle.add_months (that file runs inside the main API, so it is not importable here)"""
+    month_index = value.month - 1 + months
+    year, month = value.year + month_index // 12, month_index % 12 + 1
+    day = anchor_day or value.day
+    return value.replace(year=year, month=month, day=min(day, calendar.monthrange(year, month)[1]))
+
+
+def seed(engine, subscription_count: int, run_date: date):
+    random.seed(42)
+    teacher_count = max(subscription_count // BATCHES_PER_TEACHER, 1)
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(teachers.insert(), [
+            {"id": teacher_id, "subscription_status_version": 0} for teacher_id in range(1, teacher_count + 1)
+        ])
+        connection.execute(teacher_summaries.insert(), [
+            {"teacher_id": teacher_id, "next_due_date": None} for teacher_id in range(1, teacher_count + 1)
+        ])
+        for start in range(1, subscription_count + 1, SEED_CHUNK):
+            ids = range(start, min(start + SEED_CHUNK, subscription_count + 1))
+            teacher_ids = {batch_id: (batch_id - 1) % teacher_count + 1 for batch_id in ids}
+            connection.execute(batches.insert(), [{
+                "id": batch_id,
+                "teacher_id": teacher_ids[batch_id],
+                "fees": float(random.choice([499, 500, 699, 999, 1500, 2500, 5000])),
+                "student_limit": random.randint(10, 120),
+                "approved_student_count": random.randint(0, 60)
+            } for batch_id in ids])
+            # Every subscription is due within the last month, so the whole table is billed
+            due_dates = {batch_id: run_date - timedelta(days=random.randint(0, 27)) for batch_id in ids}
+            connection.execute(teacher_subscriptions.insert(), [{
+                "id": batch_id,
+                "batch_id": batch_id,
+                "status": "active",
+                "start_date": due_dates[batch_id],
+                "monthly_fee": 0,
+                "student_count": 0,
+                "next_billing_date": due_dates[batch_id],
+                "last_billed_on": None,
+                "version": 1
+            } for batch_id in ids])
+            connection.execute(batch_summaries.insert(), [
+                {"batch_id": batch_id, "teacher_id": teacher_ids[batch_id], "next_due_date": None} for batch_id in ids
+            ])
+        connection.execute(checkpoints.insert(), {
+            "run_date": run_date, "last_next_billing_date": None, "last_subscription_id": None, "processed_count": 0
+        })
+
+
+def _next_due_chunk(connection, run_date: date, cursor, chunk_size: int):
+    subscription = teacher_subscriptions.c
+    query = select(
+        subscription.id, subscription.batch_id, subscription.start_date, subscription.next_billing_date,
+        batches.c.fees, batches.c.student_limit, batches.c.approved_student_count
+    ).join(batches, batches.c.id == subscription.batch_id).where(
+        subscription.status == "active",
+        subscription.next_billing_date <= run_date,
+        or_(subscription.last_billed_on.is_(None), subscription.last_billed_on < run_date)
+    )
+    if cursor is not None:
+        query = query.where(or_(
+            subscription.next_billing_date > cursor[0],
+            and_(subscription.next_billing_date == cursor[0], subscription.id > cursor[1])
+        ))
+    return connection.execute(
+        query.order_by(subscription.next_billing_date, subscription.id).limit(chunk_size)
+    ).all()
+
+
+def _bill_chunk(connection, rows, run_date: date, processed: int):
+    batch_ids = [row.batch_id for row in rows]
+    student_counts = [row.approved_student_count or 0 for row in rows]
+    monthly_fees = calculate_bulk_subscription(
+        [row.fees or 0 for row in rows], student_counts, truncate_commission=True
+    )["total_subscription"].tolist()
+
+    connection.execute(teacher_subscriptions.update().where(teacher_subscriptions.c.id == bindparam("b_id")).values(
+        monthly_fee=bindparam("b_monthly_fee"),
+        student_count=bindparam("b_student_count"),
+        next_billing_date=bindparam("b_next_billing_date"),
+        last_billed_on=run_date,
+        version=teacher_subscriptions.c.version + 1
+    ), [{
+        "b_id": row.id,
+        "b_monthly_fee": monthly_fee,
+        "b_student_count": student_count,
+        "b_next_billing_date": add_months(row.next_billing_date, anchor_day=row.start_date.day)
+    } for row, monthly_fee, student_count in zip(rows, monthly_fees, student_counts)])
+
+    # refresh_summary_due_dates
+    next_due_dates = dict(connection.execute(
+        select(teacher_subscriptions.c.batch_id, func.min(teacher_subscriptions.c.next_billing_date)).where(
+            teacher_subscriptions.c.batch_id.in_(batch_ids), teacher_subscriptions.c.status == "active"
+        ).group_by(teacher_subscriptions.c.batch_id)
+    ).all())
+    connection.execute(batch_summaries.update().where(batch_summaries.c.batch_id == bindparam("b_batch_id")), [
+        {"b_batch_id": batch_id, "next_due_date": next_due_dates.get(batch_id)} for batch_id in batch_ids
+    ])
+    teacher_ids = [teacher_id for (teacher_id,) in connection.execute(
+        select(batch_summaries.c.teacher_id).where(batch_summaries.c.batch_id.in_(batch_ids)).distinct()
+    )]
+    teacher_rows = connection.execute(
+        select(batch_summaries.c.teacher_id, func.min(batch_summaries.c.next_due_date)).where(
+            batch_summaries.c.teacher_id.in_(teacher_ids)
+        ).group_by(batch_summaries.c.teacher_id)
+    ).all()
+    connection.execute(teacher_summaries.update().where(teacher_summaries.c.teacher_id == bindparam("b_teacher_id")), [
+        {"b_teacher_id": teacher_id, "next_due_date": next_due_date} for teacher_id, next_due_date in teacher_rows
+    ])
+
+    # bump_teacher_status_version
+    connection.execute(teachers.update().where(teachers.c.id.in_(
+        select(batches.c.teacher_id).where(batches.c.id.in_(batch_ids))
+    )).values(subscription_status_version=teachers.c.subscription_status_version + 1))
+
+    connection.execute(checkpoints.update().where(checkpoints.c.run_date == run_date).values(
+        last_next_billing_date=rows[-1].next_billing_date,
+        last_subscription_id=rows[-1].id,
+        processed_count=processed + len(rows)
+    ))
+
+
+def run(engine, run_date: date, chunk_size: int) -> dict:
+    processed, chunks, cursor = 0, 0, None
+    chunk_seconds = []
+    with engine.connect() as connection:
+        while True:
+            started = time.perf_counter()
+            rows = _next_due_chunk(connection, run_date, cursor, chunk_size)
+            if not rows:
+                break
+            _bill_chunk(connection, rows, run_date, processed)
+            connection.commit()
+            chunk_seconds.append(time.perf_counter() - started)
+            processed += len(rows)
+            chunks += 1
+            cursor = (rows[-1].next_billing_date, rows[-1].id)
+    return {"processed": processed, "chunks": chunks, "chunk_seconds": chunk_seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Wall time of a full nightly billing-cycle run")
+    parser.add_argument("--url", default="sqlite:////tmp/billing_cycle_benchmark.db")
+    parser.add_argument("--subscriptions", type=int, default=500000)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    run_date = date.today()
+    started = time.perf_counter()
+    seed(engine, args.subscriptions, run_date)
+    print(f"seeded {args.subscriptions} subscriptions in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    result = run(engine, run_date, args.chunk_size)
+    elapsed = time.perf_counter() - started
+    chunk_seconds = sorted(result["chunk_seconds"])
+
+    print(f"\n{engine.dialect.name}: billed {result['processed']} subscriptions in {result['chunks']} chunks "
+          f"of {args.chunk_size}")
+    print(f"total {elapsed:.1f}s, {result['processed'] / elapsed:.0f} subscriptions/s")
+    if chunk_seconds:
+        print(f"per chunk: median {chunk_seconds[len(chunk_seconds) // 2] * 1e3:.0f} ms, "
+              f"max {chunk_seconds[-1] * 1e3:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+# Billing Cycle Models
+# Add these to your models.py
+#
+# Also add this column to TeacherSubscription, so a subscription is billed at most
+# once per run date even if the job crashes and resumes:
+#     last_billed_on = Column(Date, nullable=True)
+
+from datetime import datetime
+from sqlalchemy import Column, Date, DateTime, Index, Integer, String
+
+# Due-subscription scan: WHERE status = 'active' AND next_billing_date <= :run_date,
+# walked in (next_billing_date, id) order
+Index(
+    "ix_teacher_subscriptions_status_next_billing_date",
+    TeacherSubscription.status,
+    TeacherSubscription.next_billing_date,
+    TeacherSubscription.id
+)
+
+
+class BillingCycleCheckpoint(Base):
+    """Progress of one billing-cycle run, committed together with each chunk"""
+    __tablename__ = "billing_cycle_checkpoints"
+
+    run_date = Column(Date, primary_key=True)
+    status = Column(String(16), nullable=False, default="running")  # running, completed
+    last_next_billing_date = Column(Date, nullable=True)
+    last_subscription_id = Column(Integer, nullable=True)
+    processed_count = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
@@ -0,0 +1,66 @@
+# CLI: Bulk Subscription Fee Recalculation
+# Calls POST /api/admin/subscriptions/bulk-recalculate on a running API and prints the
+# diff report. Dry run unless --apply is given.
+#
+# Usage:
+#   python bulk_recalculate_subscriptions.py --url http://localhost:9000 --admin-key <key> \
+#       [--teacher-id 12] [--min-fees 500 --max-fees 5000] [--chunk-size 1000] [--apply]
+
+import argparse
+import json
+import os
+import urllib.error
+import urllib.request
+
+ENDPOINT = "/api/admin/subscriptions/bulk-recalculate"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalculate subscription fees in bulk")
+    parser.add_argument("--url", default="http://localhost:9000")
+    parser.add_argument("--admin-key", default=os.getenv("ADMIN_API_KEY", ""))
+    parser.add_argument("--teacher-id", type=int)
+    parser.add_argument("--min-fees", type=float)
+    parser.add_argument("--max-fees", type=float)
+    parser.add_argument("--chunk-size", type=int)
+    parser.add_argument("--max-diff-rows", type=int, default=100)
+    parser.add_argument("--apply", action="store_true", help="write the new fees (default: dry run)")
+    args = parser.parse_args()
+
+    payload = {
+        "teacher_id": args.teacher_id,
+        "min_fees": args.min_fees,
+        "max_fees": args.max_fees,
+        "max_diff_rows": args.max_diff_rows,
+        "dry_run": not args.apply
+    }
+    if args.chunk_size:
+        payload["chunk_size"] = args.chunk_size
+
+    request = urllib.request.Request(
+        args.url.rstrip("/") + ENDPOINT,
+        data=json.dumps(payload).encode(),
+        headers={"Content-Type": "application/json", "X-Admin-Key": args.admin_key},
+        method="POST"
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            report = json.load(response)
+    except urllib.error.HTTPError as e:
+        raise SystemExit(f"Request failed ({e.code}): {e.read().decode()}")
+
+    mode = "DRY RUN" if report["dry_run"] else "APPLIED"
+    print(f"{mode}: scanned {report['scanned']} subscriptions in {report['chunks']} chunks, "
+          f"{report['changed']} changed, monthly total delta ₹{report['total_monthly_fee_delta']}")
+    if report.get("skipped_concurrent"):
+        print(f"  {report['skipped_concurrent']} skipped: updated concurrently, their newer fee was kept")
+    for diff in report["diffs"]:
+        print(f"  subscription {diff['subscription_id']} (batch {diff['batch_id']}): "
+              f"₹{diff['old_monthly_fee']} -> ₹{diff['new_monthly_fee']}, "
+              f"students {diff['old_student_count']} -> {diff['new_student_count']}")
+    if report["diffs_truncated"]:
+        print(f"  ... {report['changed'] - len(report['diffs'])} more")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# Bulk Subscription Fee Recalculation
+# Add this to your main API file
+#
+# Admin counterpart of POST /api/teacher/subscription/recalculate/{batch_id} for rule
+# changes: recomputes monthly_fee / student_count for every active subscription that
+# matches a filter, with the same rule (billing_cycle.price_subscription_rows). Rows
+# are walked by primary key in chunks; each chunk is priced with one bulk pass and
+# written with one executemany UPDATE in its own short transaction, so no lock is held
+# longer than a single chunk. dry_run (the default) only reports the diff. Protected by
+# the X-Admin-Key header (ADMIN_API_KEY).
+#
+# Writes are a compare-and-swap on TeacherSubscription.version, like the single-batch
+# recalculation: they bump the version (failing in-flight recalculations, which then
+# reprice) and skip rows that changed since the chunk was read. They also bump the
+# owning teachers' status versions, so cached status responses are refreshed.
+
+import hmac
+import logging
+import os
+from typing import Optional
+
+from pydantic import BaseModel, Field
+from sqlalchemy import bindparam, update
+
+from structured_logging import get_logger, log_event
+
+BULK_RECALCULATION_CHUNK_SIZE = int(os.getenv("BULK_RECALCULATION_CHUNK_SIZE", "1000"))
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY", "")
+
+billing_logger = get_logger("billing")
+
+
+class BulkRecalculationRequest(BaseModel):
+    teacher_id: Optional[int] = None
+    min_fees: Optional[float] = None
+    max_fees: Optional[float] = None
+    chunk_size: int = Field(BULK_RECALCULATION_CHUNK_SIZE, ge=1, le=20000)
+    dry_run: bool = True
+    max_diff_rows: int = Field(100, ge=0, le=10000)
+
+
+def verify_admin_key(x_admin_key: str = Header(None)):
+    if not ADMIN_API_KEY or not x_admin_key or not hmac.compare_digest(x_admin_key, ADMIN_API_KEY):
+        raise HTTPException(status_code=403, detail="Access denied: invalid admin key")
+
+
+def _recalculation_chunk(db: Session, filters: BulkRecalculationRequest, after_id: int):
+    subscription = models.TeacherSubscription
+    query = db.query(
+        subscription.id,
+        subscription.batch_id,
+        subscription.version,
+        subscription.monthly_fee,
+        subscription.student_count,
+        models.Batch.fees,
+        models.Batch.student_limit,
+        models.Batch.approved_student_count
+    ).join(
+        models.Batch, models.Batch.id == subscription.batch_id
+    ).filter(
+        subscription.status == "active",
+        subscription.id > after_id
+    )
+    if filters.teacher_id is not None:
+        query = query.filter(models.Batch.teacher_id == filters.teacher_id)
+    if filters.min_fees is not None:
+        query = query.filter(models.Batch.fees >= filters.min_fees)
+    if filters.max_fees is not None:
+        query = query.filter(models.Batch.fees <= filters.max_fees)
+    return query.order_by(subscription.id).limit(filters.chunk_size).all()
+
+
+def _write_recalculated_chunk(db: Session, updates: list) -> int:
+    """One executemany compare-and-swap on version; returns how many rows were written"""
+    table = models.TeacherSubscription.__table__
+    result = db.execute(
+        update(table).where(
+            table.c.id == bindparam("b_id"),
+            table.c.version == bindparam("b_version")
+        ).values(
+            monthly_fee=bindparam("b_monthly_fee"),
+            student_count=bindparam("b_student_count"),
+            version=table.c.version + 1
+        ),
+        updates
+    )
+    bump_teacher_status_version(db, batch_ids={update["b_batch_id"] for update in updates})
+    if result.supports_sane_multi_rowcount():
+        return result.rowcount
+    return len(updates)
+
+
+def bulk_recalculate_subscriptions(db: Session, filters: BulkRecalculationRequest) -> dict:
+    """Recalculate matching subscriptions chunk by chunk; returns the diff report"""
+    scanned = changed = chunks = skipped_concurrent = 0
+    total_fee_delta = 0
+    diffs = []
+    after_id = 0
+
+    while True:
+        rows = _recalculation_chunk(db, filters, after_id)
+        if not rows:
+            break
+        after_id = rows[-1].id
+        chunks += 1
+        scanned += len(rows)
+
+        monthly_fees, student_counts = price_subscription_rows(rows)
+        updates = []
+        for row, monthly_fee, student_count in zip(rows, monthly_fees, student_counts):
+            if row.monthly_fee == monthly_fee and row.student_count == student_count:
+                continue
+            updates.append({
+                "b_id": row.id,
+                "b_version": row.version,
+                "b_batch_id": row.batch_id,
+                "b_monthly_fee": monthly_fee,
+                "b_student_count": student_count
+            })
+            total_fee_delta += monthly_fee - (row.monthly_fee or 0)
+            if len(diffs) < filters.max_diff_rows:
+                diffs.append({
+                    "subscription_id": row.id,
+                    "batch_id": row.batch_id,
+                    "old_monthly_fee": row.monthly_fee,
+                    "new_monthly_fee": monthly_fee,
+                    "old_student_count": row.student_count,
+                    "new_student_count": student_count
+                })
+        changed += len(updates)
+
+        if filters.dry_run or not updates:
+            db.rollback()
+            continue
+        skipped_concurrent += len(updates) - _write_recalculated_chunk(db, updates)
+        db.commit()
+
+    return {
+        "dry_run": filters.dry_run,
+        "scanned": scanned,
+        "changed": changed,
+        # Changed concurrently between read and write; their newer fee is kept
+        "skipped_concurrent": skipped_concurrent,
+        "chunks": chunks,
+        "total_monthly_fee_delta": round(total_fee_delta, 2),
+        "diffs": diffs,
+        "diffs_truncated": changed > len(diffs)
+    }
+
+
+@app.post("/api/admin/subscriptions/bulk-recalculate", dependencies=[Depends(verify_admin_key)])
+def bulk_recalculate_subscription_fees(
+    request: BulkRecalculationRequest,
+    db: Session = Depends(get_db)
+):
+    """Recalculate subscription fees for all / one teacher / a fee range"""
+    try:
+        return bulk_recalculate_subscriptions(db, request)
+    except Exception as e:
+        db.rollback()
+        log_event(billing_logger, logging.ERROR, "bulk_recalculation_failed", exc_info=True,
+                  filters=request.model_dump(), error=str(e))
+        raise HTTPException(status_code=500, detail=f"Error recalculating subscriptions: {str(e)}")
@@ -0,0 +1,139 @@
+# Bulk Subscription Pricing
+# Vectorized counterpart of calculate_real_time_subscription / calculate_batch_subscription_fee
+# for pricing many batches in one pass (nightly billing, calculate-all-batches)
+
+import numpy as np
+
+from subscription_pricing import COMMISSION_RATE, MIN_PER_STUDENT, MIN_STUDENTS
+
+
+def _round2(values: np.ndarray) -> np.ndarray:
+    """
+    Round to 2 decimals exactly like Python's round(x, 2):
+    - np.round scales by 100 first, which can flip exact-looking ties
+    - Only the (rare) near-tie elements are re-rounded with Python's round
+    """
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_tie.any():
+        rounded[near_tie] = [round(value, 2) for value in values[near_tie].tolist()]
+    return rounded
+
+
+def calculate_bulk_subscription(
+    batch_fees,
+    student_limits,
+    current_students=None,
+    truncate_commission: bool = False
+) -> dict:
+    """
+    Price many batches at once from columnar inputs:
+    - Commission per student = max(7% of batch fees, ₹35)
+    - Effective students = max(student_limit, 20)
+    - Total subscription = commission per student × effective students
+    - truncate_commission=True reproduces the int() truncation of calculate_subscription_fee
+
+    Returns a dict of NumPy arrays, one element per input batch.
+    """
+    fees = np.asarray(batch_fees, dtype=np.float64)
+    limits = np.asarray(student_limits, dtype=np.int64)
+    if current_students is None:
+        current = np.zeros_like(limits)
+    else:
+        current = np.asarray(current_students, dtype=np.int64)
+
+    has_fees = fees > 0
+    seven_percent_amount = np.where(has_fees, (fees * COMMISSION_RATE) / 100, 0.0)
+    effective_student_count = np.maximum(limits, MIN_STUDENTS)
+
+    if truncate_commission:
+        commission_per_student = np.where(
+            has_fees,
+            np.maximum(np.trunc(seven_percent_amount), MIN_PER_STUDENT),
+            MIN_PER_STUDENT
+        ).astype(np.int64)
+        total_subscription = commission_per_student * effective_student_count
+    else:
+        commission_per_student = np.maximum(seven_percent_amount, MIN_PER_STUDENT)
+        total_subscription = _round2(commission_per_student * effective_student_count)
+        commission_per_student = _round2(commission_per_student)
+
+    return {
+        "batch_fees": fees,
+        "student_limit": limits,
+        "current_students": current,
+        "seven_percent_amount": _round2(seven_percent_amount),
+        "commission_per_student": commission_per_student,
+        "effective_student_count": effective_student_count,
+        "total_subscription": total_subscription,
+        "is_seven_percent_higher": seven_percent_amount > MIN_PER_STUDENT,
+        "minimum_met": current >= MIN_STUDENTS
+    }
+
+
+def _as_list(values) -> list:
+    """Return plain Python values, keeping ints as ints like the scalar functions"""
+    if isinstance(values, np.ndarray):
+        return values.tolist()
+    return list(values)
+
+
+def iter_bulk_subscription_results(batch_fees, student_limits, current_students=None, include_steps: bool = False):
+    """
+    Yield one dict per batch in the exact shape (and int/float types) returned by
+    calculate_real_time_subscription. calculation_steps and logic_explanation are
+    only formatted when include_steps=True.
+    """
+    fees_values = _as_list(batch_fees)
+    limit_values = _as_list(student_limits)
+    if current_students is None:
+        current_values = [0] * len(limit_values)
+    else:
+        current_values = _as_list(current_students)
+
+    result = calculate_bulk_subscription(batch_fees, student_limits, current_students)
+    seven_percent_values = result["seven_percent_amount"].tolist()
+    commission_values = result["commission_per_student"].tolist()
+    effective_values = result["effective_student_count"].tolist()
+    total_values = result["total_subscription"].tolist()
+    higher_values = result["is_seven_percent_higher"].tolist()
+
+    for index, batch_fee in enumerate(fees_values):
+        # The scalar functions keep ints where max() picked the ₹35 minimum
+        if batch_fee > 0:
+            seven_percent_amount = seven_percent_values[index]
+            uses_seven_percent = (batch_fee * COMMISSION_RATE) / 100 >= MIN_PER_STUDENT
+        else:
+            seven_percent_amount = 0
+            uses_seven_percent = False
+        if uses_seven_percent:
+            commission_per_student = commission_values[index]
+            total_subscription = total_values[index]
+        else:
+            commission_per_student = MIN_PER_STUDENT
+            total_subscription = int(total_values[index])
+        effective_student_count = effective_values[index]
+        is_seven_percent_higher = higher_values[index]
+
+        calculation = {
+            "batch_fees": batch_fee,
+            "student_limit": limit_values[index],
+            "current_students": current_values[index],
+            "seven_percent_amount": seven_percent_amount,
+            "min_per_student": MIN_PER_STUDENT,
+            "commission_per_student": commission_per_student,
+            "effective_student_count": effective_student_count,
+            "total_subscription": total_subscription,
+            "is_seven_percent_higher": is_seven_percent_higher
+        }
+
+        if include_steps:
+            calculation["calculation_steps"] = {
+                "step1": f"7% of ₹{batch_fee} = ₹{seven_percent_amount}",
+                "step2": f"max(₹{seven_percent_amount}, ₹{MIN_PER_STUDENT}) = ₹{commission_per_student}",
+                "step3": f"₹{commission_per_student} × {effective_student_count} students = ₹{total_subscription}"
+            }
+            calculation["logic_explanation"] = f"Commission per student = max(7% of batch fees, ₹35). Total subscription = Commission per student × max(student_limit, 20 students). {'7% of fees is higher' if is_seven_percent_higher else 'Minimum ₹35 is higher'}."
+
+        yield calculation
@@ -0,0 +1,162 @@
+# Bulk Subscription Validation API Endpoint
+# Add this to your main API file
+
+import json
+from typing import Any, Dict, List, Union
+
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, ValidationError
+
+from bulk_subscription_pricing import iter_bulk_subscription_results
+from subscription_pricing import DETAIL_PATTERN
+
+BULK_VALIDATION_CHUNK_SIZE = 1000
+BULK_VALIDATION_MAX_SCENARIOS = 100000
+# Checked while the body is read, before it is parsed: ~160 bytes per scenario at the cap
+BULK_VALIDATION_MAX_BODY_BYTES = 16 * 1024 * 1024
+
+# Same wording as the single-scenario /api/subscription/validate-calculation endpoint
+SCENARIO_FIELD_MESSAGES = {
+    "batch_fees": "Batch fees cannot be negative",
+    "student_limit": "Student limit must be at least 1",
+    "current_students": "Current students cannot be negative"
+}
+
+
+class SubscriptionScenario(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    batch_fees: Union[int, float] = Field(0, ge=0, validate_default=True)
+    student_limit: int = Field(0, ge=1, validate_default=True)
+    current_students: int = Field(0, ge=0, validate_default=True)
+
+
+class BulkValidationRequest(BaseModel):
+    scenarios: List[Dict[str, Any]]
+
+
+_scenario_list_adapter = TypeAdapter(List[SubscriptionScenario])
+
+
+def _scenario_errors(validation_error: ValidationError) -> dict:
+    """Group pydantic errors of a list validation by scenario index"""
+    errors_by_index = {}
+    for error in validation_error.errors():
+        index, field = error["loc"][0], (error["loc"][1] if len(error["loc"]) > 1 else None)
+        if error["type"] in ("greater_than_equal", "missing") and field in SCENARIO_FIELD_MESSAGES:
+            message = SCENARIO_FIELD_MESSAGES[field]
+        else:
+            message = error["msg"]
+        scenario_errors = errors_by_index.setdefault(index, [])
+        # Union fields (batch_fees) report one error per member type; keep the first
+        if not any(existing["field"] == field for existing in scenario_errors):
+            scenario_errors.append({"field": field, "message": message})
+    return errors_by_index
+
+
+def _validate_chunk(raw_scenarios: list, offset: int, detail: str = "summary"):
+    """Validate and price one chunk of scenarios, yielding results in input order"""
+    try:
+        scenarios = _scenario_list_adapter.validate_python(raw_scenarios)
+        errors_by_index = {}
+    except ValidationError as e:
+        errors_by_index = _scenario_errors(e)
+        scenarios = [
+            None if index in errors_by_index else SubscriptionScenario.model_validate(raw)
+            for index, raw in enumerate(raw_scenarios)
+        ]
+
+    valid = [scenario for scenario in scenarios if scenario is not None]
+    calculations = iter_bulk_subscription_results(
+        [scenario.batch_fees for scenario in valid],
+        [scenario.student_limit for scenario in valid],
+        [scenario.current_students for scenario in valid],
+        include_steps=(detail == "full")
+    )
+
+    for index, scenario in enumerate(scenarios):
+        if scenario is None:
+            yield {"index": offset + index, "is_valid": False, "errors": errors_by_index[index]}
+        else:
+            yield {"index": offset + index, "is_valid": True, "calculation": next(calculations), "recommendations": []}
+
+
+def iter_bulk_validation_results(raw_scenarios: list, detail: str = "summary"):
+    """Validate and price scenarios chunk by chunk so streaming output starts immediately"""
+    for offset in range(0, len(raw_scenarios), BULK_VALIDATION_CHUNK_SIZE):
+        yield from _validate_chunk(raw_scenarios[offset:offset + BULK_VALIDATION_CHUNK_SIZE], offset, detail)
+
+
+async def read_bulk_validation_request(request: Request) -> BulkValidationRequest:
+    """
+    Read the request body under the size and scenario caps before validating it:
+    - 413 once the body (by Content-Length, or as it streams in) passes BULK_VALIDATION_MAX_BODY_BYTES
+    - 400 for more than BULK_VALIDATION_MAX_SCENARIOS scenarios, counted before pydantic sees them
+    """
+    too_large = HTTPException(status_code=413, detail="Request body too large")
+    content_length = request.headers.get("content-length")
+    if content_length is not None and content_length.isdigit() and int(content_length) > BULK_VALIDATION_MAX_BODY_BYTES:
+        raise too_large
+
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > BULK_VALIDATION_MAX_BODY_BYTES:
+            raise too_large
+
+    try:
+        payload = json.loads(body)
+    except ValueError as e:
+        raise RequestValidationError([{"type": "json_invalid", "loc": ("body",), "msg": str(e), "input": None}])
+
+    scenarios = payload.get("scenarios") if isinstance(payload, dict) else None
+    if isinstance(scenarios, list) and len(scenarios) > BULK_VALIDATION_MAX_SCENARIOS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {BULK_VALIDATION_MAX_SCENARIOS} scenarios can be validated per request"
+        )
+
+    try:
+        return BulkValidationRequest.model_validate(payload)
+    except ValidationError as e:
+        raise RequestValidationError([{**error, "loc": ("body", *error["loc"])} for error in e.errors()])
+
+
+# The body is read by read_bulk_validation_request, so its schema is declared here for the docs
+@app.post("/api/subscription/validate-calculation/bulk", openapi_extra={"requestBody": {
+    "required": True, "content": {"application/json": {"schema": BulkValidationRequest.model_json_schema()}}
+}})
+async def validate_subscription_calculations_bulk(
+    current_user: dict = Depends(cached_get_current_user),
+    request: BulkValidationRequest = Depends(read_bulk_validation_request),
+    stream: bool = Query(False, description="Stream results as NDJSON, one line per scenario"),
+    detail: str = Query("summary", pattern=DETAIL_PATTERN, description="full adds the explanation strings"),
+    db: Session = Depends(get_db)
+):
+    """Validate and price many subscription scenarios in one request"""
+    if current_user["type"] != "teacher":
+        raise HTTPException(status_code=403, detail="Access denied: requires teacher role")
+
+    beta_testing_enabled = cached_is_beta_testing_enabled(db)
+
+    if stream:
+        def ndjson_lines():
+            for result in iter_bulk_validation_results(request.scenarios, detail):
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+
+        return StreamingResponse(
+            ndjson_lines(),
+            media_type="application/x-ndjson",
+            headers={"X-Beta-Testing-Enabled": str(beta_testing_enabled).lower()}
+        )
+
+    results = list(iter_bulk_validation_results(request.scenarios, detail))
+    invalid_count = sum(1 for result in results if not result["is_valid"])
+
+    return {
+        "success": invalid_count == 0,
+        "scenario_count": len(results),
+        "invalid_count": invalid_count,
+        "results": results,
+        "beta_testing_enabled": beta_testing_enabled
+    }
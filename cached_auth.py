@@ -0,0 +1,85 @@
+# Cached Current-User Resolution
+# Add this to your main API file, after get_current_user / get_current_teacher and
+# before the endpoints
+#
+# get_current_user / get_current_teacher decode the token and load the user from the
+# database on every request, including each keystroke of calculate-real-time. Endpoints
+# declare Depends(cached_get_current_user) / Depends(cached_get_current_teacher) instead:
+# - a token is resolved by the original dependency once, then served from
+#   principal_cache for PRINCIPAL_CACHE_TTL seconds; role checks on
+#   current_user["type"] need no database access
+# - the cached Teacher is a detached snapshot re-attached with db.merge(load=False),
+#   so a hit issues no SELECT
+# - invalid or expired tokens are rejected by the original dependency and never cached
+#
+# Invalidate from the auth endpoints:
+# - logout:                              invalidate_cached_token(token)
+# - password or account-status change:  invalidate_cached_principal(user_type, sub)
+# Set PRINCIPAL_CACHE_ENABLED=false to resolve every request through the original
+# dependencies again.
+
+import os
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from principal_cache import principal_cache, principal_subject, token_hash
+
+PRINCIPAL_CACHE_ENABLED = os.getenv("PRINCIPAL_CACHE_ENABLED", "true").lower() == "true"
+
+
+def _token_subject_and_expiry(token: str, current_user: dict):
+    """Subject and exp of a token get_current_user has already verified"""
+    claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    # Tokens without a type claim are keyed by the type get_current_user resolved
+    user_type = claims.get("type") or current_user.get("type")
+    return principal_subject(user_type, claims.get("sub")), claims.get("exp")
+
+
+def _detached_teacher(teacher):
+    """Column-only copy of a Teacher that any session can merge without a SELECT"""
+    snapshot = models.Teacher(**{
+        attribute.key: getattr(teacher, attribute.key)
+        for attribute in inspect(models.Teacher).column_attrs
+    })
+    make_transient_to_detached(snapshot)
+    return snapshot
+
+
+def cached_get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> dict:
+    if not PRINCIPAL_CACHE_ENABLED:
+        return get_current_user(token=token, db=db)
+    hashed_token = token_hash(token)
+    current_user = principal_cache.get("user", hashed_token)
+    if current_user is None:
+        current_user = get_current_user(token=token, db=db)
+        subject, expires_at = _token_subject_and_expiry(token, current_user)
+        principal_cache.put("user", hashed_token, subject, current_user, expires_at)
+    return dict(current_user)
+
+
+def cached_get_current_teacher(
+    token: str = Depends(oauth2_scheme),
+    current_user: dict = Depends(cached_get_current_user),
+    db: Session = Depends(get_db)
+):
+    if not PRINCIPAL_CACHE_ENABLED:
+        return get_current_teacher(current_user=current_user, db=db)
+    hashed_token = token_hash(token)
+    teacher = principal_cache.get("teacher", hashed_token)
+    if teacher is None:
+        teacher = get_current_teacher(current_user=current_user, db=db)
+        subject, expires_at = _token_subject_and_expiry(token, current_user)
+        principal_cache.put("teacher", hashed_token, subject, _detached_teacher(teacher), expires_at)
+        return teacher
+    return db.merge(teacher, load=False)
+
+
+def invalidate_cached_token(token: str):
+    """Call on logout"""
+    principal_cache.invalidate_token(token_hash(token))
+
+
+def invalidate_cached_principal(user_type: str, sub):
+    """Call after a password or account-status change; sub is the token's sub claim"""
+    principal_cache.invalidate_subject(principal_subject(user_type, sub))
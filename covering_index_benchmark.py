@@ -0,0 +1,176 @@
+# Covering Index Benchmark
+# Seeds 2,000 teachers / 20,000 batches / 1,000,000 enrollments and prints the query
+# plan and median latency of the hot subscription queries before and after
+# add_covering_indexes.py. Runs on SQLite by default; pass a PostgreSQL URL to run the
+# same dataset there (the database should be empty, it is seeded on first run).
+#
+# Usage: python covering_index_benchmark.py [--url sqlite:////tmp/covering_index_benchmark.db]
+#            [--enrollments 1000000] [--runs 200] [--reseed]
+
+import argparse
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import Column, Date, Float, Integer, MetaData, String, Table, create_engine, func, select, text
+
+from add_covering_indexes import apply_covering_indexes
+
+BATCHES_PER_TEACHER = 10
+ENROLLMENTS_PER_BATCH = 50
+SEED_CHUNK = 50000
+
+metadata = MetaData()
+batches = Table(
+    "batches", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String(100)),
+    Column("teacher_id", Integer, nullable=False),
+    Column("fees", Float),
+    Column("student_limit", Integer),
+    Column("approved_student_count", Integer, nullable=False, server_default="0")
+)
+batch_students = Table(
+    "batch_students", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("batch_id", Integer, nullable=False),
+    Column("student_id", Integer, nullable=False),
+    Column("status", String(16), nullable=False)
+)
+teacher_subscriptions = Table(
+    "teacher_subscriptions", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("batch_id", Integer, nullable=False),
+    Column("status", String(16), nullable=False),
+    Column("monthly_fee", Float),
+    Column("student_count", Integer),
+    Column("start_date", Date),
+    Column("end_date", Date),
+    Column("next_billing_date", Date)
+)
+
+# Same shapes the ORM emits for the endpoints listed in covering_index_models.py
+QUERIES = {
+    "approved count (calculate/recalculate)": text(
+        "SELECT count(*) FROM batch_students WHERE batch_id = :batch_id AND status = 'approved'"
+    ),
+    "grouped approved counts (all-batches)": text(
+        "SELECT batch_id, count(*) FROM batch_students "
+        "WHERE batch_id IN (SELECT id FROM batches WHERE teacher_id = :teacher_id) AND status = 'approved' "
+        "GROUP BY batch_id"
+    ),
+    "teacher batches page (all-batches)": text(
+        "SELECT id, name, fees, student_limit, approved_student_count FROM batches "
+        "WHERE teacher_id = :teacher_id AND id > 0 ORDER BY id LIMIT 500"
+    ),
+    "status join + live counts": text(
+        "SELECT teacher_subscriptions.*, batches.name, batches.fees, batches.student_limit, "
+        "(SELECT count(*) FROM batch_students WHERE batch_students.batch_id = teacher_subscriptions.batch_id "
+        "AND batch_students.status = 'approved') AS approved_count "
+        "FROM teacher_subscriptions JOIN batches ON batches.id = teacher_subscriptions.batch_id "
+        "WHERE batches.teacher_id = :teacher_id AND teacher_subscriptions.status = 'active'"
+    ),
+    "next due dates (summary refresh)": text(
+        "SELECT batch_id, min(next_billing_date) FROM teacher_subscriptions "
+        "WHERE batch_id IN (SELECT id FROM batches WHERE teacher_id = :teacher_id) AND status = 'active' "
+        "GROUP BY batch_id"
+    ),
+}
+
+
+def seed(engine, enrollments: int):
+    random.seed(42)
+    batch_count = max(enrollments // ENROLLMENTS_PER_BATCH, 1)
+    teacher_count = max(batch_count // BATCHES_PER_TEACHER, 1)
+    today = date.today()
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(batches.insert(), [{
+            "id": batch_id,
+            "name": f"Batch {batch_id}",
+            "teacher_id": (batch_id - 1) % teacher_count + 1,
+            "fees": float(random.choice([499, 500, 699, 999, 1500, 2500, 5000])),
+            "student_limit": random.randint(10, 120),
+            "approved_student_count": random.randint(0, 60)
+        } for batch_id in range(1, batch_count + 1)])
+        connection.execute(teacher_subscriptions.insert(), [{
+            "id": batch_id,
+            "batch_id": batch_id,
+            "status": "active" if random.random() < 0.9 else "cancelled",
+            "monthly_fee": 0,
+            "student_count": 0,
+            "start_date": today - timedelta(days=random.randint(0, 365)),
+            "end_date": None,
+            "next_billing_date": today + timedelta(days=random.randint(-10, 30))
+        } for batch_id in range(1, batch_count + 1)])
+        # Enrollments arrive over time, so one batch's rows are spread across the table
+        statuses = ["approved"] * 7 + ["pending"] * 2 + ["rejected"]
+        for start in range(0, enrollments, SEED_CHUNK):
+            connection.execute(batch_students.insert(), [{
+                "batch_id": random.randint(1, batch_count),
+                "student_id": random.randint(1, enrollments),
+                "status": random.choice(statuses)
+            } for _ in range(start, min(start + SEED_CHUNK, enrollments))])
+    return teacher_count, batch_count
+
+
+def _plan(connection, query, params) -> list:
+    if connection.dialect.name == "sqlite":
+        return [row[-1] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {query.text}"), params)]
+    return [row[0] for row in connection.execute(text(f"EXPLAIN {query.text}"), params)]
+
+
+def measure(engine, teacher_count: int, batch_count: int, runs: int) -> dict:
+    random.seed(7)
+    results = {}
+    with engine.connect() as connection:
+        for label, query in QUERIES.items():
+            samples = []
+            for _ in range(runs):
+                params = {"batch_id": random.randint(1, batch_count), "teacher_id": random.randint(1, teacher_count)}
+                started = time.perf_counter()
+                connection.execute(query, params).all()
+                samples.append(time.perf_counter() - started)
+            results[label] = (statistics.median(samples), _plan(connection, query, {"batch_id": 1, "teacher_id": 1}))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plan and latency of the hot subscription queries")
+    parser.add_argument("--url", default="sqlite:////tmp/covering_index_benchmark.db")
+    parser.add_argument("--enrollments", type=int, default=1000000)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--reseed", action="store_true")
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    with engine.connect() as connection:
+        seeded = engine.dialect.has_table(connection, "batch_students") and \
+            connection.execute(select(func.count()).select_from(batch_students)).scalar() == args.enrollments
+    if args.reseed or not seeded:
+        started = time.perf_counter()
+        seed(engine, args.enrollments)
+        print(f"seeded {args.enrollments} enrollments in {time.perf_counter() - started:.1f}s")
+    with engine.connect() as connection:
+        batch_count = connection.execute(select(func.count()).select_from(batches)).scalar()
+        teacher_count = connection.execute(select(func.max(batches.c.teacher_id))).scalar()
+
+    apply_covering_indexes(engine, drop=True)
+    before = measure(engine, teacher_count, batch_count, args.runs)
+    for name, seconds in apply_covering_indexes(engine):
+        print(f"created {name} in {seconds:.2f}s")
+    after = measure(engine, teacher_count, batch_count, args.runs)
+
+    print(f"\n{engine.dialect.name}: {args.enrollments} enrollments, {batch_count} batches, "
+          f"{teacher_count} teachers, median of {args.runs} runs")
+    for label in QUERIES:
+        (before_seconds, before_plan), (after_seconds, after_plan) = before[label], after[label]
+        print(f"\n{label}: {before_seconds * 1e3:.3f} ms -> {after_seconds * 1e3:.3f} ms")
+        print("  before: " + "\n          ".join(before_plan))
+        print("  after:  " + "\n          ".join(after_plan))
+
+
+if __name__ == "__main__":
+    main()
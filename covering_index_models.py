@@ -0,0 +1,34 @@
+# Covering Indexes for the Hot Subscription Predicates
+# Add these to your models.py (new databases pick them up from create_all; existing
+# databases get them from add_covering_indexes.py)
+
+from sqlalchemy import Index
+
+# Approved-student counts: WHERE batch_id = :id AND status = 'approved', counted
+# straight from the index without touching batch_students rows
+Index(
+    "ix_batch_students_batch_id_status",
+    BatchStudent.batch_id,
+    BatchStudent.status
+)
+
+# Active subscription of a batch, and the grouped MIN(next_billing_date) of the
+# summary refresh: WHERE batch_id IN (...) AND status = 'active'
+Index(
+    "ix_teacher_subscriptions_batch_id_status",
+    TeacherSubscription.batch_id,
+    TeacherSubscription.status,
+    TeacherSubscription.next_billing_date
+)
+
+# A teacher's batches with every column the calculate-all-batches page reads:
+# WHERE teacher_id = :id AND id > :after ORDER BY id, answered from the index alone
+Index(
+    "ix_batches_teacher_id_pricing",
+    Batch.teacher_id,
+    Batch.id,
+    Batch.fees,
+    Batch.student_limit,
+    Batch.approved_student_count,
+    Batch.name
+)
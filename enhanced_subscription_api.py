@@ -1,6 +1,43 @@
 # Enhanced Subscription Calculation API Endpoints
 # Add these to your main API file
 
+import logging
+
+from datetime import date, datetime
+
+from fast_json import fast_json
+from response_cache import cached_response
+from structured_logging import get_logger, install_log_listener, log_event
+from subscription_pricing import SubscriptionQuote, enhanced_subscription_fee_view, quote_response_body
+
+subscription_logger = get_logger("subscription")
+install_log_listener(app)
+
+SUBSCRIPTION_STATUS_SCHEMA = {
+    "has_subscription": bool,
+    "subscription_active": bool,
+    "subscriptions": [{
+        "subscription_id": int,
+        "batch_id": int,
+        "batch_name": str,
+        "monthly_fee": float,
+        "student_count": int,
+        "student_limit": int,
+        "batch_fees": float,
+        "commission_per_student": float,
+        "effective_student_count": int,
+        "start_date": (date, datetime),
+        "end_date": (date, datetime),
+        "next_billing_date": (date, datetime),
+        "is_due": bool,
+        "payment_status": str,
+        "minimum_met": bool
+    }],
+    "subscription_count": int,
+    "due_count": int,
+    "message": str
+}
+
 def calculate_subscription_fee(batch_fees: int, student_count: int, student_limit: int = None) -> dict:
     """
     Enhanced subscription fee calculation with improved logic:
@@ -9,38 +46,17 @@ def calculate_subscription_fee(batch_fees: int, student_count: int, student_limi
     - 7% of batch fees (if higher than ₹35)
     - Uses student_limit if provided, otherwise uses student_count
     """
-    min_students = 20
-    min_per_student = 35
-    commission_rate = 7  # 7%
-    
-    # Calculate 7% of batch fees per student
-    if batch_fees and batch_fees > 0:
-        commission_per_student = max(int(batch_fees * commission_rate / 100), min_per_student)
-    else:
-        commission_per_student = min_per_student
-    
-    # Use student_limit if provided, otherwise use student_count
-    effective_student_count = max(student_limit or student_count, min_students)
-    
-    # Calculate total subscription fee
-    total_subscription = commission_per_student * effective_student_count
-    
-    return {
-        "commission_per_student": commission_per_student,
-        "student_count": effective_student_count,
-        "total_subscription": total_subscription,
-        "minimum_met": (student_limit or student_count) >= min_students,
-        "batch_fees": batch_fees or 0,
-        "commission_rate": commission_rate,
-        "min_students": min_students,
-        "min_per_student": min_per_student
-    }
+    return enhanced_subscription_fee_view(batch_fees, student_count, student_limit)
+
+def quote_subscription_fee(batch_fees: int, student_count: int, student_limit: int = None) -> SubscriptionQuote:
+    """calculate_subscription_fee as a SubscriptionQuote (serialized once per distinct input)"""
+    return SubscriptionQuote("enhanced", batch_fees, student_count, student_limit)
 
 @app.get("/api/subscription/calculate/{batch_id}")
 async def calculate_batch_subscription(
     batch_id: int,
     db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(cached_get_current_user)
 ):
     """Enhanced subscription fee calculation for a batch"""
     if current_user["type"] != "teacher":
@@ -50,38 +66,30 @@ async def calculate_batch_subscription(
     if not batch:
         raise HTTPException(status_code=404, detail="Batch not found")
     
-    # Get current enrolled student count
-    current_student_count = db.query(models.BatchStudent).filter(
-        models.BatchStudent.batch_id == batch_id,
-        models.BatchStudent.status == models.JoinRequestStatus.approved
-    ).count()
+    # Approved student counter kept on the batch row
+    current_student_count = batch.approved_student_count
     
     # Calculate subscription fee with enhanced logic
-    subscription_data = calculate_subscription_fee(
+    quote = quote_subscription_fee(
         batch.fees or 0, 
         current_student_count, 
         batch.student_limit
     )
     
-    return {
+    return Response(content=quote_response_body({
         "batch_id": batch_id,
         "batch_name": batch.name,
         "batch_fees": batch.fees or 0,
         "student_limit": batch.student_limit or 0,
         "current_student_count": current_student_count,
-        "subscription_calculation": subscription_data,
-        "monthly_fee": subscription_data["total_subscription"],
-        "commission_per_student": subscription_data["commission_per_student"],
-        "effective_student_count": subscription_data["student_count"],
-        "minimum_met": subscription_data["minimum_met"],
-        "beta_testing_enabled": is_beta_testing_enabled(db)
-    }
+        "beta_testing_enabled": cached_is_beta_testing_enabled(db)
+    }, subscription_calculation=quote), media_type="application/json")
 
 @app.post("/api/teacher/subscription/recalculate/{batch_id}")
 async def recalculate_subscription_fee(
     batch_id: int,
     db: Session = Depends(get_db),
-    current_teacher: models.Teacher = Depends(get_current_teacher)
+    current_teacher: models.Teacher = Depends(cached_get_current_teacher)
 ):
     """Enhanced subscription fee recalculation for a batch"""
     # Verify batch belongs to teacher
@@ -93,57 +101,44 @@ async def recalculate_subscription_fee(
     if not batch:
         raise HTTPException(status_code=404, detail="Batch not found")
     
-    # Get current enrolled student count
-    current_student_count = db.query(models.BatchStudent).filter(
-        models.BatchStudent.batch_id == batch_id,
-        models.BatchStudent.status == models.JoinRequestStatus.approved
-    ).count()
-    
-    # Calculate subscription fee using enhanced logic
-    subscription_data = calculate_subscription_fee(
-        batch.fees or 0, 
-        current_student_count, 
-        batch.student_limit
+    # Count, price and store under a version check; concurrent calls share one computation
+    batch_fees = batch.fees or 0
+    student_limit = batch.student_limit
+    current_student_count, quote = await coalesced_subscription_recalculation(
+        batch_id,
+        lambda student_count: quote_subscription_fee(batch_fees, student_count, student_limit)
     )
     
-    # Update existing subscription if it exists
-    existing_subscription = db.query(models.TeacherSubscription).filter(
-        models.TeacherSubscription.batch_id == batch_id,
-        models.TeacherSubscription.status == "active"
-    ).first()
-    
-    if existing_subscription:
-        existing_subscription.monthly_fee = subscription_data["total_subscription"]
-        existing_subscription.student_count = current_student_count
-        db.commit()
-    
-    return {
+    return Response(content=quote_response_body({
         "batch_id": batch_id,
         "batch_name": batch.name,
         "batch_fees": batch.fees or 0,
         "student_limit": batch.student_limit or 0,
-        "current_student_count": current_student_count,
-        "subscription_calculation": subscription_data,
-        "monthly_fee": subscription_data["total_subscription"],
-        "commission_per_student": subscription_data["commission_per_student"],
-        "effective_student_count": subscription_data["student_count"],
-        "minimum_met": subscription_data["minimum_met"]
-    }
+        "current_student_count": current_student_count
+    }, subscription_calculation=quote), media_type="application/json")
 
 @app.get("/api/teacher/subscription/status")
+@cached_response(lambda db, current_teacher, **_: teacher_status_stamp(db, current_teacher.id))
+@fast_json(SUBSCRIPTION_STATUS_SCHEMA)
 def get_teacher_subscription_status_enhanced(
     db: Session = Depends(get_db), 
-    current_teacher: models.Teacher = Depends(get_current_teacher)
+    current_teacher: models.Teacher = Depends(cached_get_current_teacher)
 ):
     """Enhanced teacher subscription status with improved calculations"""
     try:
-        # Get teacher's subscriptions
-        subscriptions = db.query(models.TeacherSubscription).join(models.Batch).filter(
+        # Get teacher's subscriptions with their batch and approved-student count in one statement
+        rows = db.query(
+            models.TeacherSubscription,
+            models.Batch,
+            models.Batch.approved_student_count
+        ).join(
+            models.Batch, models.Batch.id == models.TeacherSubscription.batch_id
+        ).filter(
             models.Batch.teacher_id == current_teacher.id,
             models.TeacherSubscription.status == "active"
         ).all()
         
-        if not subscriptions:
+        if not rows:
             return {
                 "has_subscription": False,
                 "subscription_active": False,
@@ -155,17 +150,7 @@ def get_teacher_subscription_status_enhanced(
         
         # Process each subscription with enhanced calculations
         processed_subscriptions = []
-        for subscription in subscriptions:
-            batch = db.query(models.Batch).filter(models.Batch.id == subscription.batch_id).first()
-            if not batch:
-                continue
-                
-            # Get current student count
-            current_student_count = db.query(models.BatchStudent).filter(
-                models.BatchStudent.batch_id == subscription.batch_id,
-                models.BatchStudent.status == models.JoinRequestStatus.approved
-            ).count()
-            
+        for subscription, batch, current_student_count in rows:
             # Recalculate subscription fee with enhanced logic
             subscription_calculation = calculate_subscription_fee(
                 batch.fees or 0, 
@@ -176,7 +161,6 @@ def get_teacher_subscription_status_enhanced(
             # Check if subscription payment is due
             is_due = False
             if subscription.next_billing_date:
-                from datetime import date
                 current_date = date.today()
                 is_due = subscription.next_billing_date <= current_date
             
@@ -210,41 +194,24 @@ def get_teacher_subscription_status_enhanced(
         }
         
     except Exception as e:
-        print(f"Error getting subscription status: {str(e)}")
+        log_event(subscription_logger, logging.ERROR, "subscription_status_failed",
+                  exc_info=True, teacher_id=current_teacher.id, error=str(e))
         raise HTTPException(status_code=500, detail=f"Error getting subscription status: {str(e)}")
 
 @app.get("/api/teacher/subscription/metrics")
 def get_teacher_subscription_metrics_enhanced(
     db: Session = Depends(get_db), 
-    current_teacher: models.Teacher = Depends(get_current_teacher)
+    current_teacher: models.Teacher = Depends(cached_get_current_teacher)
 ):
     """Enhanced teacher subscription metrics with improved calculations"""
     try:
-        # Get all batches for this teacher
-        batches = db.query(models.Batch).filter(models.Batch.teacher_id == current_teacher.id).all()
+        # Read the maintained per-teacher totals instead of rescanning batches
+        summary = get_teacher_summary(db, current_teacher.id)
         
-        total_students = 0
-        total_batches = len(batches)
-        total_fees = 0
-        total_subscription_fees = 0
-        
-        for batch in batches:
-            # Count approved students
-            student_count = db.query(models.BatchStudent).filter(
-                models.BatchStudent.batch_id == batch.id,
-                models.BatchStudent.status == models.JoinRequestStatus.approved
-            ).count()
-            
-            total_students += student_count
-            total_fees += batch.fees or 0
-            
-            # Calculate subscription fee for this batch
-            subscription_calc = calculate_subscription_fee(
-                batch.fees or 0, 
-                student_count, 
-                batch.student_limit
-            )
-            total_subscription_fees += subscription_calc["total_subscription"]
+        total_students = summary.approved_count
+        total_batches = summary.total_batches
+        total_fees = summary.total_fees
+        total_subscription_fees = summary.total_subscription_fees
         
         # Calculate average fee per student
         average_fee_per_student = total_fees / total_students if total_students > 0 else 0
@@ -259,5 +226,6 @@ def get_teacher_subscription_metrics_enhanced(
         }
         
     except Exception as e:
-        print(f"Error getting subscription metrics: {str(e)}")
+        log_event(subscription_logger, logging.ERROR, "subscription_metrics_failed",
+                  exc_info=True, teacher_id=current_teacher.id, error=str(e))
         raise HTTPException(status_code=500, detail=f"Error getting subscription metrics: {str(e)}")
@@ -1,61 +1,28 @@
 # Enhanced Subscription Calculation with Real-Time Logic
 # Add this to your main API file
 
-def calculate_batch_subscription_fee(batch_fees: int, student_count: int, student_limit: int) -> dict:
+from subscription_pricing import DETAIL_PATTERN, SubscriptionQuote, batch_subscription_fee_view, quote_response_body
+
+def calculate_batch_subscription_fee(batch_fees: int, student_count: int, student_limit: int, detail: str = "full") -> dict:
     """
     Calculate subscription fee based on the correct logic:
     - Minimum ₹35 per student
     - 7% of batch fees (if higher than ₹35)
     - Uses student_limit for subscription calculation
-    - Shows real-time calculation breakdown
+    - Shows real-time calculation breakdown when detail="full"
     """
-    min_students = 20
-    min_per_student = 35
-    commission_rate = 7  # 7%
-    
-    # Calculate 7% of batch fees per student
-    seven_percent_amount = (batch_fees * commission_rate) / 100 if batch_fees > 0 else 0
-    
-    # Calculate commission per student: max(7% of batch fees, ₹35)
-    commission_per_student = max(seven_percent_amount, min_per_student)
-    
-    # Use student_limit for subscription calculation (minimum 20 students)
-    effective_student_count = max(student_limit, min_students)
-    
-    # Calculate total subscription fee
-    total_subscription = commission_per_student * effective_student_count
-    
-    # Determine which calculation was used
-    is_seven_percent_higher = seven_percent_amount > min_per_student
-    
-    return {
-        "commission_per_student": round(commission_per_student, 2),
-        "student_count": effective_student_count,
-        "total_subscription": round(total_subscription, 2),
-        "minimum_met": student_count >= min_students,
-        "batch_fees": batch_fees,
-        "commission_rate": commission_rate,
-        "seven_percent_amount": round(seven_percent_amount, 2),
-        "min_per_student": min_per_student,
-        "is_seven_percent_higher": is_seven_percent_higher,
-        "calculation_steps": {
-            "step1": f"7% of ₹{batch_fees} = ₹{round(seven_percent_amount, 2)}",
-            "step2": f"max(₹{round(seven_percent_amount, 2)}, ₹{min_per_student}) = ₹{round(commission_per_student, 2)}",
-            "step3": f"₹{round(commission_per_student, 2)} × {effective_student_count} students = ₹{round(total_subscription, 2)}"
-        },
-        "logic_explanation": f"Commission per student = max(7% of batch fees, ₹35). Total subscription = Commission per student × max(student_limit, 20 students). {'7% of fees is higher' if is_seven_percent_higher else 'Minimum ₹35 is higher'}.",
-        "batch_price_per_student": batch_fees,  # Show actual batch price
-        "commission_calculation": f"max({commission_rate}% of ₹{batch_fees}, ₹{min_per_student}) = ₹{round(commission_per_student, 2)} per student",
-        "total_calculation": f"₹{round(commission_per_student, 2)} × {effective_student_count} students = ₹{round(total_subscription, 2)}",
-        "current_students": student_count,  # Show actual current students
-        "subscription_based_on": f"teacher-set limit of {student_limit} students"  # Clarify what the calculation is based on
-    }
+    return batch_subscription_fee_view(batch_fees, student_count, student_limit, detail)
+
+def quote_batch_subscription_fee(batch_fees: int, student_count: int, student_limit: int, detail: str = "full") -> SubscriptionQuote:
+    """calculate_batch_subscription_fee as a SubscriptionQuote (serialized once per distinct input)"""
+    return SubscriptionQuote("batch", batch_fees, student_count, student_limit, detail)
 
 @app.get("/api/subscription/calculate/{batch_id}")
 async def calculate_batch_subscription(
     batch_id: int,
+    detail: str = Query("summary", pattern=DETAIL_PATTERN, description="full adds the explanation strings"),
     db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(cached_get_current_user)
 ):
     """Calculate subscription fee for a batch with real-time logic"""
     if current_user["type"] != "teacher":
@@ -65,38 +32,31 @@ async def calculate_batch_subscription(
     if not batch:
         raise HTTPException(status_code=404, detail="Batch not found")
     
-    # Get current enrolled student count
-    current_student_count = db.query(models.BatchStudent).filter(
-        models.BatchStudent.batch_id == batch_id,
-        models.BatchStudent.status == models.JoinRequestStatus.approved
-    ).count()
+    # Approved student counter kept on the batch row
+    current_student_count = batch.approved_student_count
     
     # Calculate subscription fee with enhanced logic
-    subscription_data = calculate_batch_subscription_fee(
+    quote = quote_batch_subscription_fee(
         batch.fees or 0, 
         current_student_count, 
-        batch.student_limit or 0
+        batch.student_limit or 0,
+        detail
     )
     
-    return {
+    return Response(content=quote_response_body({
         "batch_id": batch_id,
         "batch_name": batch.name,
         "batch_fees": batch.fees or 0,
         "student_limit": batch.student_limit or 0,
         "current_student_count": current_student_count,
-        "subscription_calculation": subscription_data,
-        "monthly_fee": subscription_data["total_subscription"],
-        "commission_per_student": subscription_data["commission_per_student"],
-        "effective_student_count": subscription_data["student_count"],
-        "minimum_met": subscription_data["minimum_met"],
-        "beta_testing_enabled": is_beta_testing_enabled(db)
-    }
+        "beta_testing_enabled": cached_is_beta_testing_enabled(db)
+    }, subscription_calculation=quote), media_type="application/json")
 
 @app.post("/api/teacher/subscription/recalculate/{batch_id}")
 async def recalculate_subscription_fee(
     batch_id: int,
     db: Session = Depends(get_db),
-    current_teacher: models.Teacher = Depends(get_current_teacher)
+    current_teacher: models.Teacher = Depends(cached_get_current_teacher)
 ):
     """Recalculate subscription fee for a batch with real-time logic"""
     # Verify batch belongs to teacher
@@ -108,50 +68,30 @@ async def recalculate_subscription_fee(
     if not batch:
         raise HTTPException(status_code=404, detail="Batch not found")
     
-    # Get current enrolled student count
-    current_student_count = db.query(models.BatchStudent).filter(
-        models.BatchStudent.batch_id == batch_id,
-        models.BatchStudent.status == models.JoinRequestStatus.approved
-    ).count()
-    
-    # Calculate subscription fee using enhanced logic
-    subscription_data = calculate_batch_subscription_fee(
-        batch.fees or 0, 
-        current_student_count, 
-        batch.student_limit or 0
+    # Count, price and store under a version check; concurrent calls share one computation
+    batch_fees = batch.fees or 0
+    student_limit = batch.student_limit or 0
+    current_student_count, quote = await coalesced_subscription_recalculation(
+        batch_id,
+        lambda student_count: quote_batch_subscription_fee(batch_fees, student_count, student_limit)
     )
     
-    # Update existing subscription if it exists
-    existing_subscription = db.query(models.TeacherSubscription).filter(
-        models.TeacherSubscription.batch_id == batch_id,
-        models.TeacherSubscription.status == "active"
-    ).first()
-    
-    if existing_subscription:
-        existing_subscription.monthly_fee = subscription_data["total_subscription"]
-        existing_subscription.student_count = current_student_count
-        db.commit()
-    
-    return {
+    return Response(content=quote_response_body({
         "batch_id": batch_id,
         "batch_name": batch.name,
         "batch_fees": batch.fees or 0,
         "student_limit": batch.student_limit or 0,
-        "current_student_count": current_student_count,
-        "subscription_calculation": subscription_data,
-        "monthly_fee": subscription_data["total_subscription"],
-        "commission_per_student": subscription_data["commission_per_student"],
-        "effective_student_count": subscription_data["student_count"],
-        "minimum_met": subscription_data["minimum_met"]
-    }
+        "current_student_count": current_student_count
+    }, subscription_calculation=quote), media_type="application/json")
 
 @app.get("/api/subscription/calculate-real-time")
 async def calculate_real_time_subscription_endpoint(
     batch_fees: int = Query(0, description="Batch fees in rupees"),
     student_limit: int = Query(0, description="Maximum number of students"),
     current_students: int = Query(0, description="Current number of enrolled students"),
+    detail: str = Query("summary", pattern=DETAIL_PATTERN, description="full adds the explanation strings"),
     db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(cached_get_current_user)
 ):
     """Calculate real-time subscription fee with detailed breakdown"""
     if current_user["type"] != "teacher":
@@ -166,11 +106,11 @@ async def calculate_real_time_subscription_endpoint(
         raise HTTPException(status_code=400, detail="Current students cannot be negative")
     
     # Calculate subscription
-    calculation = calculate_batch_subscription_fee(batch_fees, current_students, student_limit)
+    calculation = calculate_batch_subscription_fee(batch_fees, current_students, student_limit, detail)
     
     return {
         "success": True,
         "calculation": calculation,
-        "beta_testing_enabled": is_beta_testing_enabled(db),
+        "beta_testing_enabled": cached_is_beta_testing_enabled(db),
         "message": "Real-time subscription calculation completed"
     }
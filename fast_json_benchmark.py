@@ -0,0 +1,106 @@
+# Fast JSON Benchmark
+# Encoding time of 1k-batch status and calculate-all-batches payloads through FastAPI's
+# default path (jsonable_encoder + JSONResponse.render) against @fast_json's compiled
+# serializers (orjson, and the stdlib fallback)
+#
+# Usage: python fast_json_benchmark.py [batches]
+
+import random
+import sys
+import time
+import timeit
+from datetime import date, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import fast_json
+from bulk_subscription_pricing import iter_bulk_subscription_results
+from fast_json import compile_serializer
+
+# Only the leaf types matter to the compiled serializer
+STATUS_SCHEMA = {"subscriptions": [{"start_date": date, "end_date": date, "next_billing_date": date}]}
+ALL_BATCHES_SCHEMA = {"batch_calculations": [{"calculation": dict}]}
+
+
+def _status_payload(fees, limits, current) -> dict:
+    today = date.today()
+    subscriptions = [{
+        "subscription_id": index + 1,
+        "batch_id": index + 1,
+        "batch_name": f"Batch {index + 1}",
+        "monthly_fee": round(max(batch_fees * 0.07, 35) * max(student_limit, 20), 2),
+        "student_count": current_students,
+        "student_limit": student_limit,
+        "batch_fees": float(batch_fees),
+        "commission_per_student": round(max(batch_fees * 0.07, 35), 2),
+        "start_date": today - timedelta(days=index % 300),
+        "end_date": None,
+        "next_billing_date": today + timedelta(days=index % 30 - 10),
+        "is_due": index % 30 < 10,
+        "payment_status": "due" if index % 30 < 10 else "paid"
+    } for index, (batch_fees, student_limit, current_students) in enumerate(zip(fees, limits, current))]
+    return {
+        "has_subscription": True,
+        "subscription_active": True,
+        "subscriptions": subscriptions,
+        "subscription_count": len(subscriptions),
+        "due_count": sum(subscription["is_due"] for subscription in subscriptions),
+        "message": f"Teacher has {len(subscriptions)} active subscription(s)"
+    }
+
+
+def _all_batches_payload(fees, limits, current) -> dict:
+    calculations = list(iter_bulk_subscription_results(fees, limits, current, include_steps=True))
+    return {
+        "success": True,
+        "teacher_id": 1,
+        "total_batches": len(calculations),
+        "total_monthly_subscription": round(sum(calculation["total_subscription"] for calculation in calculations), 2),
+        "batch_calculations": [{
+            "batch_id": index + 1,
+            "batch_name": f"Batch {index + 1}",
+            "batch_fees": calculation["batch_fees"],
+            "student_limit": calculation["student_limit"],
+            "current_students": calculation["current_students"],
+            "calculation": calculation
+        } for index, calculation in enumerate(calculations)],
+        "beta_testing_enabled": False
+    }
+
+
+def _stdlib_serializer(schema):
+    orjson, fast_json.orjson = fast_json.orjson, None
+    try:
+        return compile_serializer(schema)
+    finally:
+        fast_json.orjson = orjson
+
+
+def _cpu_ms(function, repeat: int = 5) -> float:
+    return min(timeit.Timer(function, timer=time.process_time).repeat(repeat=repeat, number=1)) * 1e3
+
+
+def main(batches: int = 1000):
+    random.seed(42)
+    fees = [random.choice([499, 500, 699, 999, 1500, 2500, 5000]) for _ in range(batches)]
+    limits = [random.randint(10, 120) for _ in range(batches)]
+    current = [random.randint(0, limit) for limit in limits]
+    render = JSONResponse(None).render
+
+    print(f"{batches} batches (orjson {'installed' if fast_json.orjson else 'not installed'})")
+    print(f"{'payload':<22} {'default':>10} {'fast (stdlib)':>14} {'fast':>10} {'bytes':>8}")
+    for label, payload, schema in (
+        ("status", _status_payload(fees, limits, current), STATUS_SCHEMA),
+        ("calculate-all-batches", _all_batches_payload(fees, limits, current), ALL_BATCHES_SCHEMA)
+    ):
+        serializer = compile_serializer(schema)
+        stdlib_serializer = _stdlib_serializer(schema)
+        default_ms = _cpu_ms(lambda: render(jsonable_encoder(payload)))
+        stdlib_ms = _cpu_ms(lambda: stdlib_serializer(payload))
+        fast_ms = _cpu_ms(lambda: serializer(payload))
+        print(f"{label:<22} {default_ms:7.2f} ms {stdlib_ms:11.2f} ms {fast_ms:7.2f} ms {len(serializer(payload)):8d}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,123 @@
+# Feature Flag Cache
+# Add this to your main API file
+#
+# is_beta_testing_enabled(db) reads the settings table on every request. The cache
+# below keeps the value per worker process for BETA_FLAG_CACHE_TTL seconds. Workers
+# on the same host also watch a shared version-stamp file, so an admin toggle is
+# picked up by every worker on that host on its next request instead of after the TTL.
+# Each invalidation writes a fresh UUID into the stamp file and workers compare its
+# contents, not its mtime: two toggles inside one filesystem timestamp tick (or a clock
+# step backwards) would leave the mtime unchanged.
+#
+# The stamp file is host-local: with several hosts, the others keep serving the old
+# value until their TTL runs out, so BETA_FLAG_CACHE_TTL is the cross-host staleness
+# bound. Lower it (or share FEATURE_FLAG_VERSION_FILE over a common volume) if that is
+# too long.
+#
+# invalidate_beta_testing_flag() runs after every successful POST to the admin
+# endpoints that change the flag (BETA_FLAG_ADMIN_PATHS).
+
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+BETA_FLAG_CACHE_TTL = float(os.getenv("BETA_FLAG_CACHE_TTL", "60"))
+FEATURE_FLAG_VERSION_FILE = os.getenv(
+    "FEATURE_FLAG_VERSION_FILE",
+    os.path.join(tempfile.gettempdir(), "feature_flags.version")
+)
+BETA_FLAG_ADMIN_PATHS = ("/api/admin/subscription/toggle-beta", "/api/admin/subscription/update-config")
+
+
+class FeatureFlagCache:
+    """Process-local TTL cache for one flag, invalidated through a version-stamp file"""
+
+    def __init__(self, loader, ttl: float = BETA_FLAG_CACHE_TTL, version_file: str = FEATURE_FLAG_VERSION_FILE):
+        self.loader = loader
+        self.ttl = ttl
+        self.version_file = version_file
+        self._lock = threading.Lock()
+        self._value = None
+        self._expires_at = 0.0
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _read_version(self):
+        try:
+            with open(self.version_file) as version_file:
+                return version_file.read()
+        except FileNotFoundError:
+            return None
+
+    def get(self, db: Session = None):
+        version = self._read_version()
+        with self._lock:
+            if time.monotonic() < self._expires_at and version == self._version:
+                self.hits += 1
+                return self._value
+            self.misses += 1
+
+        value = self.loader(db)
+        with self._lock:
+            self._value = value
+            self._version = version
+            self._expires_at = time.monotonic() + self.ttl
+        return value
+
+    def invalidate(self, broadcast: bool = True):
+        """Drop the cached value here and, with broadcast, in every worker on this host"""
+        with self._lock:
+            self._expires_at = 0.0
+            self.invalidations += 1
+        if broadcast:
+            # Written aside and renamed into place, so readers never see a partial stamp
+            staged_file = f"{self.version_file}.{os.getpid()}.{threading.get_ident()}"
+            with open(staged_file, "w") as version_file:
+                version_file.write(uuid.uuid4().hex)
+            os.replace(staged_file, self.version_file)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+            "invalidations": self.invalidations,
+            "ttl_seconds": self.ttl
+        }
+
+
+def _load_beta_testing_flag(db: Session = None) -> bool:
+    # Handlers without a request session only open one on a cache miss
+    if db is not None:
+        return is_beta_testing_enabled(db)
+    db = SessionLocal()
+    try:
+        return is_beta_testing_enabled(db)
+    finally:
+        db.close()
+
+
+beta_flag_cache = FeatureFlagCache(_load_beta_testing_flag)
+
+
+def cached_is_beta_testing_enabled(db: Session = None) -> bool:
+    """Drop-in replacement for is_beta_testing_enabled(db) on request paths"""
+    return beta_flag_cache.get(db)
+
+
+def invalidate_beta_testing_flag():
+    """Call after an admin toggles beta testing"""
+    beta_flag_cache.invalidate()
+
+
+@app.middleware("http")
+async def invalidate_beta_flag_on_admin_change(request: Request, call_next):
+    response = await call_next(request)
+    if request.method == "POST" and request.url.path in BETA_FLAG_ADMIN_PATHS and response.status_code < 400:
+        invalidate_beta_testing_flag()
+    return response
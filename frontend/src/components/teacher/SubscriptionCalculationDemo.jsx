@@ -55,7 +55,8 @@ const SubscriptionCalculationDemo = () => {
         params: {
           batch_fees: realTimeCalculation.batchFees,
           student_limit: realTimeCalculation.studentLimit,
-          current_students: realTimeCalculation.currentStudents
+          current_students: realTimeCalculation.currentStudents,
+          detail: 'full'
         }
       });
       
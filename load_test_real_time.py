@@ -0,0 +1,89 @@
+# Load Test: /api/subscription/calculate-real-time
+# Replays keystroke-style traffic against a running API and reports throughput
+# and latency percentiles.
+#
+# Usage:
+#   python load_test_real_time.py --url http://localhost:9000 --token <teacher JWT> \
+#       --concurrency 32 --duration 20
+
+import argparse
+import http.client
+import random
+import threading
+import time
+from urllib.parse import urlencode, urlparse
+
+ENDPOINT = "/api/subscription/calculate-real-time"
+
+
+def _worker(base_url, token, deadline, latencies, errors, seed):
+    parsed = urlparse(base_url)
+    connection_class = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+    connection = connection_class(parsed.hostname, parsed.port, timeout=10)
+    headers = {"Authorization": f"Bearer {token}"}
+    rng = random.Random(seed)
+
+    while time.perf_counter() < deadline:
+        # A teacher typing a fee: 6, 69, 699, 6999 ... with a handful of limits
+        fees = int(str(rng.randint(1, 9)) * rng.randint(1, 4))
+        query = urlencode({
+            "batch_fees": fees,
+            "student_limit": rng.choice([20, 25, 30, 40, 50]),
+            "current_students": rng.randint(0, 20)
+        })
+        started = time.perf_counter()
+        try:
+            connection.request("GET", f"{ENDPOINT}?{query}", headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            connection.close()
+            connection = connection_class(parsed.hostname, parsed.port, timeout=10)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+    connection.close()
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the calculate-real-time endpoint")
+    parser.add_argument("--url", default="http://localhost:9000")
+    parser.add_argument("--token", required=True, help="Bearer token of a teacher account")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds to run")
+    args = parser.parse_args()
+
+    latencies, errors = [], []
+    deadline = time.perf_counter() + args.duration
+    threads = [
+        threading.Thread(target=_worker, args=(args.url, args.token, deadline, latencies, errors, seed))
+        for seed in range(args.concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"requests:    {len(latencies)} ok, {len(errors)} failed in {elapsed:.1f}s")
+    print(f"throughput:  {len(latencies) / elapsed:,.0f} req/s")
+    for label, fraction in (("p50", 0.50), ("p90", 0.90), ("p99", 0.99)):
+        print(f"latency {label}: {_percentile(latencies, fraction) * 1000:.2f} ms")
+    if errors:
+        print(f"first errors: {errors[:5]}")
+
+
+if __name__ == "__main__":
+    main()
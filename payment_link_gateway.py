@@ -0,0 +1,201 @@
+# Non-blocking Razorpay Payment Links
+# Add this to your main API file
+#
+# razorpay_client.payment_link.create() is a blocking HTTP call. Calling it directly
+# inside an async endpoint stalls the event loop for the whole round trip, so it runs
+# on a bounded thread pool here (the SDK's requests session pools connections).
+# Every link carries a reference_id derived from the teacher and batch data, which
+# Razorpay enforces as unique, so retries and double-clicks never create two links.
+#
+# Gateways raise the PaymentGateway* errors below: RazorpayPaymentLinkGateway maps the
+# SDK's exceptions onto them (and imports the SDK only when it is first used), so the
+# retry logic and StubPaymentLinkGateway work without razorpay installed.
+# Set PAYMENT_GATEWAY_MODE=stub to use StubPaymentLinkGateway (offline development/tests).
+
+import asyncio
+import hashlib
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+RAZORPAY_MAX_WORKERS = int(os.getenv("RAZORPAY_MAX_WORKERS", "8"))
+RAZORPAY_MAX_ATTEMPTS = int(os.getenv("RAZORPAY_MAX_ATTEMPTS", "3"))
+RAZORPAY_BACKOFF_SECONDS = float(os.getenv("RAZORPAY_BACKOFF_SECONDS", "0.5"))
+PAYMENT_GATEWAY_MODE = os.getenv("PAYMENT_GATEWAY_MODE", "razorpay")
+
+payment_link_executor = ThreadPoolExecutor(max_workers=RAZORPAY_MAX_WORKERS, thread_name_prefix="razorpay")
+
+
+class PaymentGatewayError(Exception):
+    """The gateway rejected a payment-link call"""
+
+
+class PaymentGatewayUnavailable(PaymentGatewayError):
+    """Server-side or network failure; the call may be retried"""
+
+
+class DuplicateReferenceError(PaymentGatewayError):
+    """A payment link with this reference_id already exists"""
+
+    def __init__(self, reference_id: str):
+        super().__init__(f"Payment link reference_id already exists: {reference_id}")
+        self.reference_id = reference_id
+
+
+class RazorpayPaymentLinkGateway:
+    """razorpay_client.payment_link with the SDK's exceptions mapped onto the PaymentGateway* errors"""
+
+    def __init__(self, payment_link):
+        self.payment_link = payment_link
+
+    @staticmethod
+    def _retryable_errors() -> tuple:
+        import razorpay
+        import requests
+        return (
+            razorpay.errors.ServerError,
+            razorpay.errors.GatewayError,
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout
+        )
+
+    def create(self, data: dict) -> dict:
+        import razorpay
+        try:
+            return self.payment_link.create(data)
+        except razorpay.errors.BadRequestError as e:
+            # The SDK keeps only the error code and description, not the offending field,
+            # so a rejected create is a duplicate exactly when its reference_id is taken
+            reference_id = data.get("reference_id")
+            if reference_id and self.all({"reference_id": reference_id}).get("payment_links"):
+                raise DuplicateReferenceError(reference_id) from e
+            raise PaymentGatewayError(str(e)) from e
+        except self._retryable_errors() as e:
+            raise PaymentGatewayUnavailable(str(e)) from e
+
+    def all(self, options: dict = None) -> dict:
+        import razorpay
+        try:
+            return self.payment_link.all(options or {})
+        except razorpay.errors.BadRequestError as e:
+            raise PaymentGatewayError(str(e)) from e
+        except self._retryable_errors() as e:
+            raise PaymentGatewayUnavailable(str(e)) from e
+
+
+class StubPaymentLinkGateway:
+    """
+    Offline stand-in for razorpay_client.payment_link:
+    - Enforces unique reference_id like Razorpay
+    - fail_next=N makes the next N create() calls raise PaymentGatewayUnavailable
+    """
+
+    def __init__(self, latency: float = 0.0, fail_next: int = 0):
+        self.latency = latency
+        self.fail_next = fail_next
+        self.created = {}
+        self.create_calls = 0
+        self._lock = threading.Lock()
+
+    def create(self, data: dict) -> dict:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.create_calls += 1
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                raise PaymentGatewayUnavailable("Stub gateway: simulated server error")
+            reference_id = data.get("reference_id")
+            if reference_id in self.created:
+                raise DuplicateReferenceError(reference_id)
+            link_id = f"plink_stub_{uuid.uuid4().hex[:14]}"
+            link = {
+                "id": link_id,
+                "short_url": f"https://rzp.io/stub/{link_id}",
+                "status": "created",
+                "amount": data["amount"],
+                "currency": data.get("currency", "INR"),
+                "reference_id": reference_id,
+                "notes": data.get("notes", {})
+            }
+            self.created[reference_id] = link
+            return link
+
+    def all(self, options: dict = None) -> dict:
+        reference_id = (options or {}).get("reference_id")
+        with self._lock:
+            links = [link for key, link in self.created.items() if reference_id in (None, key)]
+        return {"payment_links": links}
+
+
+stub_payment_link_gateway = StubPaymentLinkGateway()
+
+
+def get_payment_link_gateway():
+    if PAYMENT_GATEWAY_MODE == "stub":
+        return stub_payment_link_gateway
+    return RazorpayPaymentLinkGateway(razorpay_client.payment_link)
+
+
+def payment_link_idempotency_key(teacher_id: int, batch_name: str, batch_subject: str,
+                                 batch_fees, student_limit: int, amount) -> str:
+    """Stable key for one teacher/batch/amount combination (fits Razorpay's 40-char reference_id)"""
+    raw = "|".join(str(value) for value in (teacher_id, batch_name, batch_subject, batch_fees, student_limit, amount))
+    return "bc_" + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def _find_existing_link(gateway, reference_id: str):
+    links = gateway.all({"reference_id": reference_id}).get("payment_links", [])
+    return links[0] if links else None
+
+
+def _create_payment_link_with_retry(gateway, payment_link_data: dict) -> dict:
+    """Blocking create with bounded retries and jittered exponential backoff"""
+    reference_id = payment_link_data["reference_id"]
+    for attempt in range(1, RAZORPAY_MAX_ATTEMPTS + 1):
+        try:
+            return gateway.create(payment_link_data)
+        except DuplicateReferenceError:
+            # An earlier attempt (or request) already created this link
+            existing = _find_existing_link(gateway, reference_id)
+            if existing and existing.get("status") == "created":
+                return existing
+            # The earlier link was paid, cancelled or expired: issue a fresh one
+            reference_id = f"{reference_id[:32]}_{uuid.uuid4().hex[:7]}"
+            payment_link_data = {**payment_link_data, "reference_id": reference_id}
+        except PaymentGatewayUnavailable:
+            if attempt == RAZORPAY_MAX_ATTEMPTS:
+                raise
+            delay = RAZORPAY_BACKOFF_SECONDS * (2 ** (attempt - 1))
+            time.sleep(delay + random.uniform(0, delay / 2))
+
+    # Only reached when the last attempt had to switch to a fresh reference_id
+    return gateway.create(payment_link_data)
+
+
+_in_flight_payment_links = {}
+
+
+async def create_payment_link_async(payment_link_data: dict, idempotency_key: str, gateway=None) -> dict:
+    """
+    Create a payment link without blocking the event loop.
+    Concurrent calls with the same key share one gateway call.
+    """
+    gateway = gateway or get_payment_link_gateway()
+    payment_link_data = {**payment_link_data, "reference_id": idempotency_key}
+
+    in_flight = _in_flight_payment_links.get(idempotency_key)
+    if in_flight is not None:
+        return await asyncio.shield(in_flight)
+
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(payment_link_executor, _create_payment_link_with_retry, gateway, payment_link_data)
+    _in_flight_payment_links[idempotency_key] = future
+    try:
+        return await asyncio.shield(future)
+    finally:
+        if _in_flight_payment_links.get(idempotency_key) is future:
+            del _in_flight_payment_links[idempotency_key]
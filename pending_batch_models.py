@@ -0,0 +1,31 @@
+# Pending Batch Model
+# Add this model to your models.py
+
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, String, Text
+
+
+class PendingBatch(Base):
+    """Batch waiting for its subscription payment before it becomes a real Batch row"""
+    __tablename__ = "pending_batches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    payment_link_id = Column(String(64), unique=True, nullable=False, index=True)
+    reference_id = Column(String(40), nullable=False)
+    teacher_id = Column(Integer, ForeignKey("teachers.id"), nullable=False, index=True)
+    name = Column(String, nullable=False)
+    subject = Column(String, nullable=True)
+    description = Column(Text, nullable=True)
+    fees = Column(Float, nullable=True)
+    student_limit = Column(Integer, nullable=False)
+    subscription_fee = Column(Float, nullable=False)
+    status = Column(String(16), nullable=False, default="pending")  # pending, promoted, expired
+    payment_id = Column(String(64), nullable=True)
+    batch_id = Column(Integer, ForeignKey("batches.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    promoted_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_pending_batches_status_expires_at", "status", "expires_at"),
+    )
@@ -0,0 +1,186 @@
+# Pending Batch Store for Payment-First Batch Creation
+# Add this to your main API file
+#
+# When beta testing is off, create_batch_with_payment saves the requested batch as a
+# models.PendingBatch keyed by the Razorpay payment-link ID. /api/batch-creation/callback
+# promotes it into a models.Batch row exactly once, however many times Razorpay (or the
+# browser) delivers the callback. Unpaid requests are expired by a background sweeper;
+# run it on exactly one worker with PENDING_BATCH_SWEEPER_ENABLED=true.
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+
+from structured_logging import get_logger, log_event
+
+PENDING_BATCH_SWEEPER_ENABLED = os.getenv("PENDING_BATCH_SWEEPER_ENABLED", "false").lower() == "true"
+PENDING_BATCH_TTL_MINUTES = int(os.getenv("PENDING_BATCH_TTL_MINUTES", "1440"))
+PENDING_BATCH_SWEEP_INTERVAL_SECONDS = int(os.getenv("PENDING_BATCH_SWEEP_INTERVAL_SECONDS", "900"))
+FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
+
+batch_creation_logger = get_logger("batch_creation")
+
+
+def pending_batch_expiry() -> datetime:
+    return datetime.utcnow() + timedelta(minutes=PENDING_BATCH_TTL_MINUTES)
+
+
+def razorpay_expire_by(expires_at: datetime) -> int:
+    """Unix timestamp for the payment link's expire_by, from a naive UTC datetime"""
+    return int((expires_at - datetime(1970, 1, 1)).total_seconds())
+
+
+def save_pending_batch(db: Session, payment_link: dict, batch_data: dict, expires_at: datetime):
+    """Store the batch awaiting payment; a repeated link (idempotent retry) reuses the row"""
+    pending = db.query(models.PendingBatch).filter(
+        models.PendingBatch.payment_link_id == payment_link["id"]
+    ).first()
+    if pending is not None:
+        return pending
+
+    pending = models.PendingBatch(
+        payment_link_id=payment_link["id"],
+        reference_id=payment_link.get("reference_id", ""),
+        teacher_id=batch_data["teacher_id"],
+        name=batch_data["name"],
+        subject=batch_data["subject"],
+        description=batch_data.get("description"),
+        fees=batch_data.get("fees"),
+        student_limit=batch_data["max_students"],
+        subscription_fee=batch_data["subscription_fee"],
+        status="pending",
+        expires_at=expires_at
+    )
+    db.add(pending)
+    db.commit()
+    db.refresh(pending)
+    return pending
+
+
+def promote_pending_batch(db: Session, payment_link_id: str, payment_id: str = None):
+    """
+    Turn a paid pending batch into a Batch row, at most once:
+    - The conditional UPDATE is the claim; a duplicate delivery waits on the row lock
+      and then matches nothing, so it only reads back the already-created batch
+    - Expired rows are still promoted, since the payment did go through
+    Returns (pending, created) or (None, False) for unknown links.
+    """
+    claimed = db.query(models.PendingBatch).filter(
+        models.PendingBatch.payment_link_id == payment_link_id,
+        models.PendingBatch.status.in_(["pending", "expired"])
+    ).update({
+        "status": "promoted",
+        "payment_id": payment_id,
+        "promoted_at": datetime.utcnow()
+    }, synchronize_session=False)
+
+    pending = db.query(models.PendingBatch).filter(
+        models.PendingBatch.payment_link_id == payment_link_id
+    ).first()
+    if pending is None or not claimed:
+        db.rollback()
+        return pending, False
+
+    new_batch = models.Batch(
+        name=pending.name,
+        subject=pending.subject,
+        description=pending.description,
+        fees=pending.fees,
+        student_limit=pending.student_limit,
+        teacher_id=pending.teacher_id
+    )
+    db.add(new_batch)
+    db.flush()
+    pending.batch_id = new_batch.id
+    record_batch_change(db, new_batch)
+    db.commit()
+    return pending, True
+
+
+def sweep_expired_pending_batches(db: Session) -> int:
+    """Mark unpaid pending batches past their expiry as expired (one indexed UPDATE)"""
+    expired = db.query(models.PendingBatch).filter(
+        models.PendingBatch.status == "pending",
+        models.PendingBatch.expires_at < datetime.utcnow()
+    ).update({"status": "expired"}, synchronize_session=False)
+    db.commit()
+    return expired
+
+
+def _sweep_expired_pending_batches_in_new_session() -> int:
+    db = SessionLocal()
+    try:
+        return sweep_expired_pending_batches(db)
+    finally:
+        db.close()
+
+
+async def _pending_batch_sweeper():
+    while True:
+        await asyncio.sleep(PENDING_BATCH_SWEEP_INTERVAL_SECONDS)
+        try:
+            await asyncio.to_thread(_sweep_expired_pending_batches_in_new_session)
+        except Exception as e:
+            log_event(batch_creation_logger, logging.ERROR, "pending_batch_sweep_failed", exc_info=True, error=str(e))
+
+
+@app.on_event("startup")
+async def start_pending_batch_sweeper():
+    if PENDING_BATCH_SWEEPER_ENABLED:
+        asyncio.create_task(_pending_batch_sweeper())
+
+
+@app.get("/api/batch-creation/callback")
+def batch_creation_payment_callback(
+    razorpay_payment_id: str = Query(...),
+    razorpay_payment_link_id: str = Query(...),
+    razorpay_payment_link_reference_id: str = Query(""),
+    razorpay_payment_link_status: str = Query(...),
+    razorpay_signature: str = Query(...),
+    db: Session = Depends(get_db)
+):
+    """Razorpay redirect after the batch-creation subscription payment"""
+    if PAYMENT_GATEWAY_MODE != "stub":
+        try:
+            razorpay_client.utility.verify_payment_link_signature({
+                "payment_link_id": razorpay_payment_link_id,
+                "payment_link_reference_id": razorpay_payment_link_reference_id,
+                "payment_link_status": razorpay_payment_link_status,
+                "razorpay_payment_id": razorpay_payment_id,
+                "razorpay_signature": razorpay_signature
+            })
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid payment signature")
+
+    if razorpay_payment_link_status != "paid":
+        return RedirectResponse(f"{FRONTEND_URL}/teacher/dashboard?batch_payment=failed")
+
+    pending, _ = promote_pending_batch(db, razorpay_payment_link_id, razorpay_payment_id)
+    if pending is None:
+        raise HTTPException(status_code=404, detail="Pending batch not found for this payment")
+
+    return RedirectResponse(f"{FRONTEND_URL}/teacher/dashboard?batch_payment=success")
+
+
+@app.get("/api/teacher/batch-creation/status/{payment_link_id}")
+def get_batch_creation_status(
+    payment_link_id: str,
+    db: Session = Depends(get_db),
+    current_teacher: models.Teacher = Depends(cached_get_current_teacher)
+):
+    """Polled by AddBatchDialog after returning from the payment page"""
+    pending = db.query(models.PendingBatch).filter(
+        models.PendingBatch.payment_link_id == payment_link_id,
+        models.PendingBatch.teacher_id == current_teacher.id
+    ).first()
+    if pending is None:
+        raise HTTPException(status_code=404, detail="Batch creation request not found")
+
+    return {
+        "batch_created": pending.status == "promoted",
+        "status": pending.status,
+        "batch_id": pending.batch_id,
+        "batch_name": pending.name,
+        "expires_at": pending.expires_at
+    }
@@ -0,0 +1,144 @@
+# Principal Cache
+# Process-local cache of resolved principals (the current_user dict and the Teacher
+# row) for cached_auth.py. Entries are keyed by the SHA-256 of the bearer token, never
+# the token itself, and are only stored after get_current_user has verified it. An
+# entry lives for PRINCIPAL_CACHE_TTL seconds or until the token expires, whichever
+# comes first.
+#
+# Entries are also indexed by subject ("<type>:<sub>" from the token claims), so a
+# password or account-status change drops every token of that user. As in
+# feature_flag_cache.py, invalidations write a fresh UUID into a shared version-stamp
+# file; other workers on the host see different contents on their next lookup and drop
+# their whole cache.
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+PRINCIPAL_CACHE_VERSION_FILE = os.getenv(
+    "PRINCIPAL_CACHE_VERSION_FILE",
+    os.path.join(tempfile.gettempdir(), "principal_cache.version")
+)
+
+
+def token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def principal_subject(user_type: str, sub) -> str:
+    return f"{user_type}:{sub}"
+
+
+class PrincipalCache:
+    """TTL + LRU cache of (kind, token hash) -> principal, indexed by subject"""
+
+    def __init__(self, ttl: float = PRINCIPAL_CACHE_TTL, max_entries: int = PRINCIPAL_CACHE_MAX_ENTRIES,
+                 version_file: str = PRINCIPAL_CACHE_VERSION_FILE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version_file = version_file
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (kind, token hash) -> (principal, subject, expires_at)
+        self._subjects = {}  # subject -> {(kind, token hash)}
+        self._version = self._read_version()
+        self.hits = {}
+        self.misses = {}
+        self.invalidations = 0
+        self.evictions = 0
+
+    def _read_version(self):
+        try:
+            with open(self.version_file) as version_file:
+                return version_file.read()
+        except FileNotFoundError:
+            return None
+
+    def _drop(self, key):
+        _, subject, _ = self._entries.pop(key)
+        keys = self._subjects.get(subject)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._subjects[subject]
+
+    def get(self, kind: str, hashed_token: str):
+        version = self._read_version()
+        key = (kind, hashed_token)
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._subjects.clear()
+                self._version = version
+            entry = self._entries.get(key)
+            if entry is not None and time.time() < entry[2]:
+                self._entries.move_to_end(key)
+                self.hits[kind] = self.hits.get(kind, 0) + 1
+                return entry[0]
+            if entry is not None:
+                self._drop(key)
+            self.misses[kind] = self.misses.get(kind, 0) + 1
+            return None
+
+    def put(self, kind: str, hashed_token: str, subject: str, principal, token_expires_at: float = None):
+        expires_at = time.time() + self.ttl
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        key = (kind, hashed_token)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (principal, subject, expires_at)
+            self._subjects.setdefault(subject, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_token(self, hashed_token: str, broadcast: bool = True):
+        """Drop every cached principal of one token (logout)"""
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == hashed_token]:
+                self._drop(key)
+            self.invalidations += 1
+        if broadcast:
+            self._broadcast()
+
+    def invalidate_subject(self, subject: str, broadcast: bool = True):
+        """Drop every cached principal of one user (password or account-status change)"""
+        with self._lock:
+            for key in list(self._subjects.get(subject, ())):
+                self._drop(key)
+            self.invalidations += 1
+        if broadcast:
+            self._broadcast()
+
+    def _broadcast(self):
+        version = uuid.uuid4().hex
+        # Written aside and renamed into place, so readers never see a partial stamp
+        staged_file = f"{self.version_file}.{os.getpid()}.{threading.get_ident()}"
+        with open(staged_file, "w") as version_file:
+            version_file.write(version)
+        os.replace(staged_file, self.version_file)
+        with self._lock:
+            self._version = version
+
+    def stats(self) -> dict:
+        hits = sum(self.hits.values())
+        lookups = hits + sum(self.misses.values())
+        return {
+            "hits": dict(self.hits),
+            "misses": dict(self.misses),
+            "hit_rate": round(hits / lookups, 4) if lookups else 0,
+            "entries": len(self._entries),
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "ttl_seconds": self.ttl
+        }
+
+
+principal_cache = PrincipalCache()
@@ -0,0 +1,97 @@
+# Query Count Instrumentation
+# Add this to your main API file (engine is the app's SQLAlchemy engine)
+#
+# Counts and times every SQL statement a request sends to the database - from its
+# dependencies (cached_get_current_teacher, ...), the handler and anything the handler
+# calls - and reports:
+# - an X-Query-Count header on the response
+# - per-route totals in query_count_stats
+# The middleware gives each request its own RequestQueries through a context variable;
+# sync handlers and dependencies run in the threadpool with a copy of that context, so
+# their statements are counted too. A streamed body's statements run after the
+# headers are sent and are not included.
+#
+# These two listeners are the only per-request statement hooks on engine:
+# request_profiling.py reads the same RequestQueries through track_request_queries().
+
+import contextvars
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+# Per-route totals: {route: {"requests": n, "queries": total, "max_queries": m}}
+query_count_stats = {}
+
+
+class RequestQueries:
+    """Statements run by one request; statements collects their text when set to a list"""
+    __slots__ = ("count", "db_seconds", "statements", "max_statements")
+
+    def __init__(self):
+        self.count = 0
+        self.db_seconds = 0.0
+        self.statements = None
+        self.max_statements = 0
+
+
+_request_queries = contextvars.ContextVar("request_queries", default=None)
+
+
+@contextmanager
+def track_request_queries():
+    """RequestQueries of the current request; nested calls share the outermost one"""
+    queries = _request_queries.get()
+    if queries is not None:
+        yield queries
+        return
+    queries = RequestQueries()
+    token = _request_queries.set(queries)
+    try:
+        yield queries
+    finally:
+        _request_queries.reset(token)
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _count_request_statement(conn, cursor, statement, parameters, context, executemany):
+    queries = _request_queries.get()
+    if queries is not None:
+        queries.count += 1
+        conn.info.setdefault("request_query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _time_request_statement(conn, cursor, statement, parameters, context, executemany):
+    queries = _request_queries.get()
+    if queries is None:
+        return
+    elapsed = time.perf_counter() - conn.info["request_query_started"].pop()
+    queries.db_seconds += elapsed
+    if queries.statements is not None and len(queries.statements) < queries.max_statements:
+        # Only the statement text is kept: bound parameters are counted, never recorded
+        parameter_count = len(parameters) if isinstance(parameters, (list, tuple, dict)) else 0
+        queries.statements.append({
+            "sql": " ".join(statement.split()),
+            "parameters": f"<{parameter_count} redacted>",
+            "ms": round(elapsed * 1000, 2)
+        })
+
+
+@app.middleware("http")
+async def report_query_count(request: Request, call_next):
+    with track_request_queries() as queries:
+        response = await call_next(request)
+        request_count = queries.count
+
+    route = request.scope.get("route")
+    # Unmatched paths share one entry so scanners cannot grow the dict
+    route_stats = query_count_stats.setdefault(
+        route.path if route is not None else "unmatched", {"requests": 0, "queries": 0, "max_queries": 0}
+    )
+    route_stats["requests"] += 1
+    route_stats["queries"] += request_count
+    route_stats["max_queries"] = max(route_stats["max_queries"], request_count)
+
+    response.headers["X-Query-Count"] = str(request_count)
+    return response
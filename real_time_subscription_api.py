@@ -1,63 +1,84 @@
 # Real-Time Subscription Calculation API Endpoints
 # Add these to your main API file
 
-def calculate_real_time_subscription(batch_fees: int, student_limit: int, current_students: int = 0) -> dict:
+import base64
+import json
+from functools import lru_cache
+from typing import Optional
+
+from bulk_subscription_pricing import iter_bulk_subscription_results
+from fast_json import compile_serializer, fast_json
+from subscription_pricing import DETAIL_PATTERN, SubscriptionQuote, quote_response_body, real_time_subscription_view
+
+ALL_BATCHES_PAGE_SIZE = 200
+ALL_BATCHES_MAX_PAGE_SIZE = 1000
+ALL_BATCHES_STREAM_CHUNK_SIZE = 500
+STREAM_PATTERN = "^(json|ndjson)$"
+
+BATCH_CALCULATION_SCHEMA = {
+    "batch_id": int,
+    "batch_name": str,
+    "batch_fees": float,
+    "student_limit": int,
+    "current_students": int,
+    "calculation": dict  # real-time calculation shape, plain JSON values
+}
+
+# Whole-list and paginated responses
+ALL_BATCHES_CALCULATION_SCHEMA = {
+    "success": bool,
+    "teacher_id": int,
+    "total_batches": int,
+    "total_monthly_subscription": float,
+    "page_batches": int,
+    "page_monthly_subscription": float,
+    "batch_calculations": [BATCH_CALCULATION_SCHEMA],
+    "next_cursor": str,
+    "has_more": bool,
+    "beta_testing_enabled": bool
+}
+
+_encode_batch_calculation = compile_serializer(BATCH_CALCULATION_SCHEMA)
+
+def calculate_real_time_subscription(batch_fees: int, student_limit: int, current_students: int = 0, detail: str = "full") -> dict:
     """
     Real-time subscription calculation with proper max(35, 7% of fees) logic:
     - Minimum ₹35 per student
     - 7% of batch fees (if higher than ₹35)
     - Uses student_limit for subscription calculation
-    - Shows step-by-step calculation
+    - Shows step-by-step calculation when detail="full"
     """
-    min_per_student = 35
-    commission_rate = 7  # 7%
-    min_students = 20
-    
-    # Calculate 7% of batch fees
-    seven_percent_amount = (batch_fees * commission_rate) / 100 if batch_fees > 0 else 0
-    
-    # Calculate commission per student: max(7% of batch fees, ₹35)
-    commission_per_student = max(seven_percent_amount, min_per_student)
-    
-    # Use student_limit for subscription calculation (minimum 20 students)
-    effective_student_count = max(student_limit, min_students)
-    
-    # Calculate total subscription
-    total_subscription = commission_per_student * effective_student_count
-    
-    # Determine which calculation was used
-    is_seven_percent_higher = seven_percent_amount > min_per_student
-    
-    return {
-        "batch_fees": batch_fees,
-        "student_limit": student_limit,
-        "current_students": current_students,
-        "seven_percent_amount": round(seven_percent_amount, 2),
-        "min_per_student": min_per_student,
-        "commission_per_student": round(commission_per_student, 2),
-        "effective_student_count": effective_student_count,
-        "total_subscription": round(total_subscription, 2),
-        "is_seven_percent_higher": is_seven_percent_higher,
-        "calculation_steps": {
-            "step1": f"7% of ₹{batch_fees} = ₹{round(seven_percent_amount, 2)}",
-            "step2": f"max(₹{round(seven_percent_amount, 2)}, ₹{min_per_student}) = ₹{round(commission_per_student, 2)}",
-            "step3": f"₹{round(commission_per_student, 2)} × {effective_student_count} students = ₹{round(total_subscription, 2)}"
-        },
-        "logic_explanation": f"Commission per student = max(7% of batch fees, ₹35). Total subscription = Commission per student × max(student_limit, 20 students). {'7% of fees is higher' if is_seven_percent_higher else 'Minimum ₹35 is higher'}."
-    }
+    return real_time_subscription_view(batch_fees, student_limit, current_students, detail)
+
+def quote_real_time_subscription(batch_fees: int, student_limit: int, current_students: int = 0, detail: str = "full") -> SubscriptionQuote:
+    """calculate_real_time_subscription as a SubscriptionQuote (serialized once per distinct input)"""
+    return SubscriptionQuote("real_time", batch_fees, current_students, student_limit, detail)
+
+@lru_cache(maxsize=4096)
+def _real_time_response_body(batch_fees: int, student_limit: int, current_students: int, beta_enabled: bool,
+                             detail: str) -> bytes:
+    """Serialized calculate-real-time response, memoized per input tuple"""
+    return json.dumps({
+        "success": True,
+        "calculation": calculate_real_time_subscription(batch_fees, student_limit, current_students, detail),
+        "beta_testing_enabled": beta_enabled,
+        "message": "Real-time subscription calculation completed"
+    }, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
 
 @app.get("/api/subscription/calculate-real-time")
 async def calculate_real_time_subscription_endpoint(
     batch_fees: int = Query(0, description="Batch fees in rupees"),
     student_limit: int = Query(0, description="Maximum number of students"),
     current_students: int = Query(0, description="Current number of enrolled students"),
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    detail: str = Query("summary", pattern=DETAIL_PATTERN, description="full adds the explanation strings"),
+    claims: dict = Depends(get_teacher_token_claims)
 ):
-    """Calculate real-time subscription fee with detailed breakdown"""
-    if current_user["type"] != "teacher":
-        raise HTTPException(status_code=403, detail="Access denied: requires teacher role")
-    
+    """
+    Calculate real-time subscription fee with detailed breakdown.
+    Called on every keystroke, so it runs without a DB session: the token is
+    validated statelessly, the beta flag comes from the process cache and the
+    serialized response is memoized per (fees, limit, current) tuple.
+    """
     # Validate inputs
     if batch_fees < 0:
         raise HTTPException(status_code=400, detail="Batch fees cannot be negative")
@@ -66,21 +87,17 @@ async def calculate_real_time_subscription_endpoint(
     if current_students < 0:
         raise HTTPException(status_code=400, detail="Current students cannot be negative")
     
-    # Calculate subscription
-    calculation = calculate_real_time_subscription(batch_fees, student_limit, current_students)
-    
-    return {
-        "success": True,
-        "calculation": calculation,
-        "beta_testing_enabled": is_beta_testing_enabled(db),
-        "message": "Real-time subscription calculation completed"
-    }
+    body = _real_time_response_body(
+        batch_fees, student_limit, current_students, cached_is_beta_testing_enabled(), detail
+    )
+    return Response(content=body, media_type="application/json")
 
 @app.get("/api/subscription/calculate-batch/{batch_id}")
 async def calculate_batch_subscription_real_time(
     batch_id: int,
+    detail: str = Query("summary", pattern=DETAIL_PATTERN, description="full adds the explanation strings"),
     db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(cached_get_current_user)
 ):
     """Calculate real-time subscription for an existing batch"""
     if current_user["type"] != "teacher":
@@ -91,35 +108,33 @@ async def calculate_batch_subscription_real_time(
     if not batch:
         raise HTTPException(status_code=404, detail="Batch not found")
     
-    # Get current student count
-    current_student_count = db.query(models.BatchStudent).filter(
-        models.BatchStudent.batch_id == batch_id,
-        models.BatchStudent.status == models.JoinRequestStatus.approved
-    ).count()
+    # Approved student counter kept on the batch row
+    current_student_count = batch.approved_student_count
     
     # Calculate real-time subscription
-    calculation = calculate_real_time_subscription(
+    quote = quote_real_time_subscription(
         batch.fees or 0,
         batch.student_limit or 0,
-        current_student_count
+        current_student_count,
+        detail
     )
     
-    return {
+    return Response(content=quote_response_body({
         "success": True,
         "batch_id": batch_id,
         "batch_name": batch.name,
         "batch_fees": batch.fees or 0,
         "student_limit": batch.student_limit or 0,
         "current_students": current_student_count,
-        "calculation": calculation,
-        "beta_testing_enabled": is_beta_testing_enabled(db)
-    }
+        "beta_testing_enabled": cached_is_beta_testing_enabled(db)
+    }, calculation=quote), media_type="application/json")
 
 @app.post("/api/subscription/validate-calculation")
 async def validate_subscription_calculation(
     request: dict,
+    detail: str = Query("summary", pattern=DETAIL_PATTERN, description="full adds the explanation strings"),
     db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(cached_get_current_user)
 ):
     """Validate subscription calculation with custom parameters"""
     if current_user["type"] != "teacher":
@@ -138,7 +153,7 @@ async def validate_subscription_calculation(
         raise HTTPException(status_code=400, detail="Current students cannot be negative")
     
     # Calculate subscription
-    calculation = calculate_real_time_subscription(batch_fees, student_limit, current_students)
+    calculation = calculate_real_time_subscription(batch_fees, student_limit, current_students, detail)
     
     return {
         "success": True,
@@ -147,52 +162,153 @@ async def validate_subscription_calculation(
             "calculation": calculation,
             "recommendations": []
         },
-        "beta_testing_enabled": is_beta_testing_enabled(db)
+        "beta_testing_enabled": cached_is_beta_testing_enabled(db)
     }
 
 # Enhanced subscription calculation for existing batches
+def _encode_batches_cursor(batch_id: int) -> str:
+    return base64.urlsafe_b64encode(f"batch:{batch_id}".encode()).decode().rstrip("=")
+
+def _decode_batches_cursor(cursor: str) -> int:
+    try:
+        prefix, batch_id = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().split(":")
+        if prefix != "batch":
+            raise ValueError(prefix)
+        return int(batch_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _teacher_batches_after(db: Session, teacher_id: int, after_id: int, limit: int = None):
+    """Keyset page of a teacher's batches in id order, read from ix_batches_teacher_id_pricing alone"""
+    query = db.query(
+        models.Batch.id,
+        models.Batch.name,
+        models.Batch.fees,
+        models.Batch.student_limit,
+        models.Batch.approved_student_count
+    ).filter(
+        models.Batch.teacher_id == teacher_id,
+        models.Batch.id > after_id
+    ).order_by(models.Batch.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+def _batch_calculations(batches, detail: str) -> list:
+    """Price batches in one vectorized pass, with the approved counters kept on the batch rows"""
+    calculations = iter_bulk_subscription_results(
+        [batch.fees or 0 for batch in batches],
+        [batch.student_limit or 0 for batch in batches],
+        [batch.approved_student_count for batch in batches],
+        include_steps=(detail == "full")
+    )
+    return [{
+        "batch_id": batch.id,
+        "batch_name": batch.name,
+        "batch_fees": batch.fees or 0,
+        "student_limit": batch.student_limit or 0,
+        "current_students": calculation["current_students"],
+        "calculation": calculation
+    } for batch, calculation in zip(batches, calculations)]
+
+def iter_teacher_batch_calculation_chunks(db: Session, teacher_id: int, detail: str,
+                                          chunk_size: int = ALL_BATCHES_STREAM_CHUNK_SIZE):
+    """Batch calculations of a teacher, one keyset chunk (list) at a time"""
+    after_id = 0
+    while True:
+        batches = _teacher_batches_after(db, teacher_id, after_id, chunk_size)
+        if not batches:
+            return
+        after_id = batches[-1].id
+        yield _batch_calculations(batches, detail)
+        if len(batches) < chunk_size:
+            return
+
+def _stream_batch_calculations(teacher_id: int, detail: str, stream: str, beta_testing_enabled: bool):
+    """
+    Stream a teacher's batch calculations as they are priced, totals last:
+    - json: the calculate-all-batches document, with total_batches and
+      total_monthly_subscription after batch_calculations
+    - ndjson: one batch calculation per line, then a {"trailer": {...}} line
+    """
+    # The request's session may be closed before the body is sent
+    db = SessionLocal()
+    try:
+        total_batches = 0
+        total_monthly_subscription = 0
+        if stream == "json":
+            yield f'{{"success":true,"teacher_id":{teacher_id},"batch_calculations":['.encode()
+
+        for chunk in iter_teacher_batch_calculation_chunks(db, teacher_id, detail):
+            lines = [_encode_batch_calculation(batch_calculation) for batch_calculation in chunk]
+            if stream == "ndjson":
+                yield b"\n".join(lines) + b"\n"
+            else:
+                yield (b"," if total_batches else b"") + b",".join(lines)
+            total_batches += len(chunk)
+            total_monthly_subscription += sum(item["calculation"]["total_subscription"] for item in chunk)
+
+        totals = {
+            "total_batches": total_batches,
+            "total_monthly_subscription": round(total_monthly_subscription, 2),
+            "beta_testing_enabled": beta_testing_enabled
+        }
+        if stream == "ndjson":
+            yield _encode_batch_calculation({"trailer": {"teacher_id": teacher_id, **totals}}) + b"\n"
+        else:
+            yield b"]," + _encode_batch_calculation(totals)[1:]
+    finally:
+        db.close()
+
 @app.get("/api/teacher/subscription/calculate-all-batches")
+@fast_json(ALL_BATCHES_CALCULATION_SCHEMA)
 async def calculate_all_batches_subscription(
+    detail: str = Query("summary", pattern=DETAIL_PATTERN, description="full adds the explanation strings"),
+    limit: Optional[int] = Query(None, ge=1, le=ALL_BATCHES_MAX_PAGE_SIZE, description="Page size; enables pagination"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    stream: Optional[str] = Query(None, pattern=STREAM_PATTERN, description="Stream all batches as json or ndjson"),
     db: Session = Depends(get_db),
-    current_teacher: models.Teacher = Depends(get_current_teacher)
+    current_teacher: models.Teacher = Depends(cached_get_current_teacher)
 ):
-    """Calculate subscription for all teacher's batches"""
-    # Get all batches for the teacher
-    batches = db.query(models.Batch).filter(models.Batch.teacher_id == current_teacher.id).all()
-    
-    batch_calculations = []
-    total_monthly_subscription = 0
+    """Calculate subscription for all teacher's batches (whole list, one page, or streamed)"""
+    beta_testing_enabled = cached_is_beta_testing_enabled(db)
     
-    for batch in batches:
-        # Get current student count
-        current_student_count = db.query(models.BatchStudent).filter(
-            models.BatchStudent.batch_id == batch.id,
-            models.BatchStudent.status == models.JoinRequestStatus.approved
-        ).count()
-        
-        # Calculate subscription
-        calculation = calculate_real_time_subscription(
-            batch.fees or 0,
-            batch.student_limit or 0,
-            current_student_count
+    if stream:
+        if limit is not None or cursor is not None:
+            raise HTTPException(status_code=400, detail="stream cannot be combined with limit or cursor")
+        return StreamingResponse(
+            _stream_batch_calculations(current_teacher.id, detail, stream, beta_testing_enabled),
+            media_type="application/x-ndjson" if stream == "ndjson" else "application/json"
         )
+    
+    if limit is not None or cursor is not None:
+        # One keyset page; the extra row tells whether another page follows
+        limit = limit or ALL_BATCHES_PAGE_SIZE
+        after_id = _decode_batches_cursor(cursor) if cursor else 0
+        batches = _teacher_batches_after(db, current_teacher.id, after_id, limit + 1)
+        has_more = len(batches) > limit
+        batches = batches[:limit]
+        batch_calculations = _batch_calculations(batches, detail)
         
-        batch_calculations.append({
-            "batch_id": batch.id,
-            "batch_name": batch.name,
-            "batch_fees": batch.fees or 0,
-            "student_limit": batch.student_limit or 0,
-            "current_students": current_student_count,
-            "calculation": calculation
-        })
-        
-        total_monthly_subscription += calculation["total_subscription"]
+        return {
+            "success": True,
+            "teacher_id": current_teacher.id,
+            "page_batches": len(batch_calculations),
+            "page_monthly_subscription": round(sum(item["calculation"]["total_subscription"] for item in batch_calculations), 2),
+            "batch_calculations": batch_calculations,
+            "next_cursor": _encode_batches_cursor(batches[-1].id) if has_more else None,
+            "has_more": has_more,
+            "beta_testing_enabled": beta_testing_enabled
+        }
+    
+    batch_calculations = _batch_calculations(_teacher_batches_after(db, current_teacher.id, 0), detail)
+    total_monthly_subscription = sum(item["calculation"]["total_subscription"] for item in batch_calculations)
     
     return {
         "success": True,
         "teacher_id": current_teacher.id,
-        "total_batches": len(batches),
+        "total_batches": len(batch_calculations),
         "total_monthly_subscription": round(total_monthly_subscription, 2),
         "batch_calculations": batch_calculations,
-        "beta_testing_enabled": is_beta_testing_enabled(db)
+        "beta_testing_enabled": beta_testing_enabled
     }
@@ -0,0 +1,197 @@
+# Request Profiling Middleware and /metrics
+# Add this to your main API file, after query_instrumentation.py
+#
+# Records, per route template (e.g. /api/subscription/calculate/{batch_id}), method and
+# response status:
+# - SQL statements executed on engine and total time spent in the database, from the
+#   request's query_instrumentation.RequestQueries
+# - time spent rendering @fast_json responses (other routes' encoding is handler time)
+# - handler time (everything else between receiving the request and responding)
+# A request whose handler raises is recorded with status 500.
+# They are exposed as Prometheus histograms on GET /metrics, together with the log
+# queue, principal cache and response cache counters. Set METRICS_TOKEN and give the
+# scraper the same value as its bearer token (Prometheus: authorization /
+# bearer_token); without METRICS_TOKEN the endpoint answers 404. Client addresses are
+# not trusted: behind a local reverse proxy every request comes from 127.0.0.1.
+#
+# Set SLOW_REQUEST_LOG_MS to log requests slower than that with the SQL they ran.
+# Only statement text is logged: bound parameters are never recorded, only counted.
+
+import hmac
+import logging
+import os
+import threading
+import time
+
+from fast_json import time_serialization
+from principal_cache import principal_cache
+from response_cache import response_cache
+from structured_logging import get_logger, log_event, logging_stats
+
+SLOW_REQUEST_LOG_MS = float(os.getenv("SLOW_REQUEST_LOG_MS", "0"))  # 0 disables the slow log
+SLOW_REQUEST_MAX_STATEMENTS = int(os.getenv("SLOW_REQUEST_MAX_STATEMENTS", "50"))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+profiling_logger = get_logger("profiling")
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with (route, method, status) labels, in Prometheus text format"""
+
+    def __init__(self, name: str, description: str, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        with self._lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = {"buckets": [0] * len(self.buckets), "count": 0, "sum": 0.0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][index] += 1
+            series["count"] += 1
+            series["sum"] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for (route, method, status), series in sorted(self.series.items()):
+                label = f'route="{_escape_label(route)}",method="{method}",status="{status}"'
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {series["count"]}')
+                lines.append(f"{self.name}_sum{{{label}}} {series['sum']}")
+                lines.append(f"{self.name}_count{{{label}}} {series['count']}")
+        return lines
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+request_sql_statements = Histogram(
+    "api_request_sql_statements", "SQL statements executed per request", STATEMENT_BUCKETS
+)
+request_db_seconds = Histogram(
+    "api_request_db_seconds", "Time spent executing SQL per request", SECONDS_BUCKETS
+)
+request_serialization_seconds = Histogram(
+    "api_request_serialization_seconds", "Time spent serializing the response", SECONDS_BUCKETS
+)
+request_handler_seconds = Histogram(
+    "api_request_handler_seconds", "Request time excluding response serialization", SECONDS_BUCKETS
+)
+PROFILING_HISTOGRAMS = (
+    request_sql_statements, request_db_seconds, request_serialization_seconds, request_handler_seconds
+)
+
+
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    started = time.perf_counter()
+    status_code = 500
+    with track_request_queries() as queries, time_serialization() as serialization:
+        if SLOW_REQUEST_LOG_MS:
+            queries.statements, queries.max_statements = [], SLOW_REQUEST_MAX_STATEMENTS
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            return response
+        finally:
+            _observe_request(request, queries, serialization.seconds, time.perf_counter() - started, status_code)
+
+
+def _observe_request(request: Request, queries, serialization_seconds: float, elapsed: float, status_code: int):
+    route = request.scope.get("route")
+    # Unmatched paths share one label so scanners cannot blow up the series count
+    labels = (route.path if route is not None else "unmatched", request.method, str(status_code))
+    request_sql_statements.observe(labels, queries.count)
+    request_db_seconds.observe(labels, queries.db_seconds)
+    request_serialization_seconds.observe(labels, serialization_seconds)
+    request_handler_seconds.observe(labels, elapsed - serialization_seconds)
+
+    if SLOW_REQUEST_LOG_MS and elapsed * 1000 >= SLOW_REQUEST_LOG_MS:
+        log_event(
+            profiling_logger, logging.WARNING, "slow_request",
+            method=labels[1], route=labels[0], status=status_code, ms=round(elapsed * 1000, 1),
+            sql_statements=queries.count, db_ms=round(queries.db_seconds * 1000, 1),
+            statements=queries.statements
+        )
+
+
+@app.get("/metrics", include_in_schema=False)
+def get_profiling_metrics(authorization: str = Header(None)):
+    """Prometheus scrape endpoint (bearer METRICS_TOKEN)"""
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest((authorization or "").encode(), f"Bearer {METRICS_TOKEN}".encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+    lines = []
+    for histogram in PROFILING_HISTOGRAMS:
+        lines.extend(histogram.render())
+
+    log_stats = logging_stats()
+    lines += [
+        "# HELP app_log_records_dropped_total Log records dropped because the log queue was full",
+        "# TYPE app_log_records_dropped_total counter"
+    ]
+    lines += [f'app_log_records_dropped_total{{level="{level}"}} {count}' for level, count in sorted(log_stats["dropped"].items())]
+    lines += [
+        "# HELP app_log_records_sampled_out_total Log records skipped by sampling",
+        "# TYPE app_log_records_sampled_out_total counter",
+        f"app_log_records_sampled_out_total {log_stats['sampled_out']}",
+        "# HELP app_log_queue_size Log records waiting to be written",
+        "# TYPE app_log_queue_size gauge",
+        f"app_log_queue_size {log_stats['queue_size']}"
+    ]
+
+    auth_stats = principal_cache.stats()
+    lines += [
+        "# HELP app_principal_cache_lookups_total Current-user cache lookups by principal kind",
+        "# TYPE app_principal_cache_lookups_total counter"
+    ]
+    for result, counts in (("hit", auth_stats["hits"]), ("miss", auth_stats["misses"])):
+        lines += [
+            f'app_principal_cache_lookups_total{{kind="{kind}",result="{result}"}} {count}'
+            for kind, count in sorted(counts.items())
+        ]
+    lines += [
+        "# HELP app_principal_cache_invalidations_total Logout / credential-change invalidations",
+        "# TYPE app_principal_cache_invalidations_total counter",
+        f"app_principal_cache_invalidations_total {auth_stats['invalidations']}",
+        "# HELP app_principal_cache_entries Cached principals in this worker",
+        "# TYPE app_principal_cache_entries gauge",
+        f"app_principal_cache_entries {auth_stats['entries']}"
+    ]
+
+    cache_stats = response_cache.stats()
+    lines += [
+        "# HELP app_response_cache_lookups_total Versioned response cache lookups by route",
+        "# TYPE app_response_cache_lookups_total counter"
+    ]
+    for route, counters in sorted(cache_stats["routes"].items()):
+        lines += [
+            f'app_response_cache_lookups_total{{route="{route}",result="{result}"}} {counters[key]}'
+            for result, key in (("hit", "hits"), ("miss", "misses"), ("not_modified", "not_modified"))
+        ]
+    lines += [
+        "# HELP app_response_cache_hit_rate Share of lookups answered from cache or with 304",
+        "# TYPE app_response_cache_hit_rate gauge"
+    ]
+    lines += [
+        f'app_response_cache_hit_rate{{route="{route}"}} {counters["hit_rate"]}'
+        for route, counters in sorted(cache_stats["routes"].items())
+    ]
+    lines += [
+        "# HELP app_response_cache_entries Cached response bodies in this worker",
+        "# TYPE app_response_cache_entries gauge",
+        f"app_response_cache_entries {cache_stats['entries']}"
+    ]
+    return Response(content="\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
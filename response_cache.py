@@ -0,0 +1,158 @@
+# Versioned Response Cache
+# Caches whole JSON response bodies per route under a caller-supplied version stamp,
+# e.g. (teacher_id, status version, date) for /api/teacher/subscription/status. A
+# stamp that changed simply misses, so nothing has to be invalidated explicitly.
+# The stamp also becomes the response's ETag:
+# - If-None-Match with the current ETag -> 304 without running the handler
+# - Cache-Control: private, no-cache makes browsers revalidate on every poll, so an
+#   unchanged status costs only the stamp lookup and an empty 304
+#
+# Put @cached_response(stamp) between @app.get and the endpoint (above @fast_json).
+# stamp receives the endpoint's keyword arguments and returns a hashable stamp, or
+# None to bypass the cache for that call.
+
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+RESPONSE_CACHE_CONTROL = "private, no-cache"
+
+
+class ResponseCache:
+    """LRU of ETag -> (body, media_type), with hit / miss / 304 counters per route"""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.counters = {}  # route -> {"hits", "misses", "not_modified"}
+
+    def record(self, route: str, outcome: str):
+        with self._lock:
+            counters = self.counters.setdefault(route, {"hits": 0, "misses": 0, "not_modified": 0})
+            counters[outcome] += 1
+
+    def get(self, etag: str):
+        with self._lock:
+            entry = self._entries.get(etag)
+            if entry is not None:
+                self._entries.move_to_end(etag)
+            return entry
+
+    def put(self, etag: str, body: bytes, media_type: str):
+        with self._lock:
+            self._entries[etag] = (body, media_type)
+            self._entries.move_to_end(etag)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            routes = {route: dict(counters) for route, counters in self.counters.items()}
+            entries = len(self._entries)
+        for counters in routes.values():
+            lookups = counters["hits"] + counters["misses"] + counters["not_modified"]
+            counters["hit_rate"] = round((counters["hits"] + counters["not_modified"]) / lookups, 4) if lookups else 0
+        return {"routes": routes, "entries": entries, "max_entries": self.max_entries}
+
+
+response_cache = ResponseCache()
+
+
+def _etag(route: str, stamp) -> str:
+    return 'W/"' + hashlib.sha1(f"{route}:{stamp!r}".encode()).hexdigest()[:24] + '"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # Weak comparison: W/"x" and "x" name the same representation
+    return "*" in candidates or etag in candidates or etag[2:] in candidates
+
+
+def _store(route: str, stamp, result, cache: ResponseCache):
+    """Cache a freshly computed 200 response under its stamp's ETag"""
+    if not isinstance(result, Response):
+        result = Response(
+            content=json.dumps(jsonable_encoder(result), ensure_ascii=False, separators=(",", ":")),
+            media_type="application/json"
+        )
+    if stamp is None or result.status_code != 200 or not hasattr(result, "body"):
+        return result
+    etag = _etag(route, stamp)
+    cache.put(etag, result.body, result.media_type)
+    result.headers["ETag"] = etag
+    result.headers["Cache-Control"] = RESPONSE_CACHE_CONTROL
+    return result
+
+
+def _cached(route: str, stamp, request: Request, cache: ResponseCache):
+    """304 or the cached body for stamp, or None when the handler has to run"""
+    if stamp is None:
+        return None
+    etag = _etag(route, stamp)
+    headers = {"ETag": etag, "Cache-Control": RESPONSE_CACHE_CONTROL}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        cache.record(route, "not_modified")
+        return Response(status_code=304, headers=headers)
+    entry = cache.get(etag)
+    if entry is None:
+        cache.record(route, "misses")
+        return None
+    cache.record(route, "hits")
+    body, media_type = entry
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def cached_response(stamp, cache: ResponseCache = response_cache):
+    """Route decorator: serve the endpoint from cache / 304 while stamp(**kwargs) is unchanged"""
+
+    def decorator(endpoint):
+        route = endpoint.__qualname__
+        signature = inspect.signature(endpoint)
+        needs_request = "request" not in signature.parameters
+
+        def split_request(kwargs):
+            return kwargs.pop("request") if needs_request else kwargs["request"]
+
+        if asyncio.iscoroutinefunction(endpoint):
+            @functools.wraps(endpoint)
+            async def wrapper(*args, **kwargs):
+                request = split_request(kwargs)
+                current_stamp = stamp(**kwargs)
+                cached = _cached(route, current_stamp, request, cache)
+                if cached is not None:
+                    return cached
+                return _store(route, current_stamp, await endpoint(*args, **kwargs), cache)
+        else:
+            @functools.wraps(endpoint)
+            def wrapper(*args, **kwargs):
+                request = split_request(kwargs)
+                current_stamp = stamp(**kwargs)
+                cached = _cached(route, current_stamp, request, cache)
+                if cached is not None:
+                    return cached
+                return _store(route, current_stamp, endpoint(*args, **kwargs), cache)
+
+        if needs_request:
+            wrapper.__signature__ = signature.replace(parameters=[
+                *signature.parameters.values(),
+                inspect.Parameter("request", inspect.Parameter.KEYWORD_ONLY, annotation=Request)
+            ])
+        return wrapper
+
+    return decorator
@@ -0,0 +1,45 @@
+# Stateless Token Validation
+# Add this to your main API file
+#
+# For pure-computation endpoints that only need to know the caller is a teacher.
+# The bearer token is checked from its signature and expiry alone, with no DB
+# session and no user lookup. Endpoints that read or write user data should keep
+# using cached_get_current_user / cached_get_current_teacher.
+#
+# The role comes from the token's type claim. Tokens issued without one fall back to
+# cached_get_current_user (cached_auth.py): the first request of such a token looks the
+# user up once, later ones are served from the principal cache.
+
+
+def get_token_claims(authorization: str = Header(None)) -> dict:
+    """Decode and verify the bearer token without touching the database"""
+    if not authorization or not authorization.lower().startswith("bearer "):
+        raise HTTPException(
+            status_code=401,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+    try:
+        claims = jwt.decode(authorization[7:], SECRET_KEY, algorithms=[ALGORITHM])
+    except Exception:
+        raise HTTPException(
+            status_code=401,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+
+    return claims
+
+
+def get_teacher_token_claims(claims: dict = Depends(get_token_claims), authorization: str = Header(None)) -> dict:
+    """Teacher role check from the token's type claim, or from the user when the token has none"""
+    if "type" not in claims:
+        db = SessionLocal()
+        try:
+            claims = {**claims, "type": cached_get_current_user(token=authorization[7:], db=db)["type"]}
+        finally:
+            db.close()
+    if claims["type"] != "teacher":
+        raise HTTPException(status_code=403, detail="Access denied: requires teacher role")
+    return claims
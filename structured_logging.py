@@ -0,0 +1,184 @@
+# Structured, Non-blocking Logging
+# Request handlers only put a record on a bounded in-memory queue; a QueueListener
+# thread formats each record as one JSON line and writes it to stdout. When the log
+# collector falls behind, the queue fills up and new records are dropped and counted
+# instead of blocking the request path.
+#
+#   from structured_logging import get_logger, log_event
+#   subscription_logger = get_logger("subscription")
+#   log_event(subscription_logger, logging.ERROR, "subscription_status_failed", error=str(e))
+#
+# The listener thread runs from app startup to shutdown: call install_log_listener(app)
+# once in the main API file. Records logged before startup wait in the queue.
+#
+# Environment:
+# - LOG_LEVEL (INFO)
+# - LOG_QUEUE_SIZE (10000 records)
+# - LOG_SAMPLE_RATES ("event=rate,..."; high-volume events default to DEFAULT_SAMPLE_RATES)
+
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Fraction of records kept for chatty per-request events
+DEFAULT_SAMPLE_RATES = {
+    "subscription_calculation_result": 0.01,
+}
+
+
+def _parse_sample_rates(value: str) -> dict:
+    rates = dict(DEFAULT_SAMPLE_RATES)
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        event, _, rate = item.partition("=")
+        rates[event.strip()] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+
+LOG_SAMPLE_RATES = _parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+
+_stats_lock = threading.Lock()
+_logging_stats = {"enqueued": 0, "dropped": {}, "sampled_out": 0}
+
+
+def _count(key: str, level: str = None):
+    with _stats_lock:
+        if level is None:
+            _logging_stats[key] += 1
+        else:
+            _logging_stats[key][level] = _logging_stats[key].get(level, 0) + 1
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps roughly `rate` of the records for each sampled event"""
+
+    def __init__(self, rates: dict):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(getattr(record, "event", None))
+        if rate is None or rate >= 1.0 or random.random() < rate:
+            return True
+        _count("sampled_out")
+        return False
+
+
+class BoundedQueueHandler(QueueHandler):
+    """QueueHandler that never blocks: records that do not fit are dropped and counted"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Like QueueHandler.prepare: resolve the message and render the traceback now,
+        # while its frames still exist, so only strings cross to the listener thread.
+        # The JSON line itself is still built on the listener thread.
+        record = copy.copy(record)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _traceback_formatter.formatException(record.exc_info)
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+            _count("enqueued")
+        except queue.Full:
+            _count("dropped", record.levelname)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": getattr(record, "event", None) or record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        elif record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class DrainingQueueListener(QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room instead of failing, so shutdown still flushes a full queue
+        self.queue.put(self._sentinel)
+
+
+_traceback_formatter = logging.Formatter()
+_log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+_queue_handler = BoundedQueueHandler(_log_queue)
+_queue_handler.addFilter(SamplingFilter(LOG_SAMPLE_RATES))
+
+_stream_handler = logging.StreamHandler(sys.stdout)
+_stream_handler.setFormatter(JsonFormatter())
+
+app_logger = logging.getLogger("app")
+app_logger.setLevel(LOG_LEVEL)
+app_logger.addHandler(_queue_handler)
+app_logger.propagate = False
+
+log_listener = DrainingQueueListener(_log_queue, _stream_handler)
+_listener_lock = threading.Lock()
+_listener_running = False
+
+
+def start_log_listener():
+    """Start writing queued records (idempotent)"""
+    global _listener_running
+    with _listener_lock:
+        if not _listener_running:
+            log_listener.start()
+            _listener_running = True
+
+
+def stop_log_listener():
+    """Flush whatever is still queued and stop the listener thread (idempotent)"""
+    global _listener_running
+    with _listener_lock:
+        if _listener_running:
+            log_listener.stop()
+            _listener_running = False
+
+
+def install_log_listener(app):
+    """Run the listener for the app's lifetime: started on startup, drained on shutdown"""
+    app.on_event("startup")(start_log_listener)
+    app.on_event("shutdown")(stop_log_listener)
+
+
+def get_logger(name: str) -> logging.Logger:
+    return app_logger.getChild(name)
+
+
+def log_event(logger: logging.Logger, level: int, event: str, exc_info: bool = False, **fields):
+    """Log one structured record; fields become top-level JSON keys"""
+    if logger.isEnabledFor(level):
+        logger.log(level, event, exc_info=exc_info, extra={"event": event, "fields": fields})
+
+
+def logging_stats() -> dict:
+    """Counters for the pipeline: enqueued, dropped per level, sampled out, current backlog"""
+    with _stats_lock:
+        return {
+            "enqueued": _logging_stats["enqueued"],
+            "dropped": dict(_logging_stats["dropped"]),
+            "sampled_out": _logging_stats["sampled_out"],
+            "queue_size": _log_queue.qsize(),
+            "queue_capacity": LOG_QUEUE_SIZE
+        }
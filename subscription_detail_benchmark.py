@@ -0,0 +1,55 @@
+# Subscription Detail Benchmark
+# CPU time and JSON payload size of detail=summary vs detail=full for a single
+# calculation and for a calculate-all-batches response
+#
+# Usage: python subscription_detail_benchmark.py [batches]
+
+import json
+import random
+import sys
+import time
+import timeit
+
+from bulk_subscription_pricing import iter_bulk_subscription_results
+from subscription_pricing import DETAIL_LEVELS, batch_subscription_fee_view, real_time_subscription_view
+
+
+def _payload_bytes(payload) -> int:
+    return len(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def _cpu_seconds(function, repeat: int = 5) -> float:
+    return min(timeit.Timer(function, timer=time.process_time).repeat(repeat=repeat, number=1))
+
+
+def main(batches: int = 1000):
+    random.seed(42)
+    fees = [random.choice([499, 500, 699, 999, 1500, 2500, 5000]) for _ in range(batches)]
+    limits = [random.randint(10, 120) for _ in range(batches)]
+    current = [random.randint(0, limit) for limit in limits]
+    rows = list(zip(fees, limits, current))
+
+    print(f"{batches} batches")
+    print(f"{'mode':<8} {'single view':>14} {'single bytes':>13} {'all-batches':>13} {'all-batches bytes':>18}")
+    for detail in DETAIL_LEVELS:
+        def single_views():
+            for batch_fees, student_limit, current_students in rows:
+                real_time_subscription_view(batch_fees, student_limit, current_students, detail)
+                batch_subscription_fee_view(batch_fees, current_students, student_limit, detail)
+
+        def all_batches():
+            return list(iter_bulk_subscription_results(fees, limits, current, include_steps=(detail == "full")))
+
+        single_seconds = _cpu_seconds(single_views)
+        all_seconds = _cpu_seconds(all_batches)
+        single_bytes = _payload_bytes(real_time_subscription_view(fees[0], limits[0], current[0], detail))
+        all_bytes = _payload_bytes({"batch_calculations": all_batches()})
+
+        print(
+            f"{detail:<8} {single_seconds * 1e6 / (2 * batches):11.2f} us {single_bytes:11d} B "
+            f"{all_seconds * 1e3:10.2f} ms {all_bytes / 1024:15.1f} KB"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,16 @@
+# Subscription Event Outbox Model
+# Add this model to your models.py
+
+from datetime import datetime
+from sqlalchemy import JSON, Column, DateTime, Integer, String
+
+
+class SubscriptionEvent(Base):
+    """Outbox row for a committed change that affects a batch's subscription fee"""
+    __tablename__ = "subscription_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    event_type = Column(String(32), nullable=False)  # enrollment_changed, batch_changed
+    batch_id = Column(Integer, nullable=False)  # no FK: an event may outlive its batch
+    payload = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
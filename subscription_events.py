@@ -0,0 +1,128 @@
+# Subscription Domain Events
+# Add this to your main API file
+#
+# Approvals, rejections, removals and batch edits write an outbox row
+# (models.SubscriptionEvent) in the same transaction as the change, through the
+# record_* hooks in subscription_summary. Once that transaction commits, the
+# in-process bus wakes the consumer. The consumer then:
+# - waits SUBSCRIPTION_EVENT_DEBOUNCE_SECONDS, so a burst of approvals for one batch
+#   collapses into a single refresh
+# - re-derives each touched batch's BatchSubscriptionSummary from the source tables
+# - deletes the events it applied, in the same transaction as the refresh
+# Fee endpoints read approved counts from Batch.approved_student_count, which the same
+# hooks update synchronously (approved_student_counter.py).
+# Events left behind by a crash, or committed by another worker, are replayed at
+# startup and on every SUBSCRIPTION_EVENT_POLL_SECONDS poll.
+
+import asyncio
+import logging
+import os
+
+from sqlalchemy import event
+
+from structured_logging import get_logger, log_event
+
+SUBSCRIPTION_EVENT_DEBOUNCE_SECONDS = float(os.getenv("SUBSCRIPTION_EVENT_DEBOUNCE_SECONDS", "1.0"))
+SUBSCRIPTION_EVENT_POLL_SECONDS = float(os.getenv("SUBSCRIPTION_EVENT_POLL_SECONDS", "30"))
+SUBSCRIPTION_EVENT_BATCH_SIZE = int(os.getenv("SUBSCRIPTION_EVENT_BATCH_SIZE", "500"))
+
+subscription_logger = get_logger("subscription")
+
+_EVENTS_PENDING_KEY = "subscription_events_pending"
+
+
+def emit_subscription_event(db: Session, event_type: str, batch_id: int, payload: dict = None):
+    """Queue an event in the caller's transaction; it is published only if that commits"""
+    db.add(models.SubscriptionEvent(event_type=event_type, batch_id=batch_id, payload=payload))
+    db.info[_EVENTS_PENDING_KEY] = True
+
+
+class SubscriptionEventBus:
+    """Wakes the consumer task from any thread once emitted events are committed"""
+
+    def __init__(self):
+        self._loop = None
+        self._wakeup = None
+
+    def attach(self, loop):
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+
+    def publish(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def wait(self, timeout: float):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+
+subscription_event_bus = SubscriptionEventBus()
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed_subscription_events(session):
+    if session.info.pop(_EVENTS_PENDING_KEY, False):
+        subscription_event_bus.publish()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_subscription_events(session):
+    session.info.pop(_EVENTS_PENDING_KEY, None)
+
+
+def process_subscription_events(db: Session, limit: int = SUBSCRIPTION_EVENT_BATCH_SIZE) -> int:
+    """Apply up to `limit` pending events with one summary refresh per touched batch"""
+    events = db.query(
+        models.SubscriptionEvent.id,
+        models.SubscriptionEvent.batch_id
+    ).order_by(models.SubscriptionEvent.id).limit(limit).with_for_update(skip_locked=True).all()
+    if not events:
+        db.rollback()
+        return 0
+
+    for batch_id in dict.fromkeys(subscription_event.batch_id for subscription_event in events):
+        refresh_batch_summary(db, batch_id)
+
+    db.query(models.SubscriptionEvent).filter(
+        models.SubscriptionEvent.id.in_([subscription_event.id for subscription_event in events])
+    ).delete(synchronize_session=False)
+    db.commit()
+    return len(events)
+
+
+def drain_subscription_events(db: Session) -> int:
+    """Process pending events until the outbox is empty (startup replay and each wakeup)"""
+    processed = 0
+    while True:
+        applied = process_subscription_events(db)
+        if not applied:
+            return processed
+        processed += applied
+
+
+def _drain_subscription_events_in_new_session() -> int:
+    db = SessionLocal()
+    try:
+        return drain_subscription_events(db)
+    finally:
+        db.close()
+
+
+async def _subscription_event_consumer():
+    while True:
+        try:
+            await asyncio.to_thread(_drain_subscription_events_in_new_session)
+        except Exception as e:
+            log_event(subscription_logger, logging.ERROR, "subscription_events_failed", exc_info=True, error=str(e))
+        await subscription_event_bus.wait(SUBSCRIPTION_EVENT_POLL_SECONDS)
+        await asyncio.sleep(SUBSCRIPTION_EVENT_DEBOUNCE_SECONDS)
+
+
+@app.on_event("startup")
+async def start_subscription_event_consumer():
+    subscription_event_bus.attach(asyncio.get_running_loop())
+    asyncio.create_task(_subscription_event_consumer())
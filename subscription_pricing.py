@@ -0,0 +1,263 @@
+# Subscription Pricing Kernel
+# Single source of truth for the subscription fee rules used by
+# api_fixes.py, enhanced_subscription_api.py, enhanced_subscription_calculation.py
+# and real_time_subscription_api.py
+
+import json
+from collections import namedtuple
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+
+MIN_STUDENTS = 20
+MIN_PER_STUDENT = 35
+COMMISSION_RATE = 7  # 7%
+
+# detail="summary" returns the numbers only; "full" adds the rupee explanation strings
+DETAIL_LEVELS = ("summary", "full")
+DETAIL_PATTERN = "^(summary|full)$"
+
+SubscriptionPrice = namedtuple("SubscriptionPrice", [
+    "seven_percent_amount",
+    "commission_per_student",
+    "effective_student_count",
+    "total_subscription",
+    "is_seven_percent_higher"
+])
+
+# Precomputed prices keyed by (batch_fees, student_basis, truncate_commission)
+_PRICING_TABLE = {}
+
+
+def _compute_subscription_price(batch_fees, student_basis: int, truncate_commission: bool = False) -> SubscriptionPrice:
+    """
+    Price one batch:
+    - Commission per student = max(7% of batch fees, ₹35)
+    - truncate_commission=True keeps the int() truncated commission of the older calculators
+    - Effective students = max(student_basis, 20)
+    """
+    has_fees = bool(batch_fees and batch_fees > 0)
+    seven_percent_amount = (batch_fees * COMMISSION_RATE) / 100 if has_fees else 0
+    effective_student_count = max(student_basis, MIN_STUDENTS)
+
+    if truncate_commission:
+        commission_per_student = max(int(seven_percent_amount), MIN_PER_STUDENT) if has_fees else MIN_PER_STUDENT
+        total_subscription = commission_per_student * effective_student_count
+    else:
+        commission_per_student = max(seven_percent_amount, MIN_PER_STUDENT)
+        total_subscription = round(commission_per_student * effective_student_count, 2)
+        commission_per_student = round(commission_per_student, 2)
+
+    return SubscriptionPrice(
+        seven_percent_amount=round(seven_percent_amount, 2),
+        commission_per_student=commission_per_student,
+        effective_student_count=effective_student_count,
+        total_subscription=total_subscription,
+        is_seven_percent_higher=seven_percent_amount > MIN_PER_STUDENT
+    )
+
+
+_cached_subscription_price = lru_cache(maxsize=8192)(_compute_subscription_price)
+
+
+def price_subscription(batch_fees, student_basis: int, truncate_commission: bool = False) -> SubscriptionPrice:
+    """Look up a batch price in the precomputed table, falling back to the LRU memo"""
+    price = _PRICING_TABLE.get((batch_fees, student_basis, truncate_commission))
+    if price is None:
+        price = _cached_subscription_price(batch_fees, student_basis, truncate_commission)
+    return price
+
+
+def warm_pricing_table(fee_limit_pairs) -> int:
+    """
+    Precompute prices for known (batch_fees, student_limit) pairs, e.g. the
+    distinct pairs of all batches at startup. Returns the table size.
+    """
+    for batch_fees, student_limit in fee_limit_pairs:
+        for truncate_commission in (False, True):
+            key = (batch_fees or 0, student_limit or 0, truncate_commission)
+            if key not in _PRICING_TABLE:
+                _PRICING_TABLE[key] = _compute_subscription_price(*key)
+    return len(_PRICING_TABLE)
+
+
+def clear_pricing_cache():
+    """Drop precomputed and memoized prices (call after changing the pricing rules)"""
+    _PRICING_TABLE.clear()
+    _cached_subscription_price.cache_clear()
+    _quote_values.cache_clear()
+    _quote_json.cache_clear()
+
+
+# Legacy result-dict views
+
+def subscription_fee_view(batch_fees: int, student_count: int) -> dict:
+    """Result shape of api_fixes.calculate_subscription_fee (actual student count, truncated commission)"""
+    price = price_subscription(batch_fees or 0, student_count, truncate_commission=True)
+    return {
+        "commission_per_student": price.commission_per_student,
+        "student_count": price.effective_student_count,
+        "total_subscription": price.total_subscription,
+        "minimum_met": student_count >= MIN_STUDENTS,
+        "batch_fees": batch_fees,
+        "commission_rate": COMMISSION_RATE
+    }
+
+
+def enhanced_subscription_fee_view(batch_fees: int, student_count: int, student_limit: int = None) -> dict:
+    """Result shape of enhanced_subscription_api.calculate_subscription_fee (student_limit preferred)"""
+    student_basis = student_limit or student_count
+    price = price_subscription(batch_fees or 0, student_basis, truncate_commission=True)
+    return {
+        "commission_per_student": price.commission_per_student,
+        "student_count": price.effective_student_count,
+        "total_subscription": price.total_subscription,
+        "minimum_met": student_basis >= MIN_STUDENTS,
+        "batch_fees": batch_fees or 0,
+        "commission_rate": COMMISSION_RATE,
+        "min_students": MIN_STUDENTS,
+        "min_per_student": MIN_PER_STUDENT
+    }
+
+
+def batch_subscription_fee_view(batch_fees: int, student_count: int, student_limit: int, detail: str = "full") -> dict:
+    """Result shape of enhanced_subscription_calculation.calculate_batch_subscription_fee"""
+    price = price_subscription(batch_fees, student_limit)
+    result = {
+        "commission_per_student": price.commission_per_student,
+        "student_count": price.effective_student_count,
+        "total_subscription": price.total_subscription,
+        "minimum_met": student_count >= MIN_STUDENTS,
+        "batch_fees": batch_fees,
+        "commission_rate": COMMISSION_RATE,
+        "seven_percent_amount": price.seven_percent_amount,
+        "min_per_student": MIN_PER_STUDENT,
+        "is_seven_percent_higher": price.is_seven_percent_higher,
+        "batch_price_per_student": batch_fees,  # Show actual batch price
+        "current_students": student_count  # Show actual current students
+    }
+    if detail == "full":
+        result.update({
+            "calculation_steps": _calculation_steps(batch_fees, price),
+            "logic_explanation": _logic_explanation(price),
+            "commission_calculation": f"max({COMMISSION_RATE}% of ₹{batch_fees}, ₹{MIN_PER_STUDENT}) = ₹{price.commission_per_student} per student",
+            "total_calculation": f"₹{price.commission_per_student} × {price.effective_student_count} students = ₹{price.total_subscription}",
+            "subscription_based_on": f"teacher-set limit of {student_limit} students"  # Clarify what the calculation is based on
+        })
+    return result
+
+
+def real_time_subscription_view(batch_fees: int, student_limit: int, current_students: int = 0, detail: str = "full") -> dict:
+    """Result shape of real_time_subscription_api.calculate_real_time_subscription"""
+    price = price_subscription(batch_fees, student_limit)
+    result = {
+        "batch_fees": batch_fees,
+        "student_limit": student_limit,
+        "current_students": current_students,
+        "seven_percent_amount": price.seven_percent_amount,
+        "min_per_student": MIN_PER_STUDENT,
+        "commission_per_student": price.commission_per_student,
+        "effective_student_count": price.effective_student_count,
+        "total_subscription": price.total_subscription,
+        "is_seven_percent_higher": price.is_seven_percent_higher
+    }
+    if detail == "full":
+        result["calculation_steps"] = _calculation_steps(batch_fees, price)
+        result["logic_explanation"] = _logic_explanation(price)
+    return result
+
+
+def _calculation_steps(batch_fees, price: SubscriptionPrice) -> dict:
+    return {
+        "step1": f"7% of ₹{batch_fees} = ₹{price.seven_percent_amount}",
+        "step2": f"max(₹{price.seven_percent_amount}, ₹{MIN_PER_STUDENT}) = ₹{price.commission_per_student}",
+        "step3": f"₹{price.commission_per_student} × {price.effective_student_count} students = ₹{price.total_subscription}"
+    }
+
+
+def _logic_explanation(price: SubscriptionPrice) -> str:
+    return f"Commission per student = max(7% of batch fees, ₹35). Total subscription = Commission per student × max(student_limit, 20 students). {'7% of fees is higher' if price.is_seven_percent_higher else 'Minimum ₹35 is higher'}."
+
+
+# Typed quotes
+
+@dataclass(frozen=True, slots=True)
+class SubscriptionQuote:
+    """
+    Inputs of one fee calculation. view picks the result shape:
+    subscription_fee, enhanced, batch or real_time. Quotes are immutable, so each
+    distinct quote is priced and JSON-encoded once and then reused as-is.
+    """
+    view: str
+    batch_fees: float
+    student_count: int
+    student_limit: int = None
+    detail: str = "full"
+
+    def _key(self) -> tuple:
+        return (self.view, self.batch_fees, self.student_count, self.student_limit, self.detail)
+
+    @property
+    def commission_per_student(self):
+        return _quote_values(*self._key())["commission_per_student"]
+
+    @property
+    def effective_student_count(self) -> int:
+        values = _quote_values(*self._key())
+        # real_time names it effective_student_count; the other views call it student_count
+        return values.get("effective_student_count", values.get("student_count"))
+
+    @property
+    def total_subscription(self):
+        return _quote_values(*self._key())["total_subscription"]
+
+    @property
+    def minimum_met(self) -> bool:
+        # real_time has no minimum_met key: it is measured on the current students there
+        return _quote_values(*self._key()).get("minimum_met", self.student_count >= MIN_STUDENTS)
+
+    def as_dict(self) -> MappingProxyType:
+        """The cached result itself, read-only (nested dicts included)"""
+        return _quote_values(*self._key())
+
+    def to_json(self) -> str:
+        return _quote_json(*self._key())
+
+
+_QUOTE_VIEWS = {
+    "subscription_fee": lambda batch_fees, student_count, student_limit, detail: subscription_fee_view(batch_fees, student_count),
+    "enhanced": lambda batch_fees, student_count, student_limit, detail: enhanced_subscription_fee_view(batch_fees, student_count, student_limit),
+    "batch": lambda batch_fees, student_count, student_limit, detail: batch_subscription_fee_view(batch_fees, student_count, student_limit, detail),
+    "real_time": lambda batch_fees, student_count, student_limit, detail: real_time_subscription_view(batch_fees, student_limit, student_count, detail),
+}
+
+
+# typed=True keeps 500 and 500.0 apart: they price the same but serialize differently
+@lru_cache(maxsize=8192, typed=True)
+def _quote_values(view: str, batch_fees, student_count: int, student_limit: int, detail: str) -> MappingProxyType:
+    values = _QUOTE_VIEWS[view](batch_fees, student_count, student_limit, detail)
+    return MappingProxyType({
+        key: MappingProxyType(value) if isinstance(value, dict) else value for key, value in values.items()
+    })
+
+
+@lru_cache(maxsize=8192, typed=True)
+def _quote_json(view: str, batch_fees, student_count: int, student_limit: int, detail: str) -> str:
+    values = _quote_values(view, batch_fees, student_count, student_limit, detail)
+    # default=dict renders the read-only mappings like the dicts they wrap
+    return json.dumps(values, default=dict, ensure_ascii=False, separators=(",", ":"))
+
+
+def quote_response_body(envelope: dict, **quotes) -> bytes:
+    """
+    JSON body of envelope with each quote spliced in under its keyword argument.
+    The quotes' cached JSON is copied verbatim instead of being re-encoded.
+    """
+    body = json.dumps(envelope, ensure_ascii=False, default=str, separators=(",", ":"))
+    parts = [body[:-1]]
+    separator = "," if envelope else ""
+    for key, quote in quotes.items():
+        parts.append(f"{separator}{json.dumps(key)}:{quote.to_json()}")
+        separator = ","
+    parts.append("}")
+    return "".join(parts).encode("utf-8")
@@ -0,0 +1,51 @@
+# Subscription Pricing Benchmark
+# Per-call latency of the pricing kernel before (recomputed on every call)
+# and after (precomputed table / LRU memo)
+#
+# Usage: python subscription_pricing_benchmark.py [calls]
+
+import random
+import sys
+import timeit
+
+from subscription_pricing import (
+    _compute_subscription_price,
+    batch_subscription_fee_view,
+    clear_pricing_cache,
+    price_subscription,
+    warm_pricing_table,
+)
+
+
+def main(calls: int = 200000):
+    random.seed(42)
+    # A realistic working set: a few hundred distinct (fees, limit) pairs hit repeatedly
+    pairs = [(random.choice([499, 500, 699, 999, 1500, 2500, 5000]), random.randint(10, 120)) for _ in range(300)]
+    workload = [random.choice(pairs) for _ in range(calls)]
+
+    def recomputed():
+        for batch_fees, student_limit in workload:
+            _compute_subscription_price(batch_fees, student_limit)
+
+    def memoized():
+        for batch_fees, student_limit in workload:
+            price_subscription(batch_fees, student_limit)
+
+    def legacy_view():
+        for batch_fees, student_limit in workload:
+            batch_subscription_fee_view(batch_fees, 0, student_limit)
+
+    clear_pricing_cache()
+    results = [("recomputed (before)", min(timeit.repeat(recomputed, number=1, repeat=3)))]
+    results.append(("LRU memo (after)", min(timeit.repeat(memoized, number=1, repeat=3))))
+    warm_pricing_table(pairs)
+    results.append(("precomputed table (after)", min(timeit.repeat(memoized, number=1, repeat=3))))
+    results.append(("legacy dict view (after)", min(timeit.repeat(legacy_view, number=1, repeat=3))))
+
+    print(f"{calls} calls over {len(pairs)} distinct (fees, limit) pairs")
+    for label, seconds in results:
+        print(f"{label:<28} {seconds * 1e9 / calls:8.1f} ns/call")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
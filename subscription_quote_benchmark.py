@@ -0,0 +1,79 @@
+# Subscription Quote Benchmark
+# Time and allocations per calculate/{batch_id} response body: the previous dict path
+# (fee dict + envelope with flattened copies + FastAPI encoding) against
+# SubscriptionQuote + quote_response_body
+#
+# Usage: python subscription_quote_benchmark.py [responses]
+
+import json
+import random
+import sys
+import timeit
+import tracemalloc
+
+from fastapi.encoders import jsonable_encoder
+
+from subscription_pricing import SubscriptionQuote, batch_subscription_fee_view, quote_response_body
+
+
+def _dict_body(batch_id, batch_fees, student_limit, current_students):
+    subscription_data = batch_subscription_fee_view(batch_fees, current_students, student_limit)
+    response = {
+        "batch_id": batch_id,
+        "batch_name": f"Batch {batch_id}",
+        "batch_fees": batch_fees,
+        "student_limit": student_limit,
+        "current_student_count": current_students,
+        "subscription_calculation": subscription_data,
+        "monthly_fee": subscription_data["total_subscription"],
+        "commission_per_student": subscription_data["commission_per_student"],
+        "effective_student_count": subscription_data["student_count"],
+        "minimum_met": subscription_data["minimum_met"],
+        "beta_testing_enabled": False
+    }
+    return json.dumps(jsonable_encoder(response), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _quote_body(batch_id, batch_fees, student_limit, current_students):
+    quote = SubscriptionQuote("batch", batch_fees, current_students, student_limit)
+    return quote_response_body({
+        "batch_id": batch_id,
+        "batch_name": f"Batch {batch_id}",
+        "batch_fees": batch_fees,
+        "student_limit": student_limit,
+        "current_student_count": current_students,
+        "beta_testing_enabled": False
+    }, subscription_calculation=quote)
+
+
+def _allocations(build, rows):
+    """Average peak of transient memory while building one response, and body size"""
+    tracemalloc.start()
+    peak_total = body_total = 0
+    for row in rows:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        body_total += len(build(*row))
+        peak_total += tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return peak_total / len(rows), body_total / len(rows)
+
+
+def main(responses: int = 20000):
+    random.seed(42)
+    # Dashboards re-request the same batches, so inputs repeat
+    batches = [(batch_id, float(random.choice([499, 699, 999, 1500, 2500])), random.randint(10, 120), random.randint(0, 60))
+               for batch_id in range(300)]
+    rows = [random.choice(batches) for _ in range(responses)]
+
+    print(f"{responses} responses over {len(batches)} batches")
+    for label, build in (("dict + jsonable_encoder", _dict_body), ("SubscriptionQuote", _quote_body)):
+        build(*rows[0])  # warm caches
+        seconds = min(timeit.repeat(lambda: [build(*row) for row in rows], number=1, repeat=3))
+        peak_bytes, body_bytes = _allocations(build, rows)
+        print(f"{label:<24} {seconds * 1e6 / responses:7.2f} us/response  "
+              f"{peak_bytes:7.0f} B peak/response  {body_bytes:5.0f} B body")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
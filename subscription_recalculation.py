@@ -0,0 +1,100 @@
+# Concurrency-safe Subscription Recalculation
+# Add this to your main API file
+#
+# Also add this column to TeacherSubscription (existing rows start at 1):
+#     version = Column(Integer, nullable=False, default=1, server_default="1")
+#
+# POST /api/teacher/subscription/recalculate/{batch_id} used to read count(), price it
+# and assign monthly_fee, so two overlapping calls - or a call racing a joining-request
+# approval - could store a fee computed from a stale count (last writer wins). Now:
+# - The write is a compare-and-swap on TeacherSubscription.version; a lost race
+#   re-reads the count and reprices, up to SUBSCRIPTION_CAS_MAX_ATTEMPTS times
+# - record_enrollment_change bumps the version, so an approval committed between our
+#   count and our write also fails the swap
+# - Concurrent recalculations of one batch in this worker share a single computation:
+#   late arrivals await the running one and get its result. Because that result is
+#   only stored once no approval slipped in, it covers every change committed before
+#   they arrived. The shared job opens and closes its own session, so it does not
+#   depend on the request that started it staying connected.
+
+import asyncio
+import os
+
+SUBSCRIPTION_CAS_MAX_ATTEMPTS = int(os.getenv("SUBSCRIPTION_CAS_MAX_ATTEMPTS", "5"))
+
+
+def bump_subscription_version(db: Session, batch_id: int):
+    """Fail in-flight recalculations of batch_id; call inside the changing transaction"""
+    db.query(models.TeacherSubscription).filter(
+        models.TeacherSubscription.batch_id == batch_id,
+        models.TeacherSubscription.status == "active"
+    ).update(
+        {"version": models.TeacherSubscription.version + 1},
+        synchronize_session=False
+    )
+
+
+def recalculate_subscription(db: Session, batch_id: int, calculate) -> tuple:
+    """
+    Count approved students, price them with calculate(student_count) -> SubscriptionQuote
+    and store the result on the batch's active subscription with a compare-and-swap on
+    version. Returns (current_student_count, quote).
+    """
+    subscription = models.TeacherSubscription
+    for _ in range(SUBSCRIPTION_CAS_MAX_ATTEMPTS):
+        existing = db.query(subscription.id, subscription.version).filter(
+            subscription.batch_id == batch_id,
+            subscription.status == "active"
+        ).first()
+        current_student_count = db.query(models.Batch.approved_student_count).filter(
+            models.Batch.id == batch_id
+        ).scalar() or 0
+        quote = calculate(current_student_count)
+        if existing is None:
+            db.rollback()
+            return current_student_count, quote
+
+        swapped = db.query(subscription).filter(
+            subscription.id == existing.id,
+            subscription.version == existing.version
+        ).update({
+            "monthly_fee": quote.total_subscription,
+            "student_count": current_student_count,
+            "version": existing.version + 1
+        }, synchronize_session=False)
+        if swapped:
+            db.commit()
+            return current_student_count, quote
+        # Someone else changed the subscription or the enrollment: start over
+        db.rollback()
+
+    raise HTTPException(status_code=409, detail="Subscription is being updated concurrently, please retry")
+
+
+_in_flight_recalculations = {}
+
+
+def _recalculate_subscription_in_new_session(batch_id: int, calculate) -> tuple:
+    db = SessionLocal()
+    try:
+        return recalculate_subscription(db, batch_id, calculate)
+    finally:
+        db.close()
+
+
+async def coalesced_subscription_recalculation(batch_id: int, calculate) -> tuple:
+    """
+    Run recalculate_subscription off the event loop in its own session.
+    Concurrent calls for the same batch share one computation.
+    """
+    in_flight = _in_flight_recalculations.get(batch_id)
+    if in_flight is not None:
+        return await asyncio.shield(in_flight)
+
+    future = asyncio.ensure_future(asyncio.to_thread(_recalculate_subscription_in_new_session, batch_id, calculate))
+    _in_flight_recalculations[batch_id] = future
+    try:
+        return await asyncio.shield(future)
+    finally:
+        if _in_flight_recalculations.get(batch_id) is future:
+            del _in_flight_recalculations[batch_id]
@@ -0,0 +1,413 @@
+# Subscription Summary Maintenance
+# Add this to your main API file
+#
+# Keeps models.BatchSubscriptionSummary / models.TeacherSubscriptionSummary in step
+# with the source tables. Call the record_* hooks inside the same transaction as the
+# change they describe (before db.commit()). Enrollment changes update
+# Batch.approved_student_count immediately and the summaries asynchronously through
+# the subscription_events outbox; the rest apply immediately:
+# - /api/joining-requests/{id}/approve and /reject -> record_join_request_status_change
+# - /api/batches/{id}/students/{sid} removal        -> record_enrollment_change(db, batch_id, -1)
+# - batch create / fee or student_limit edits       -> record_batch_change
+# - batch deletion (before deleting the row)        -> record_batch_deleted
+# - subscription create / payment / billing roll    -> record_subscription_change
+# Every hook also bumps the teacher's status version (teacher_status_version.py).
+#
+# reconcile_subscription_summaries() compares every stored summary with a full
+# recompute and repairs drift. Run it nightly on exactly one worker with
+# SUMMARY_RECONCILE_ENABLED=true (at SUMMARY_RECONCILE_HOUR UTC).
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from structured_logging import get_logger, log_event
+from subscription_pricing import price_subscription
+
+SUMMARY_RECONCILE_ENABLED = os.getenv("SUMMARY_RECONCILE_ENABLED", "false").lower() == "true"
+SUMMARY_RECONCILE_HOUR = int(os.getenv("SUMMARY_RECONCILE_HOUR", "3"))  # UTC
+
+summary_logger = get_logger("subscription")
+
+
+def _batch_subscription_fee(batch_fees, student_limit: int, approved_count: int) -> int:
+    """Subscription fee for one batch, using the same rule as the metrics endpoint"""
+    return price_subscription(batch_fees or 0, student_limit or approved_count, truncate_commission=True).total_subscription
+
+
+def _next_due_dates(db: Session, batch_ids) -> dict:
+    """Earliest active next_billing_date per batch in one grouped query"""
+    if not batch_ids:
+        return {}
+    rows = db.query(
+        models.TeacherSubscription.batch_id,
+        func.min(models.TeacherSubscription.next_billing_date)
+    ).filter(
+        models.TeacherSubscription.batch_id.in_(list(batch_ids)),
+        models.TeacherSubscription.status == "active"
+    ).group_by(models.TeacherSubscription.batch_id).all()
+    return dict(rows)
+
+
+def _compute_teacher_summaries(db: Session, teacher_id: int):
+    """Full recompute of a teacher's batch summaries and totals from the source tables"""
+    batches = db.query(models.Batch).filter(models.Batch.teacher_id == teacher_id).all()
+    batch_ids = [batch.id for batch in batches]
+    approved_counts = get_approved_student_counts(db, batch_ids)
+    next_due_dates = _next_due_dates(db, batch_ids)
+
+    batch_summaries = []
+    for batch in batches:
+        approved_count = approved_counts[batch.id]
+        batch_summaries.append({
+            "batch_id": batch.id,
+            "teacher_id": teacher_id,
+            "approved_count": approved_count,
+            "batch_fees": batch.fees or 0,
+            "student_limit": batch.student_limit or 0,
+            "subscription_fee": _batch_subscription_fee(batch.fees, batch.student_limit, approved_count),
+            "next_due_date": next_due_dates.get(batch.id)
+        })
+
+    due_dates = [summary["next_due_date"] for summary in batch_summaries if summary["next_due_date"]]
+    teacher_summary = {
+        "teacher_id": teacher_id,
+        "total_batches": len(batch_summaries),
+        "approved_count": sum(summary["approved_count"] for summary in batch_summaries),
+        "total_fees": sum(summary["batch_fees"] for summary in batch_summaries),
+        "total_subscription_fees": sum(summary["subscription_fee"] for summary in batch_summaries),
+        "next_due_date": min(due_dates) if due_dates else None
+    }
+    return batch_summaries, teacher_summary
+
+
+def rebuild_teacher_summary(db: Session, teacher_id: int):
+    """Recompute and store a teacher's summaries (also used to backfill missing rows)"""
+    batch_summaries, teacher_summary = _compute_teacher_summaries(db, teacher_id)
+
+    db.query(models.BatchSubscriptionSummary).filter(
+        models.BatchSubscriptionSummary.teacher_id == teacher_id
+    ).delete(synchronize_session=False)
+    db.add_all(models.BatchSubscriptionSummary(**summary) for summary in batch_summaries)
+
+    summary = db.get(models.TeacherSubscriptionSummary, teacher_id)
+    if summary is None:
+        summary = models.TeacherSubscriptionSummary(teacher_id=teacher_id)
+        db.add(summary)
+    for field, value in teacher_summary.items():
+        setattr(summary, field, value)
+    db.flush()
+    return summary
+
+
+def get_teacher_summary(db: Session, teacher_id: int):
+    """O(1) read of a teacher's totals, building them on first access"""
+    summary = db.get(models.TeacherSubscriptionSummary, teacher_id)
+    if summary is None:
+        try:
+            summary = rebuild_teacher_summary(db, teacher_id)
+            db.commit()
+        except IntegrityError:
+            # A concurrent first read inserted the rows first; use the ones it committed
+            db.rollback()
+            summary = db.get(models.TeacherSubscriptionSummary, teacher_id)
+    return summary
+
+
+def _locked_summaries(db: Session, batch_id: int):
+    """Batch and teacher summary rows for batch_id, locked for update"""
+    batch_summary = db.query(models.BatchSubscriptionSummary).filter(
+        models.BatchSubscriptionSummary.batch_id == batch_id
+    ).with_for_update().first()
+    if batch_summary is None:
+        return None, None
+    teacher_summary = db.query(models.TeacherSubscriptionSummary).filter(
+        models.TeacherSubscriptionSummary.teacher_id == batch_summary.teacher_id
+    ).with_for_update().first()
+    return batch_summary, teacher_summary
+
+
+def _apply_batch_update(db: Session, batch_id: int, teacher_id: int, approved_delta: int = 0,
+                        batch_fees=None, student_limit: int = None, refresh_due_date: bool = False):
+    """Apply one change to a batch summary and roll the difference into its teacher's totals"""
+    batch_summary, teacher_summary = _locked_summaries(db, batch_id)
+    if batch_summary is None or teacher_summary is None:
+        # Not materialized yet (or partially): rebuild from the source tables instead
+        rebuild_teacher_summary(db, teacher_id)
+        return
+
+    old_count = batch_summary.approved_count
+    old_fees = batch_summary.batch_fees
+    old_subscription_fee = batch_summary.subscription_fee
+
+    batch_summary.approved_count = old_count + approved_delta
+    if batch_fees is not None:
+        batch_summary.batch_fees = batch_fees
+    if student_limit is not None:
+        batch_summary.student_limit = student_limit
+    batch_summary.subscription_fee = _batch_subscription_fee(
+        batch_summary.batch_fees, batch_summary.student_limit, batch_summary.approved_count
+    )
+
+    teacher_summary.approved_count += batch_summary.approved_count - old_count
+    teacher_summary.total_fees += batch_summary.batch_fees - old_fees
+    teacher_summary.total_subscription_fees += batch_summary.subscription_fee - old_subscription_fee
+
+    if refresh_due_date:
+        batch_summary.next_due_date = _next_due_dates(db, [batch_id]).get(batch_id)
+        db.flush()
+        teacher_summary.next_due_date = db.query(
+            func.min(models.BatchSubscriptionSummary.next_due_date)
+        ).filter(models.BatchSubscriptionSummary.teacher_id == teacher_id).scalar()
+
+
+def record_enrollment_change(db: Session, batch_id: int, approved_delta: int):
+    """
+    An approved student joined (+1) or left (-1) a batch:
+    - Batch.approved_student_count changes in this transaction
+    - The summaries follow through the event consumer
+    """
+    if approved_delta == 0:
+        return
+    adjust_approved_student_count(db, batch_id, approved_delta)
+    bump_subscription_version(db, batch_id)
+    bump_teacher_status_version(db, batch_ids=[batch_id])
+    emit_subscription_event(db, "enrollment_changed", batch_id, {"approved_delta": approved_delta})
+
+
+def refresh_batch_summary(db: Session, batch_id: int):
+    """Re-derive one batch's summary from the source tables and roll the difference into its teacher's totals"""
+    batch = db.query(
+        models.Batch.teacher_id,
+        models.Batch.fees,
+        models.Batch.student_limit,
+        models.Batch.approved_student_count
+    ).filter(models.Batch.id == batch_id).first()
+    if batch is None:
+        # Deleted since the event was emitted; record_batch_deleted already adjusted the totals
+        return
+
+    batch_summary, _ = _locked_summaries(db, batch_id)
+    if batch_summary is None:
+        rebuild_teacher_summary(db, batch.teacher_id)
+        return
+
+    _apply_batch_update(
+        db, batch_id, batch.teacher_id,
+        approved_delta=batch.approved_student_count - batch_summary.approved_count,
+        batch_fees=batch.fees or 0,
+        student_limit=batch.student_limit or 0
+    )
+
+
+def record_join_request_status_change(db: Session, batch_id: int, old_status, new_status):
+    """Joining request moved between statuses; only transitions to/from approved matter"""
+    approved = models.JoinRequestStatus.approved
+    record_enrollment_change(db, batch_id, int(new_status == approved) - int(old_status == approved))
+
+
+def record_batch_change(db: Session, batch):
+    """Batch created, or its fees / student_limit edited"""
+    emit_subscription_event(db, "batch_changed", batch.id)
+    bump_teacher_status_version(db, teacher_id=batch.teacher_id)
+    if db.get(models.BatchSubscriptionSummary, batch.id) is not None:
+        _apply_batch_update(
+            db, batch.id, batch.teacher_id,
+            batch_fees=batch.fees or 0,
+            student_limit=batch.student_limit or 0
+        )
+        return
+
+    teacher_summary = db.query(models.TeacherSubscriptionSummary).filter(
+        models.TeacherSubscriptionSummary.teacher_id == batch.teacher_id
+    ).with_for_update().first()
+    if teacher_summary is None:
+        rebuild_teacher_summary(db, batch.teacher_id)
+        return
+
+    approved_count = batch.approved_student_count or 0
+    batch_summary = models.BatchSubscriptionSummary(
+        batch_id=batch.id,
+        teacher_id=batch.teacher_id,
+        approved_count=approved_count,
+        batch_fees=batch.fees or 0,
+        student_limit=batch.student_limit or 0,
+        subscription_fee=_batch_subscription_fee(batch.fees, batch.student_limit, approved_count),
+        next_due_date=_next_due_dates(db, [batch.id]).get(batch.id)
+    )
+    db.add(batch_summary)
+
+    teacher_summary.total_batches += 1
+    teacher_summary.approved_count += batch_summary.approved_count
+    teacher_summary.total_fees += batch_summary.batch_fees
+    teacher_summary.total_subscription_fees += batch_summary.subscription_fee
+    if batch_summary.next_due_date and (
+        teacher_summary.next_due_date is None or batch_summary.next_due_date < teacher_summary.next_due_date
+    ):
+        teacher_summary.next_due_date = batch_summary.next_due_date
+
+
+def record_batch_deleted(db: Session, batch_id: int, teacher_id: int):
+    """Batch removed; subtract its summary from the teacher's totals"""
+    bump_teacher_status_version(db, teacher_id=teacher_id)
+    batch_summary, teacher_summary = _locked_summaries(db, batch_id)
+    if batch_summary is None or teacher_summary is None:
+        rebuild_teacher_summary(db, teacher_id)
+        return
+
+    teacher_summary.total_batches -= 1
+    teacher_summary.approved_count -= batch_summary.approved_count
+    teacher_summary.total_fees -= batch_summary.batch_fees
+    teacher_summary.total_subscription_fees -= batch_summary.subscription_fee
+    db.delete(batch_summary)
+    db.flush()
+
+    if batch_summary.next_due_date and batch_summary.next_due_date == teacher_summary.next_due_date:
+        teacher_summary.next_due_date = db.query(
+            func.min(models.BatchSubscriptionSummary.next_due_date)
+        ).filter(models.BatchSubscriptionSummary.teacher_id == teacher_id).scalar()
+
+
+def record_subscription_change(db: Session, batch_id: int):
+    """A subscription for the batch was created, paid or had its billing date moved"""
+    teacher_id = db.query(models.Batch.teacher_id).filter(models.Batch.id == batch_id).scalar()
+    if teacher_id is not None:
+        bump_teacher_status_version(db, teacher_id=teacher_id)
+        _apply_batch_update(db, batch_id, teacher_id, refresh_due_date=True)
+
+
+_BATCH_SUMMARY_FIELDS = (
+    "batch_id", "teacher_id", "approved_count", "batch_fees",
+    "student_limit", "subscription_fee", "next_due_date"
+)
+
+
+def _comparable(summary: dict) -> dict:
+    # Incremental float sums can differ from a fresh sum in the last bits
+    return {
+        field: round(value, 2) if isinstance(value, float) else value
+        for field, value in summary.items()
+    }
+
+
+def reconcile_subscription_summaries(db: Session, repair: bool = True) -> dict:
+    """
+    Verify every teacher's stored summaries against a full recompute:
+    - Reports each teacher whose totals or batch rows drifted
+    - repair=True rewrites the drifted teachers from the source tables
+    Runs nightly through start_summary_reconciler (SUMMARY_RECONCILE_ENABLED).
+    """
+    teacher_ids = {teacher_id for (teacher_id,) in db.query(models.Batch.teacher_id).distinct()}
+    teacher_ids.update(teacher_id for (teacher_id,) in db.query(models.TeacherSubscriptionSummary.teacher_id))
+
+    mismatches = []
+    for teacher_id in sorted(teacher_ids):
+        batch_summaries, teacher_summary = _compute_teacher_summaries(db, teacher_id)
+        expected_teacher = _comparable(teacher_summary)
+        expected_batches = {summary["batch_id"]: _comparable(summary) for summary in batch_summaries}
+
+        stored = db.get(models.TeacherSubscriptionSummary, teacher_id)
+        stored_teacher = _comparable({field: getattr(stored, field) for field in teacher_summary}) if stored else None
+        stored_batches = {
+            summary.batch_id: _comparable({field: getattr(summary, field) for field in _BATCH_SUMMARY_FIELDS})
+            for summary in db.query(models.BatchSubscriptionSummary).filter(
+                models.BatchSubscriptionSummary.teacher_id == teacher_id
+            )
+        }
+
+        if stored_teacher != expected_teacher or stored_batches != expected_batches:
+            mismatches.append({
+                "teacher_id": teacher_id,
+                "stored": stored_teacher,
+                "expected": expected_teacher,
+                "drifted_batch_ids": sorted(
+                    batch_id for batch_id in set(stored_batches) | set(expected_batches)
+                    if stored_batches.get(batch_id) != expected_batches.get(batch_id)
+                )
+            })
+            if repair:
+                rebuild_teacher_summary(db, teacher_id)
+
+    if repair and mismatches:
+        db.commit()
+
+    return {
+        "teachers_checked": len(teacher_ids),
+        "mismatch_count": len(mismatches),
+        "mismatches": mismatches,
+        "repaired": repair
+    }
+
+
+def refresh_summary_due_dates(db: Session, batch_ids):
+    """
+    Bulk-refresh next_due_date for many batches and their teachers (billing runs).
+    Batches whose summaries have not been built yet are skipped; the first read builds them.
+    """
+    summarized = db.query(
+        models.BatchSubscriptionSummary.batch_id,
+        models.BatchSubscriptionSummary.teacher_id
+    ).filter(models.BatchSubscriptionSummary.batch_id.in_(list(batch_ids))).all()
+    if not summarized:
+        return
+    batch_ids = [batch_id for batch_id, _ in summarized]
+    next_due_dates = _next_due_dates(db, batch_ids)
+    db.bulk_update_mappings(models.BatchSubscriptionSummary, [
+        {"batch_id": batch_id, "next_due_date": next_due_dates.get(batch_id)}
+        for batch_id in batch_ids
+    ])
+    db.flush()
+
+    teacher_ids = list({teacher_id for _, teacher_id in summarized})
+    rows = db.query(
+        models.BatchSubscriptionSummary.teacher_id,
+        func.min(models.BatchSubscriptionSummary.next_due_date)
+    ).filter(
+        models.BatchSubscriptionSummary.teacher_id.in_(teacher_ids)
+    ).group_by(models.BatchSubscriptionSummary.teacher_id).all()
+    db.bulk_update_mappings(models.TeacherSubscriptionSummary, [
+        {"teacher_id": teacher_id, "next_due_date": next_due_date}
+        for teacher_id, next_due_date in rows
+    ])
+
+
+def _seconds_until_reconcile(now: datetime) -> float:
+    next_run = now.replace(hour=SUMMARY_RECONCILE_HOUR, minute=0, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    return (next_run - now).total_seconds()
+
+
+def _reconcile_subscription_summaries_in_new_session() -> dict:
+    db = SessionLocal()
+    try:
+        return reconcile_subscription_summaries(db)
+    finally:
+        db.close()
+
+
+async def _summary_reconciler():
+    while True:
+        await asyncio.sleep(_seconds_until_reconcile(datetime.utcnow()))
+        try:
+            result = await asyncio.to_thread(_reconcile_subscription_summaries_in_new_session)
+            if result["mismatch_count"]:
+                log_event(summary_logger, logging.WARNING, "subscription_summaries_repaired",
+                          teachers_checked=result["teachers_checked"], mismatch_count=result["mismatch_count"],
+                          mismatches=result["mismatches"][:100])
+            else:
+                log_event(summary_logger, logging.INFO, "subscription_summaries_reconciled",
+                          teachers_checked=result["teachers_checked"])
+        except Exception as e:
+            log_event(summary_logger, logging.ERROR, "subscription_summary_reconcile_failed",
+                      exc_info=True, error=str(e))
+
+
+@app.on_event("startup")
+async def start_summary_reconciler():
+    if SUMMARY_RECONCILE_ENABLED:
+        asyncio.create_task(_summary_reconciler())
@@ -0,0 +1,32 @@
+# Subscription Summary Models
+# Add these models to your models.py
+
+from datetime import datetime
+from sqlalchemy import Column, Date, DateTime, Float, ForeignKey, Integer
+
+
+class BatchSubscriptionSummary(Base):
+    """Maintained per-batch totals so subscription reads don't rescan students"""
+    __tablename__ = "batch_subscription_summaries"
+
+    batch_id = Column(Integer, ForeignKey("batches.id", ondelete="CASCADE"), primary_key=True)
+    teacher_id = Column(Integer, ForeignKey("teachers.id"), nullable=False, index=True)
+    approved_count = Column(Integer, nullable=False, default=0)
+    batch_fees = Column(Float, nullable=False, default=0)
+    student_limit = Column(Integer, nullable=False, default=0)
+    subscription_fee = Column(Integer, nullable=False, default=0)
+    next_due_date = Column(Date, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class TeacherSubscriptionSummary(Base):
+    """Maintained per-teacher totals backing /api/teacher/subscription/metrics"""
+    __tablename__ = "teacher_subscription_summaries"
+
+    teacher_id = Column(Integer, ForeignKey("teachers.id", ondelete="CASCADE"), primary_key=True)
+    total_batches = Column(Integer, nullable=False, default=0)
+    approved_count = Column(Integer, nullable=False, default=0)
+    total_fees = Column(Float, nullable=False, default=0)
+    total_subscription_fees = Column(Integer, nullable=False, default=0)
+    next_due_date = Column(Date, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
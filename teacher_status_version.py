@@ -0,0 +1,75 @@
+# Teacher Subscription-Status Version
+# Add this to your main API file
+#
+# A per-teacher counter that moves whenever anything shown by
+# /api/teacher/subscription/status (or /status-check) changes, so those responses can
+# be cached by response_cache.cached_response under (teacher, version, date). Add this
+# column to Teacher in models.py:
+#     subscription_status_version = Column(Integer, nullable=False, default=1, server_default="1")
+#
+# It is bumped in the same transaction as the change, by the subscription_summary
+# record_* hooks (enrollments, batch create / delete, subscription changes), the
+# billing cycle, bulk recalculation and the approved-count drift repair. Batch edits
+# are caught at flush time instead: any ORM change to a Batch column the status
+# payload shows (STATUS_PAYLOAD_BATCH_FIELDS - a rename, fees, student_limit or a
+# change of owner) bumps the owning teacher, whichever endpoint made it. Bulk UPDATEs
+# of those columns skip the flush and must call bump_teacher_status_version themselves.
+# Add the decorator to status-check in the same way:
+#     @app.get("/api/teacher/subscription/status-check")
+#     @cached_response(lambda db, current_teacher, **_: teacher_status_stamp(db, current_teacher.id))
+
+from datetime import date
+
+from sqlalchemy import event
+from sqlalchemy import inspect as sqlalchemy_inspect
+
+STATUS_PAYLOAD_BATCH_FIELDS = ("name", "fees", "student_limit", "teacher_id")
+
+
+def bump_teacher_status_version(db: Session, teacher_id: int = None, batch_ids=None):
+    """Invalidate cached status responses of a teacher, or of the teachers owning batch_ids"""
+    query = db.query(models.Teacher)
+    if teacher_id is not None:
+        query = query.filter(models.Teacher.id == teacher_id)
+    else:
+        batch_ids = list(batch_ids or ())
+        if not batch_ids:
+            return
+        query = query.filter(models.Teacher.id.in_(
+            db.query(models.Batch.teacher_id).filter(models.Batch.id.in_(batch_ids))
+        ))
+    query.update(
+        {"subscription_status_version": models.Teacher.subscription_status_version + 1},
+        synchronize_session=False
+    )
+
+
+def teacher_status_stamp(db: Session, teacher_id: int):
+    """Cache stamp of a teacher's status responses; is_due depends on the date, so it is included"""
+    version = db.query(models.Teacher.subscription_status_version).filter(
+        models.Teacher.id == teacher_id
+    ).scalar()
+    if version is None:
+        return None
+    return (teacher_id, version, date.today().isoformat())
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _bump_on_batch_payload_edit(session, flush_context, instances):
+    """Bump the owners of dirty batches whose status payload fields changed"""
+    teacher_ids = set()
+    for batch in session.dirty:
+        if not isinstance(batch, models.Batch):
+            continue
+        attributes = sqlalchemy_inspect(batch).attrs
+        for field in STATUS_PAYLOAD_BATCH_FIELDS:
+            history = attributes[field].history
+            if history.has_changes():
+                teacher_ids.add(batch.teacher_id)
+                if field == "teacher_id":
+                    # The previous owner's status loses the batch; the row still holds it
+                    teacher_ids.add(session.query(models.Batch.teacher_id).filter(
+                        models.Batch.id == batch.id
+                    ).scalar())
+    for teacher_id in sorted(teacher_id for teacher_id in teacher_ids if teacher_id is not None):
+        bump_teacher_status_version(session, teacher_id=teacher_id)
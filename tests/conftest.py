@@ -0,0 +1,307 @@
+# Shared fixtures for the snippet modules
+#
+# Most modules in this repo are snippets for the main API file: they use app, models,
+# get_db, get_current_teacher ... from there instead of importing them. load_snippets()
+# runs them in one namespace that provides those names, backed by a SQLite database
+# and the part of the main app's models the snippets touch (with the columns their
+# headers ask to add). The pure modules (subscription_pricing, fast_json, ...) are
+# imported directly by the tests.
+
+import asyncio
+import enum
+import json
+import types
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+from urllib.parse import urlencode
+
+import pytest
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
+from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import Column, Date, Enum, Float, ForeignKey, Integer, String, create_engine, event
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from response_cache import response_cache
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+MODEL_SNIPPETS = (
+    "subscription_summary_models.py",
+    "subscription_event_models.py",
+    "billing_cycle_models.py",
+    "pending_batch_models.py",
+    "covering_index_models.py",
+)
+
+# The subscription endpoints (api_fixes variant) with everything they call, in load order
+MAIN_API_SNIPPETS = (
+    "feature_flag_cache.py",
+    "stateless_auth.py",
+    "cached_auth.py",
+    "batch_student_counts.py",
+    "query_instrumentation.py",
+    "teacher_status_version.py",
+    "subscription_recalculation.py",
+    "approved_student_counter.py",
+    "subscription_events.py",
+    "subscription_summary.py",
+    "billing_cycle.py",
+    "real_time_subscription_api.py",
+    "api_fixes.py",
+)
+
+
+def pytest_configure(config):
+    # The snippets register background jobs with @app.on_event, like the main app does
+    config.addinivalue_line("filterwarnings", "ignore:\\s*on_event is deprecated:DeprecationWarning")
+
+
+def make_models() -> types.ModuleType:
+    """A fresh models module: the main app's tables plus the *_models.py snippets"""
+    Base = declarative_base()
+
+    class JoinRequestStatus(enum.Enum):
+        pending = "pending"
+        approved = "approved"
+        rejected = "rejected"
+
+    class Teacher(Base):
+        __tablename__ = "teachers"
+        id = Column(Integer, primary_key=True)
+        full_name = Column(String)
+        email = Column(String)
+        subscription_status_version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    class Batch(Base):
+        __tablename__ = "batches"
+        id = Column(Integer, primary_key=True)
+        name = Column(String)
+        subject = Column(String)
+        description = Column(String)
+        fees = Column(Float)
+        student_limit = Column(Integer)
+        teacher_id = Column(Integer, ForeignKey("teachers.id"))
+        approved_student_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+    class BatchStudent(Base):
+        __tablename__ = "batch_students"
+        id = Column(Integer, primary_key=True)
+        batch_id = Column(Integer, ForeignKey("batches.id"))
+        student_id = Column(Integer)
+        status = Column(Enum(JoinRequestStatus))
+
+    class TeacherSubscription(Base):
+        __tablename__ = "teacher_subscriptions"
+        id = Column(Integer, primary_key=True)
+        batch_id = Column(Integer, ForeignKey("batches.id"))
+        status = Column(String)
+        monthly_fee = Column(Float)
+        student_count = Column(Integer)
+        start_date = Column(Date)
+        end_date = Column(Date)
+        next_billing_date = Column(Date)
+        last_billed_on = Column(Date, nullable=True)
+        version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    models = types.ModuleType("models")
+    for value in (Base, JoinRequestStatus, Teacher, Batch, BatchStudent, TeacherSubscription):
+        setattr(models, value.__name__ if value is not Base else "Base", value)
+
+    for file_name in MODEL_SNIPPETS:
+        namespace = {"Base": Base, "Batch": Batch, "BatchStudent": BatchStudent, "TeacherSubscription": TeacherSubscription}
+        _exec_snippet(file_name, namespace)
+        for name, value in namespace.items():
+            if isinstance(value, type) and issubclass(value, Base) and value is not Base:
+                setattr(models, name, value)
+    return models
+
+
+def _exec_snippet(file_name: str, namespace: dict):
+    path = REPO_ROOT / file_name
+    exec(compile(path.read_text(), str(path), "exec"), namespace)
+
+
+class Snippets(dict):
+    """Namespace the snippets ran in; names can also be read as attributes"""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def session(self) -> Session:
+        return self["SessionLocal"]()
+
+    def as_teacher(self, teacher_id: int):
+        """Authenticate every request as teacher_id"""
+        overrides = self["app"].dependency_overrides
+        current_user = lambda: {"type": "teacher", "id": teacher_id}  # noqa: E731
+        current_teacher = lambda: self["models"].Teacher(id=teacher_id)  # noqa: E731
+        for name, dependency in (
+            ("get_current_user", current_user), ("cached_get_current_user", current_user),
+            ("get_teacher_token_claims", current_user),
+            ("get_current_teacher", current_teacher), ("cached_get_current_teacher", current_teacher),
+        ):
+            if name in self:
+                overrides[self[name]] = dependency
+
+    def request(self, method: str, path: str, params: dict = None, headers: dict = None,
+                json_body=None, client: str = "127.0.0.1") -> "AsgiResponse":
+        return asyncio.run(call_asgi(self["app"], method, path, params, headers, json_body, client))
+
+
+class AsgiResponse:
+    def __init__(self, status_code: int, headers: dict, content: bytes):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content)
+
+
+async def call_asgi(app, method: str, path: str, params: dict = None, headers: dict = None,
+                    json_body=None, client: str = "127.0.0.1") -> AsgiResponse:
+    """Send one HTTP request through the ASGI app and collect the whole response"""
+    body = b"" if json_body is None else json.dumps(json_body).encode()
+    request_headers = [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    if json_body is not None:
+        request_headers.append((b"content-type", b"application/json"))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": urlencode(params or {}).encode(), "headers": request_headers,
+        "client": (client, 50000), "server": ("testserver", 80)
+    }
+    messages = []
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    start = next(message for message in messages if message["type"] == "http.response.start")
+    return AsgiResponse(
+        start["status"],
+        {name.decode(): value.decode() for name, value in start["headers"]},
+        b"".join(message.get("body", b"") for message in messages if message["type"] == "http.response.body")
+    )
+
+
+def load_snippets(*file_names, url: str = "sqlite://", **names) -> Snippets:
+    """
+    Run snippet files, in order, in one main-API namespace on a fresh database.
+    names add or replace globals (e.g. is_beta_testing_enabled, razorpay_client).
+    """
+    models = make_models()
+    if url == "sqlite://":
+        engine = create_engine(url, poolclass=StaticPool, connect_args={"check_same_thread": False})
+    else:
+        engine = create_engine(url, connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(engine)
+
+    # Session listeners registered by a snippet stay with this namespace's class
+    session_class = type("SnippetSession", (Session,), {})
+    SessionLocal = sessionmaker(bind=engine, class_=session_class)
+
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def get_current_user():
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    def get_current_teacher():
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    namespace = Snippets(
+        app=FastAPI(), models=models, engine=engine, SessionLocal=SessionLocal, Session=session_class,
+        get_db=get_db, get_current_user=get_current_user, get_current_teacher=get_current_teacher,
+        oauth2_scheme=OAuth2PasswordBearer(tokenUrl="/api/auth/login"),
+        is_beta_testing_enabled=lambda db: False,
+        Depends=Depends, Header=Header, HTTPException=HTTPException, Query=Query, Request=Request,
+        Response=Response, JSONResponse=JSONResponse, RedirectResponse=RedirectResponse,
+        StreamingResponse=StreamingResponse
+    )
+    namespace.update(names)
+    for file_name in file_names:
+        _exec_snippet(file_name, namespace)
+    return namespace
+
+
+@contextmanager
+def count_statements(engine):
+    """Collect every SQL statement sent to engine's connections while the block runs"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture(autouse=True)
+def feature_flag_version_file(tmp_path, monkeypatch):
+    """Keep each test's flag invalidations out of the shared temp-dir stamp file"""
+    path = tmp_path / "feature_flags.version"
+    monkeypatch.setenv("FEATURE_FLAG_VERSION_FILE", str(path))
+    return path
+
+
+@pytest.fixture
+def main_api():
+    """The subscription endpoints on an empty in-memory database"""
+    response_cache.clear()
+    snippets = load_snippets(*MAIN_API_SNIPPETS)
+    yield snippets
+    snippets.engine.dispose()
+
+
+def add_teacher_batches(snippets: Snippets, teacher_id: int, batch_count: int, approved_per_batch: int = 0,
+                        fees: float = 1500, student_limit: int = 30, with_subscriptions: bool = False):
+    """Seed a teacher with batch_count batches (and their approved enrollments); returns batch ids"""
+    models = snippets.models
+    db = snippets.session()
+    try:
+        if db.get(models.Teacher, teacher_id) is None:
+            db.add(models.Teacher(id=teacher_id, full_name=f"Teacher {teacher_id}", email=f"t{teacher_id}@example.com"))
+        batches = [
+            models.Batch(name=f"Batch {index}", fees=fees, student_limit=student_limit, teacher_id=teacher_id,
+                         approved_student_count=approved_per_batch)
+            for index in range(batch_count)
+        ]
+        db.add_all(batches)
+        db.flush()
+        for batch in batches:
+            db.add_all(
+                models.BatchStudent(batch_id=batch.id, student_id=student_id, status=models.JoinRequestStatus.approved)
+                for student_id in range(approved_per_batch)
+            )
+            if with_subscriptions:
+                db.add(models.TeacherSubscription(
+                    batch_id=batch.id, status="active", monthly_fee=0, student_count=0,
+                    start_date=date(2025, 1, 1), next_billing_date=date(2025, 2, 1)
+                ))
+        db.commit()
+        return [batch.id for batch in batches]
+    finally:
+        db.close()
+
@@ -0,0 +1,106 @@
+import base64
+import json
+
+import pytest
+
+from tests.conftest import add_teacher_batches
+
+ALL_BATCHES = "/api/teacher/subscription/calculate-all-batches"
+
+
+@pytest.fixture
+def all_batches_api(main_api):
+    add_teacher_batches(main_api, teacher_id=1, batch_count=3, approved_per_batch=4, fees=1500, student_limit=30)
+    add_teacher_batches(main_api, teacher_id=2, batch_count=2)
+    add_teacher_batches(main_api, teacher_id=1, batch_count=2, approved_per_batch=25, fees=400, student_limit=25)
+    main_api.as_teacher(1)
+    return main_api
+
+
+@pytest.fixture
+def small_stream_chunks(all_batches_api, monkeypatch):
+    """Stream in chunks of 2, so the 5 batches cross chunk boundaries"""
+    monkeypatch.setattr(all_batches_api.iter_teacher_batch_calculation_chunks, "__defaults__", (2,))
+
+
+def _whole(api, **params) -> dict:
+    response = api.request("GET", ALL_BATCHES, params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def _pages(api, limit: int) -> list:
+    pages, cursor = [], None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        page = _whole(api, **params)
+        pages.append(page)
+        cursor = page["next_cursor"]
+        if not page["has_more"]:
+            assert cursor is None
+            return pages
+
+
+@pytest.mark.parametrize("limit, page_sizes", [(2, [2, 2, 1]), (5, [5]), (1, [1] * 5), (4, [4, 1])])
+def test_pages_cover_every_batch_once(all_batches_api, limit, page_sizes):
+    whole = _whole(all_batches_api)
+    pages = _pages(all_batches_api, limit)
+
+    assert [page["page_batches"] for page in pages] == page_sizes
+    paged = [calculation for page in pages for calculation in page["batch_calculations"]]
+    assert paged == whole["batch_calculations"]
+    assert sum(page["page_monthly_subscription"] for page in pages) == whole["total_monthly_subscription"]
+
+
+def test_page_ending_exactly_on_the_last_batch_has_no_more(all_batches_api):
+    first = _whole(all_batches_api, limit=3)
+    last = _whole(all_batches_api, limit=2, cursor=first["next_cursor"])
+    assert (last["page_batches"], last["has_more"], last["next_cursor"]) == (2, False, None)
+
+
+def _cursor(raw: str) -> str:
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor!", _cursor("user:3"), _cursor("batch:three"), _cursor("batch"),
+                                    "%%%", base64.urlsafe_b64encode(b"\xff\xfe").decode()])
+def test_malformed_cursor_is_a_400(all_batches_api, cursor):
+    response = all_batches_api.request("GET", ALL_BATCHES, params={"cursor": cursor})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
+
+
+@pytest.mark.parametrize("params", [{"stream": "ndjson", "limit": 2}, {"stream": "json", "cursor": _cursor("batch:1")}])
+def test_stream_cannot_be_paged(all_batches_api, params):
+    assert all_batches_api.request("GET", ALL_BATCHES, params=params).status_code == 400
+
+
+def test_ndjson_stream_is_one_batch_per_line_then_a_trailer(all_batches_api, small_stream_chunks):
+    whole = _whole(all_batches_api)
+    response = all_batches_api.request("GET", ALL_BATCHES, params={"stream": "ndjson"})
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.content.endswith(b"\n")
+    *lines, trailer = [json.loads(line) for line in response.content.decode().split("\n")[:-1]]
+    assert lines == whole["batch_calculations"]
+    assert trailer == {"trailer": {
+        "teacher_id": 1,
+        "total_batches": 5,
+        "total_monthly_subscription": whole["total_monthly_subscription"],
+        "beta_testing_enabled": False
+    }}
+
+
+def test_json_stream_is_the_whole_document(all_batches_api, small_stream_chunks):
+    response = all_batches_api.request("GET", ALL_BATCHES, params={"stream": "json", "detail": "full"})
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == _whole(all_batches_api, detail="full")
+
+
+def test_streams_of_a_teacher_without_batches(main_api):
+    main_api.as_teacher(9)
+    assert main_api.request("GET", ALL_BATCHES, params={"stream": "json"}).json() == _whole(main_api)
+    response = main_api.request("GET", ALL_BATCHES, params={"stream": "ndjson"})
+    assert [json.loads(line) for line in response.content.decode().splitlines()] == [{"trailer": {
+        "teacher_id": 9, "total_batches": 0, "total_monthly_subscription": 0, "beta_testing_enabled": False
+    }}]
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from tests.conftest import add_teacher_batches
+
+
+@pytest.fixture
+def db(main_api):
+    session = main_api.session()
+    yield session
+    session.close()
+
+
+def _counter(main_api, db, batch_id: int) -> int:
+    db.expire_all()
+    return db.get(main_api.models.Batch, batch_id).approved_student_count
+
+
+def test_counter_follows_enrollment_changes_in_the_same_transaction(main_api, db):
+    [batch_id] = add_teacher_batches(main_api, teacher_id=1, batch_count=1, approved_per_batch=3)
+    approved, pending = main_api.models.JoinRequestStatus.approved, main_api.models.JoinRequestStatus.pending
+
+    main_api.record_join_request_status_change(db, batch_id, pending, approved)
+    main_api.record_join_request_status_change(db, batch_id, pending, approved)
+    db.commit()
+    assert _counter(main_api, db, batch_id) == 5
+
+    main_api.record_enrollment_change(db, batch_id, -1)
+    db.rollback()
+    assert _counter(main_api, db, batch_id) == 5
+
+    main_api.record_join_request_status_change(db, batch_id, approved, main_api.models.JoinRequestStatus.rejected)
+    main_api.record_join_request_status_change(db, batch_id, pending, main_api.models.JoinRequestStatus.rejected)
+    db.commit()
+    assert _counter(main_api, db, batch_id) == 4
+
+
+def test_drift_check_reports_then_repairs(main_api, db):
+    batch_ids = add_teacher_batches(main_api, teacher_id=1, batch_count=3, approved_per_batch=4)
+    db.query(main_api.models.Batch).filter(main_api.models.Batch.id.in_(batch_ids[:2])).update(
+        {"approved_student_count": 9}, synchronize_session=False
+    )
+    db.commit()
+
+    report = main_api.check_approved_student_counts(db, repair=False, chunk_size=2)
+    assert (report["batches_checked"], report["correction_count"]) == (3, 2)
+    assert report["corrections"][0] == {"batch_id": batch_ids[0], "stored": 9, "actual": 4}
+    assert _counter(main_api, db, batch_ids[0]) == 9
+
+    version = db.get(main_api.models.Teacher, 1).subscription_status_version
+    assert main_api.check_approved_student_counts(db, chunk_size=2)["correction_count"] == 2
+    assert [_counter(main_api, db, batch_id) for batch_id in batch_ids] == [4, 4, 4]
+    # Repairs invalidate cached status responses and reach the summaries through the outbox
+    assert db.get(main_api.models.Teacher, 1).subscription_status_version == version + 1
+    assert main_api.drain_subscription_events(db) == 2
+    assert main_api.check_approved_student_counts(db)["correction_count"] == 0
+
+
+@pytest.mark.parametrize("enabled", [False, True])
+def test_drift_checker_is_started_only_when_enabled(main_api, enabled):
+    main_api["APPROVED_COUNT_CHECK_ENABLED"] = enabled
+
+    async def start():
+        before = asyncio.all_tasks()
+        await main_api.start_approved_count_drift_checker()
+        started = asyncio.all_tasks() - before
+        for task in started:
+            task.cancel()
+        return len(started)
+
+    assert asyncio.run(start()) == int(enabled)
@@ -0,0 +1,127 @@
+from datetime import date
+
+import pytest
+
+from tests.conftest import add_teacher_batches
+
+RUN_DATE = date(2025, 2, 1)
+
+
+@pytest.fixture
+def db(main_api):
+    session = main_api.session()
+    yield session
+    session.close()
+
+
+def _subscriptions(main_api, db):
+    db.expire_all()
+    return db.query(main_api.models.TeacherSubscription).order_by(main_api.models.TeacherSubscription.id).all()
+
+
+def test_due_subscriptions_are_billed_in_chunks(main_api, db):
+    add_teacher_batches(main_api, teacher_id=1, batch_count=5, approved_per_batch=12, fees=1500, student_limit=30,
+                        with_subscriptions=True)
+    db.query(main_api.models.TeacherSubscription).filter(main_api.models.TeacherSubscription.id == 5).update(
+        {"next_billing_date": date(2025, 2, 2)}
+    )
+    db.commit()
+
+    result = main_api.run_billing_cycle(db, RUN_DATE, chunk_size=2)
+    assert (result["processed"], result["chunks"], result["resumed_from"]) == (4, 2, 0)
+
+    billed, not_due = _subscriptions(main_api, db)[:4], _subscriptions(main_api, db)[4]
+    for subscription in billed:
+        assert (subscription.monthly_fee, subscription.student_count) == (105 * 20, 12)
+        assert (subscription.next_billing_date, subscription.last_billed_on) == (date(2025, 3, 1), RUN_DATE)
+    assert (not_due.last_billed_on, not_due.next_billing_date) == (None, date(2025, 2, 2))
+    # One status-version bump per chunk
+    assert db.get(main_api.models.Teacher, 1).subscription_status_version == 1 + 2
+
+
+def test_a_completed_run_is_not_repeated(main_api, db):
+    add_teacher_batches(main_api, teacher_id=1, batch_count=3, with_subscriptions=True)
+    main_api.run_billing_cycle(db, RUN_DATE)
+    assert main_api.run_billing_cycle(db, RUN_DATE) == {
+        "run_date": RUN_DATE, "status": "completed", "processed": 3, "chunks": 0
+    }
+    assert {subscription.next_billing_date for subscription in _subscriptions(main_api, db)} == {date(2025, 3, 1)}
+
+
+def test_an_interrupted_run_resumes_after_the_last_committed_chunk(main_api, db, monkeypatch):
+    add_teacher_batches(main_api, teacher_id=1, batch_count=5, with_subscriptions=True)
+    bill_chunk = main_api._bill_chunk
+    calls = []
+
+    def crash_on_second_chunk(*args):
+        calls.append(args)
+        if len(calls) == 2:
+            raise RuntimeError("worker killed")
+        bill_chunk(*args)
+
+    monkeypatch.setitem(main_api, "_bill_chunk", crash_on_second_chunk)
+    with pytest.raises(RuntimeError):
+        main_api.run_billing_cycle(db, RUN_DATE, chunk_size=2)
+    db.rollback()
+    assert [subscription.last_billed_on for subscription in _subscriptions(main_api, db)] == [RUN_DATE] * 2 + [None] * 3
+
+    monkeypatch.setitem(main_api, "_bill_chunk", bill_chunk)
+    result = main_api.run_billing_cycle(db, RUN_DATE, chunk_size=2)
+    assert (result["processed"], result["resumed_from"], result["chunks"]) == (5, 2, 2)
+    assert {subscription.next_billing_date for subscription in _subscriptions(main_api, db)} == {date(2025, 3, 1)}
+
+
+@pytest.mark.parametrize("value, expected", [
+    (date(2025, 1, 31), date(2025, 2, 28)),
+    (date(2024, 1, 31), date(2024, 2, 29)),
+    (date(2025, 12, 15), date(2026, 1, 15)),
+])
+def test_add_months_clamps_to_the_month_end(main_api, value, expected):
+    assert main_api.add_months(value) == expected
+
+
+@pytest.mark.parametrize("value, anchor_day, expected", [
+    (date(2025, 2, 28), 31, date(2025, 3, 31)),
+    (date(2025, 2, 28), 30, date(2025, 3, 30)),
+    (date(2025, 3, 31), 31, date(2025, 4, 30)),
+    (date(2025, 3, 15), None, date(2025, 4, 15)),
+])
+def test_add_months_returns_to_the_anchor_day(main_api, value, anchor_day, expected):
+    assert main_api.add_months(value, anchor_day=anchor_day) == expected
+
+
+def test_billing_dates_keep_the_start_day_after_a_short_month(main_api, db):
+    [batch_id] = add_teacher_batches(main_api, teacher_id=1, batch_count=1, with_subscriptions=True)
+    subscription = main_api.models.TeacherSubscription
+    db.query(subscription).filter(subscription.batch_id == batch_id).update(
+        {"start_date": date(2025, 1, 31), "next_billing_date": date(2025, 1, 31)}
+    )
+    db.commit()
+
+    billed = []
+    for run_date in (date(2025, 1, 31), date(2025, 2, 28), date(2025, 3, 31), date(2025, 4, 30)):
+        main_api.run_billing_cycle(db, run_date)
+        billed.append(_subscriptions(main_api, db)[0].next_billing_date)
+    assert billed == [date(2025, 2, 28), date(2025, 3, 31), date(2025, 4, 30), date(2025, 5, 31)]
+
+
+def test_billing_bumps_the_subscription_version(main_api, db):
+    add_teacher_batches(main_api, teacher_id=1, batch_count=2, approved_per_batch=25, with_subscriptions=True)
+    main_api.run_billing_cycle(db, RUN_DATE)
+    subscriptions = _subscriptions(main_api, db)
+    assert [subscription.version for subscription in subscriptions] == [2, 2]
+    # Same price as the single-batch recalculation endpoint
+    assert [subscription.monthly_fee for subscription in subscriptions] == [105 * 25] * 2
+
+
+def test_billing_rolls_due_dates_into_built_summaries(main_api, db):
+    add_teacher_batches(main_api, teacher_id=1, batch_count=2, with_subscriptions=True)
+    add_teacher_batches(main_api, teacher_id=2, batch_count=2, with_subscriptions=True)
+    main_api.get_teacher_summary(db, 1)
+
+    main_api.run_billing_cycle(db, RUN_DATE)
+    db.expire_all()
+    assert db.get(main_api.models.TeacherSubscriptionSummary, 1).next_due_date == date(2025, 3, 1)
+    # Teacher 2's summaries are built on first read, already with the new date
+    assert db.get(main_api.models.TeacherSubscriptionSummary, 2) is None
+    assert main_api.get_teacher_summary(db, 2).next_due_date == date(2025, 3, 1)
@@ -0,0 +1,115 @@
+import pytest
+
+from tests.conftest import MAIN_API_SNIPPETS, add_teacher_batches, load_snippets
+
+BULK_RECALCULATE = "/api/admin/subscriptions/bulk-recalculate"
+ADMIN = {"X-Admin-Key": "admin-secret"}
+
+
+@pytest.fixture
+def admin_api():
+    snippets = load_snippets(*MAIN_API_SNIPPETS, "bulk_recalculation.py")
+    snippets["ADMIN_API_KEY"] = "admin-secret"
+    add_teacher_batches(snippets, teacher_id=1, batch_count=3, approved_per_batch=5, fees=1500, student_limit=30,
+                        with_subscriptions=True)
+    add_teacher_batches(snippets, teacher_id=2, batch_count=2, approved_per_batch=5, fees=400, student_limit=10,
+                        with_subscriptions=True)
+    yield snippets
+    snippets.engine.dispose()
+
+
+def _versions(admin_api) -> tuple:
+    db = admin_api.session()
+    try:
+        models = admin_api.models
+        subscription_versions = [version for (version,) in db.query(
+            models.TeacherSubscription.version
+        ).order_by(models.TeacherSubscription.id)]
+        status_versions = [version for (version,) in db.query(
+            models.Teacher.subscription_status_version
+        ).order_by(models.Teacher.id)]
+        return subscription_versions, status_versions
+    finally:
+        db.close()
+
+
+def _monthly_fees(admin_api) -> list:
+    db = admin_api.session()
+    try:
+        subscription = admin_api.models.TeacherSubscription
+        return [fee for (fee,) in db.query(subscription.monthly_fee).order_by(subscription.id)]
+    finally:
+        db.close()
+
+
+def test_dry_run_reports_without_writing(admin_api):
+    report = admin_api.request("POST", BULK_RECALCULATE, headers=ADMIN, json_body={"chunk_size": 2}).json()
+    assert (report["dry_run"], report["scanned"], report["changed"], report["chunks"]) == (True, 5, 5, 3)
+    assert report["total_monthly_fee_delta"] == 3 * 105 * 20 + 2 * 35 * 20
+    assert report["diffs"][0] == {
+        "subscription_id": 1, "batch_id": 1, "old_monthly_fee": 0, "new_monthly_fee": 105 * 20,
+        "old_student_count": 0, "new_student_count": 5
+    }
+    assert _monthly_fees(admin_api) == [0] * 5
+
+
+def test_apply_writes_only_the_filtered_rows(admin_api):
+    report = admin_api.request("POST", BULK_RECALCULATE, headers=ADMIN, json_body={
+        "dry_run": False, "min_fees": 1000, "max_diff_rows": 1
+    }).json()
+    assert (report["changed"], len(report["diffs"]), report["diffs_truncated"]) == (3, 1, True)
+    assert _monthly_fees(admin_api) == [105 * 20] * 3 + [0] * 2
+
+    # Already up to date: nothing left to change
+    again = admin_api.request("POST", BULK_RECALCULATE, headers=ADMIN, json_body={
+        "dry_run": False, "teacher_id": 1
+    }).json()
+    assert (again["scanned"], again["changed"]) == (3, 0)
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Admin-Key": "wrong"}])
+def test_requires_the_admin_key(admin_api, headers):
+    assert admin_api.request("POST", BULK_RECALCULATE, headers=headers, json_body={}).status_code == 403
+
+
+def test_bulk_and_single_recalculation_store_the_same_fee(admin_api):
+    admin_api.as_teacher(1)
+    single = admin_api.request("POST", "/api/teacher/subscription/recalculate/1").json()
+    admin_api.request("POST", BULK_RECALCULATE, headers=ADMIN, json_body={"dry_run": False})
+    assert _monthly_fees(admin_api)[0] == single["subscription_calculation"]["total_subscription"]
+    # The bulk pass found subscription 1 already priced by the single endpoint
+    report = admin_api.request("POST", BULK_RECALCULATE, headers=ADMIN, json_body={"teacher_id": 1}).json()
+    assert report["changed"] == 0
+
+
+def test_apply_bumps_subscription_and_status_versions(admin_api):
+    admin_api.request("POST", BULK_RECALCULATE, headers=ADMIN, json_body={"dry_run": False, "teacher_id": 1})
+    assert _versions(admin_api) == ([2, 2, 2, 1, 1], [2, 1])
+
+
+def test_rows_changed_after_the_read_are_skipped(admin_api):
+    recalculate = admin_api.bulk_recalculate_subscriptions
+    models = admin_api.models
+
+    def reprice_concurrently(db, filters, after_id):
+        rows = chunk(db, filters, after_id)
+        if rows and after_id == 0:
+            other = admin_api.session()
+            try:
+                other.query(models.TeacherSubscription).filter(models.TeacherSubscription.id == rows[0].id).update(
+                    {"monthly_fee": 1234, "version": models.TeacherSubscription.version + 1}
+                )
+                other.commit()
+            finally:
+                other.close()
+        return rows
+
+    chunk = admin_api._recalculation_chunk
+    admin_api["_recalculation_chunk"] = reprice_concurrently
+    db = admin_api.session()
+    try:
+        report = recalculate(db, admin_api.BulkRecalculationRequest(dry_run=False))
+    finally:
+        db.close()
+    assert (report["changed"], report["skipped_concurrent"]) == (5, 1)
+    assert _monthly_fees(admin_api) == [1234] + [105 * 20] * 2 + [35 * 20] * 2
@@ -0,0 +1,92 @@
+import json
+import random
+
+import numpy as np
+import pytest
+
+from bulk_subscription_pricing import calculate_bulk_subscription, iter_bulk_subscription_results
+from subscription_pricing import MIN_STUDENTS, real_time_subscription_view, subscription_fee_view
+
+# Fee edges: no fees, 7% just under / exactly at / just over the ₹35 minimum,
+# fractional fees, round-half cases and large fees
+EDGE_FEES = [0, 1, 499, 499.99, 500, 500.01, 501, 514, 515, 514.29, 1234.5, 1500, 2500.75, 99999]
+# Student edges: no students, just under / at / over the 20-student minimum, large limits
+EDGE_LIMITS = [0, 1, 19, 20, 21, 120, 5000]
+
+
+def _random_inputs(count: int, seed: int):
+    rng = random.Random(seed)
+    fees = [rng.choice([rng.randint(0, 10000), round(rng.uniform(0, 10000), 2)]) for _ in range(count)]
+    limits = [rng.randint(0, 200) for _ in range(count)]
+    current = [rng.randint(0, limit) for limit in limits]
+    return fees, limits, current
+
+
+def _as_json(value) -> str:
+    # JSON keeps 35 and 35.0 apart, so matching text also means matching int/float types
+    return json.dumps(value, ensure_ascii=False, sort_keys=True)
+
+
+@pytest.mark.parametrize("batch_fees", EDGE_FEES)
+@pytest.mark.parametrize("student_limit", EDGE_LIMITS)
+@pytest.mark.parametrize("detail", ["summary", "full"])
+def test_bulk_results_match_real_time_calculation_at_edges(batch_fees, student_limit, detail):
+    [bulk] = iter_bulk_subscription_results([batch_fees], [student_limit], [0], include_steps=(detail == "full"))
+    assert _as_json(bulk) == _as_json(real_time_subscription_view(batch_fees, student_limit, 0, detail))
+
+
+@pytest.mark.parametrize("batch_fees", EDGE_FEES)
+@pytest.mark.parametrize("student_count", EDGE_LIMITS)
+def test_truncated_bulk_pricing_matches_subscription_fee_at_edges(batch_fees, student_count):
+    bulk = calculate_bulk_subscription([batch_fees], [student_count], [student_count], truncate_commission=True)
+    scalar = subscription_fee_view(batch_fees, student_count)
+
+    assert bulk["commission_per_student"].dtype == np.int64
+    assert int(bulk["commission_per_student"][0]) == scalar["commission_per_student"]
+    assert int(bulk["effective_student_count"][0]) == scalar["student_count"]
+    assert int(bulk["total_subscription"][0]) == scalar["total_subscription"]
+    assert bool(bulk["minimum_met"][0]) == scalar["minimum_met"]
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_bulk_results_match_real_time_calculation_on_random_inputs(seed):
+    fees, limits, current = _random_inputs(5000, seed)
+    bulk = list(iter_bulk_subscription_results(fees, limits, current, include_steps=True))
+    scalar = [real_time_subscription_view(*row, "full") for row in zip(fees, limits, current)]
+    assert [_as_json(result) for result in bulk] == [_as_json(result) for result in scalar]
+
+
+@pytest.mark.parametrize("seed", [4, 5])
+def test_truncated_bulk_pricing_matches_subscription_fee_on_random_inputs(seed):
+    fees, limits, _ = _random_inputs(5000, seed)
+    totals = calculate_bulk_subscription(fees, limits, limits, truncate_commission=True)["total_subscription"]
+    assert totals.tolist() == [subscription_fee_view(*row)["total_subscription"] for row in zip(fees, limits)]
+
+
+def test_numpy_array_inputs_price_like_lists():
+    fees, limits, current = _random_inputs(500, 6)
+    from_arrays = list(iter_bulk_subscription_results(np.array(fees), np.array(limits), np.array(current)))
+    from_lists = list(iter_bulk_subscription_results(fees, limits, current))
+    assert from_arrays == from_lists
+
+
+def test_explanation_strings_are_only_built_on_request():
+    [summary] = iter_bulk_subscription_results([1500], [30], [10])
+    [full] = iter_bulk_subscription_results([1500], [30], [10], include_steps=True)
+
+    assert "calculation_steps" not in summary and "logic_explanation" not in summary
+    assert full["calculation_steps"]["step3"] == "₹105.0 × 30 students = ₹3150.0"
+
+
+def test_minimum_met_and_missing_current_students():
+    result = calculate_bulk_subscription([1500, 1500], [30, 30])
+    assert result["current_students"].tolist() == [0, 0]
+    assert result["minimum_met"].tolist() == [False, False]
+
+    result = calculate_bulk_subscription([1500, 1500], [30, 30], [MIN_STUDENTS - 1, MIN_STUDENTS])
+    assert result["minimum_met"].tolist() == [False, True]
+
+
+def test_empty_input():
+    assert list(iter_bulk_subscription_results([], [], [])) == []
+    assert calculate_bulk_subscription([], [])["total_subscription"].size == 0
@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from tests.conftest import MAIN_API_SNIPPETS, load_snippets
+
+BULK = "/api/subscription/validate-calculation/bulk"
+SINGLE = "/api/subscription/validate-calculation"
+
+SCENARIOS = [
+    {"batch_fees": 1500, "student_limit": 30, "current_students": 12},
+    {"batch_fees": -5, "student_limit": 30},
+    {"batch_fees": 499.5, "student_limit": 10},
+    {"batch_fees": 800, "student_limit": 0, "current_students": -1},
+    {"batch_fees": "free", "student_limit": 25},
+]
+
+
+@pytest.fixture
+def validation_api():
+    snippets = load_snippets(*MAIN_API_SNIPPETS, "bulk_validation_api.py")
+    snippets.as_teacher(1)
+    yield snippets
+    snippets.engine.dispose()
+
+
+@pytest.mark.parametrize("params", [{}, {"detail": "summary"}, {"detail": "full"}])
+def test_results_match_the_single_scenario_endpoint(validation_api, params):
+    body = validation_api.request("POST", BULK, params=params, json_body={"scenarios": SCENARIOS}).json()
+    assert (body["success"], body["scenario_count"], body["invalid_count"]) == (False, 5, 3)
+    assert [result["index"] for result in body["results"]] == [0, 1, 2, 3, 4]
+
+    for index in (0, 2):
+        single = validation_api.request("POST", SINGLE, params=params, json_body=SCENARIOS[index]).json()
+        assert body["results"][index] == {"index": index, **single["validation"]}
+    assert ("calculation_steps" in body["results"][0]["calculation"]) == (params.get("detail") == "full")
+
+
+def test_invalid_scenarios_report_every_field(validation_api):
+    results = validation_api.request("POST", BULK, json_body={"scenarios": SCENARIOS}).json()["results"]
+    assert results[1]["errors"] == [{"field": "batch_fees", "message": "Batch fees cannot be negative"}]
+    assert results[3]["errors"] == [
+        {"field": "student_limit", "message": "Student limit must be at least 1"},
+        {"field": "current_students", "message": "Current students cannot be negative"},
+    ]
+    assert [error["field"] for error in results[4]["errors"]] == ["batch_fees"]
+
+
+def test_chunks_keep_input_order(validation_api):
+    validation_api["BULK_VALIDATION_CHUNK_SIZE"] = 2
+    scenarios = SCENARIOS * 3
+    results = validation_api.request("POST", BULK, json_body={"scenarios": scenarios}).json()["results"]
+    assert [result["index"] for result in results] == list(range(len(scenarios)))
+    assert [result["is_valid"] for result in results] == [True, False, True, False, False] * 3
+
+
+def test_streamed_results_are_one_json_line_per_scenario(validation_api):
+    streamed = validation_api.request("POST", BULK, params={"stream": "true"}, json_body={"scenarios": SCENARIOS})
+    assert streamed.headers["content-type"] == "application/x-ndjson"
+    assert streamed.headers["x-beta-testing-enabled"] == "false"
+    lines = streamed.content.decode().splitlines()
+    whole = validation_api.request("POST", BULK, json_body={"scenarios": SCENARIOS}).json()["results"]
+    assert [json.loads(line) for line in lines] == whole
+
+
+def test_scenario_limit_is_checked_before_validation(validation_api, monkeypatch):
+    validation_api["BULK_VALIDATION_MAX_SCENARIOS"] = 3
+    monkeypatch.setattr(validation_api.BulkValidationRequest, "model_validate",
+                        lambda payload: pytest.fail("validated an over-limit request"))
+    assert validation_api.request("POST", BULK, json_body={"scenarios": SCENARIOS}).status_code == 400
+
+
+def test_oversized_bodies_are_rejected_unparsed(validation_api):
+    validation_api["BULK_VALIDATION_MAX_BODY_BYTES"] = 100
+    declared = validation_api.request("POST", BULK, headers={"Content-Length": "101"}, json_body={"scenarios": []})
+    assert declared.status_code == 413
+    # No Content-Length: the body is counted as it is read
+    assert validation_api.request("POST", BULK, json_body={"scenarios": SCENARIOS}).status_code == 413
+    assert validation_api.request("POST", BULK, json_body={"scenarios": SCENARIOS[:1]}).status_code == 200
+
+
+def test_malformed_bodies_are_422(validation_api):
+    assert validation_api.request("POST", BULK, json_body={"scenarios": "none"}).status_code == 422
+    assert validation_api.request("POST", BULK, json_body=[1, 2]).status_code == 422
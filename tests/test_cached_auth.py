@@ -0,0 +1,155 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import principal_cache as principal_cache_module
+from principal_cache import PrincipalCache
+from tests.conftest import MAIN_API_SNIPPETS, add_teacher_batches, count_statements, load_snippets
+
+jwt = pytest.importorskip("jwt")
+
+SECRET_KEY = "cached-auth-test-secret-key-of-32-bytes"
+EMAIL = "teacher@example.com"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [time.time()]
+    monkeypatch.setattr(principal_cache_module.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def auth_api(tmp_path, clock):
+    snippets = load_snippets(*MAIN_API_SNIPPETS, jwt=jwt, SECRET_KEY=SECRET_KEY, ALGORITHM="HS256")
+    snippets["principal_cache"] = PrincipalCache(ttl=30, version_file=str(tmp_path / "principal_cache.version"))
+    models = snippets.models
+
+    # The main app's dependencies: verify the token, then load the user from the database
+    def get_current_user(token, db):
+        claims = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+        teacher = db.query(models.Teacher).filter(models.Teacher.email == claims["sub"]).first()
+        if teacher is None:
+            raise HTTPException(status_code=401, detail="Could not validate credentials")
+        return {"type": claims["type"], "id": teacher.id}
+
+    def get_current_teacher(current_user, db):
+        return db.get(models.Teacher, current_user["id"])
+
+    snippets["get_current_user"] = get_current_user
+    snippets["get_current_teacher"] = get_current_teacher
+    add_teacher_batches(snippets, teacher_id=1, batch_count=1)
+    db = snippets.session()
+    db.get(models.Teacher, 1).email = EMAIL
+    db.commit()
+    db.close()
+
+    @snippets.app.get("/whoami")
+    def whoami(current_user: dict = snippets.Depends(snippets.cached_get_current_user)):
+        return current_user
+
+    @snippets.app.get("/teacher")
+    def teacher(current_teacher=snippets.Depends(snippets.cached_get_current_teacher)):
+        return {"id": current_teacher.id, "email": current_teacher.email}
+
+    yield snippets
+    snippets.engine.dispose()
+
+
+def _token(**claims) -> str:
+    return jwt.encode({"type": "teacher", "sub": EMAIL, "exp": int(time.time()) + 3600, **claims},
+                      SECRET_KEY, algorithm="HS256")
+
+
+def _get(auth_api, path: str, token: str):
+    with count_statements(auth_api.engine) as statements:
+        response = auth_api.request("GET", path, headers={"Authorization": f"Bearer {token}"})
+    return response, statements
+
+
+def test_a_cache_hit_issues_no_statements(auth_api):
+    token = _token()
+    for path, expected in (("/whoami", {"type": "teacher", "id": 1}), ("/teacher", {"id": 1, "email": EMAIL})):
+        first, statements = _get(auth_api, path, token)
+        assert (first.status_code, first.json()) == (200, expected)
+        second, statements = _get(auth_api, path, token)
+        assert (second.json(), statements) == (expected, [])
+    stats = auth_api.principal_cache.stats()
+    assert (stats["hits"], stats["misses"]) == ({"user": 3, "teacher": 1}, {"user": 1, "teacher": 1})
+
+
+def test_endpoints_resolve_the_caller_through_the_cache(auth_api):
+    token = _token()
+    assert _get(auth_api, "/api/teacher/subscription/status", token)[0].status_code == 200
+    assert _get(auth_api, "/api/teacher/subscription/status", token)[0].status_code == 200
+    assert auth_api.principal_cache.stats()["hits"]["teacher"] == 1
+
+
+def test_entries_expire_after_the_ttl_and_at_token_expiry(auth_api, clock):
+    token = _token()
+    _get(auth_api, "/whoami", token)
+    clock[0] += 31
+    assert _get(auth_api, "/whoami", token)[1] != []
+
+    short_lived = _token(exp=int(clock[0]) + 5)
+    _get(auth_api, "/whoami", short_lived)
+    clock[0] += 6
+    assert _get(auth_api, "/whoami", short_lived)[1] != []
+
+
+def test_logout_and_account_changes_invalidate(auth_api):
+    token, other_token = _token(), _token(jti="second-session")
+    for cached in (token, other_token):
+        _get(auth_api, "/teacher", cached)
+
+    auth_api.invalidate_cached_token(token)
+    assert _get(auth_api, "/teacher", token)[1] != []
+    assert _get(auth_api, "/teacher", other_token)[1] == []
+
+    auth_api.invalidate_cached_principal("teacher", EMAIL)
+    assert _get(auth_api, "/teacher", token)[1] != []
+    assert _get(auth_api, "/teacher", other_token)[1] != []
+
+
+def test_invalid_tokens_are_rejected_and_not_cached(auth_api):
+    forged = jwt.encode({"type": "teacher", "sub": EMAIL}, "another-secret-key-of-at-least-32-bytes",
+                        algorithm="HS256")
+    with pytest.raises(jwt.InvalidSignatureError):
+        _get(auth_api, "/whoami", forged)
+    assert auth_api.principal_cache.stats()["entries"] == 0
+
+
+def test_the_cached_teacher_is_usable_in_a_later_session(auth_api):
+    token = _token()
+    _get(auth_api, "/teacher", token)
+    models = auth_api.models
+
+    db = auth_api.session()
+    try:
+        with count_statements(auth_api.engine) as statements:
+            teacher = auth_api.cached_get_current_teacher(token=token, current_user={"type": "teacher", "id": 1},
+                                                          db=db)
+        assert statements == []
+        assert teacher in db
+        teacher.full_name = "Renamed"
+        db.commit()
+    finally:
+        db.close()
+
+    db = auth_api.session()
+    try:
+        assert db.get(models.Teacher, 1).full_name == "Renamed"
+    finally:
+        db.close()
+    # The cache keeps its own snapshot, not the instance the session changed
+    cached = auth_api.principal_cache.get("teacher", principal_cache_module.token_hash(token))
+    assert cached.full_name == "Teacher 1"
+
+
+def test_disabled_cache_resolves_every_request(auth_api):
+    auth_api["PRINCIPAL_CACHE_ENABLED"] = False
+    token = _token()
+    _get(auth_api, "/teacher", token)
+    assert _get(auth_api, "/teacher", token)[1] != []
+    assert auth_api.principal_cache.stats()["entries"] == 0
@@ -0,0 +1,74 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from add_covering_indexes import COVERING_INDEXES, apply_covering_indexes
+from tests.conftest import make_models
+
+APPROVED_COUNT = text(
+    "SELECT count(*) FROM batch_students WHERE batch_id = :batch_id AND status = 'approved'"
+)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """Existing database created before the covering indexes were declared"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    models = make_models()
+    for table in models.Base.metadata.tables.values():
+        for index in [index for index in table.indexes if index.name in {name for name, _, _ in COVERING_INDEXES}]:
+            table.indexes.discard(index)
+    models.Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def _index_columns(engine) -> dict:
+    inspector = inspect(engine)
+    return {
+        index["name"]: (table, tuple(index["column_names"]))
+        for table in ("batch_students", "teacher_subscriptions", "batches")
+        for index in inspector.get_indexes(table)
+    }
+
+
+def test_models_declare_the_migrated_indexes():
+    models = make_models()
+    declared = {
+        index.name: (table.name, tuple(column.name for column in index.columns))
+        for table in models.Base.metadata.tables.values() for index in table.indexes
+    }
+    for name, table, columns in COVERING_INDEXES:
+        assert declared[name] == (table, columns)
+
+
+def test_migration_creates_reruns_and_drops(engine):
+    assert not {name for name, _, _ in COVERING_INDEXES} & set(_index_columns(engine))
+
+    assert [name for name, _ in apply_covering_indexes(engine)] == [name for name, _, _ in COVERING_INDEXES]
+    apply_covering_indexes(engine)
+    indexes = _index_columns(engine)
+    for name, table, columns in COVERING_INDEXES:
+        assert indexes[name] == (table, columns)
+
+    apply_covering_indexes(engine, drop=True)
+    assert not {name for name, _, _ in COVERING_INDEXES} & set(_index_columns(engine))
+
+
+def test_approved_count_is_answered_from_the_index(engine):
+    apply_covering_indexes(engine)
+    with engine.connect() as connection:
+        plan = " ".join(row[-1] for row in connection.execute(
+            text(f"EXPLAIN QUERY PLAN {APPROVED_COUNT.text}"), {"batch_id": 1}
+        ))
+    assert "COVERING INDEX ix_batch_students_batch_id_status" in plan
+
+
+def test_teacher_batch_page_is_answered_from_the_index(engine):
+    apply_covering_indexes(engine)
+    with engine.connect() as connection:
+        plan = " ".join(row[-1] for row in connection.execute(text(
+            "EXPLAIN QUERY PLAN SELECT id, name, fees, student_limit, approved_student_count FROM batches "
+            "WHERE teacher_id = 1 AND id > 0 ORDER BY id LIMIT 500"
+        )))
+    assert "COVERING INDEX ix_batches_teacher_id_pricing" in plan
+    assert "TEMP B-TREE" not in plan
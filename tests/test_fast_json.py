@@ -0,0 +1,132 @@
+import asyncio
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+
+import pytest
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+
+import fast_json
+from fast_json import FastJSONResponse, compile_serializer, time_serialization
+
+SCHEMA = {
+    "teacher_id": int,
+    "total": float,
+    "amount": Decimal,
+    "generated_at": datetime,
+    "subscriptions": [{"id": int, "next_billing_date": (date, datetime), "status": str, "extra": None}],
+}
+
+
+class Status(str, Enum):
+    active = "active"
+
+
+PAYLOAD = {
+    "teacher_id": 1,
+    "total": 3150.5,
+    "amount": Decimal("12.25"),
+    "generated_at": datetime(2025, 2, 1, 8, 30, 15, 120000),
+    "subscriptions": [
+        {"id": 1, "next_billing_date": date(2025, 3, 1), "status": "active", "extra": {"note": "₹ paid"}},
+        {"id": 2, "next_billing_date": None, "status": Status.active, "extra": [1, 2.5, None]},
+    ],
+}
+
+
+def _default_path(content) -> object:
+    return json.loads(json.dumps(jsonable_encoder(content)))
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def encoder(request, monkeypatch):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(fast_json, "orjson", None)
+    return request.param
+
+
+def test_serializer_matches_the_default_path(encoder):
+    body = compile_serializer(SCHEMA)(PAYLOAD)
+    assert isinstance(body, bytes)
+    assert json.loads(body) == _default_path(PAYLOAD)
+
+
+def _typed_json(body):
+    """Parsed JSON that keeps 1500 and 1500.0 apart"""
+    return json.loads(body, parse_int=lambda text: ("int", int(text)), parse_float=lambda text: ("float", float(text)))
+
+
+@pytest.mark.parametrize("amount", ["1500", "0", "-35", "1E+3", "12.25", "1500.00", "0.1", "-0.5"])
+def test_decimals_render_like_jsonable_encoder(encoder, amount):
+    content = {"amount": Decimal(amount), "amounts": [Decimal(amount)]}
+    body = compile_serializer({"amount": Decimal, "amounts": [Decimal]})(content)
+    assert _typed_json(body) == _typed_json(json.dumps(jsonable_encoder(content)))
+
+
+def test_integral_decimals_render_as_integers(encoder):
+    body = compile_serializer({"amount": Decimal})({"amount": Decimal("1500")})
+    assert body == b'{"amount":1500}'
+
+
+@pytest.mark.parametrize("schema, message", [
+    ({"items": [int, str]}, "$.items: list schema must have exactly one item schema"),
+    ({"when": {"at": set}}, "$.when.at: unsupported schema type"),
+])
+def test_invalid_schemas_are_rejected_at_compile_time(schema, message):
+    with pytest.raises(TypeError, match=message.replace("$", r"\$").replace("[", r"\[")):
+        compile_serializer(schema)
+
+
+def test_decorated_sync_and_async_endpoints():
+    @fast_json.fast_json({"day": date})
+    def sync_endpoint(response: Response = None):
+        response.headers["X-Cache"] = "miss"
+        response.status_code = 201
+        return {"day": date(2025, 2, 1)}
+
+    @fast_json.fast_json({"day": date})
+    async def async_endpoint():
+        return {"day": date(2025, 2, 1)}
+
+    sub_response = Response()
+    sync_response = sync_endpoint(response=sub_response)
+    assert isinstance(sync_response, FastJSONResponse)
+    assert (sync_response.status_code, sync_response.headers["x-cache"]) == (201, "miss")
+    assert json.loads(sync_response.body) == {"day": "2025-02-01"}
+
+    async_response = asyncio.run(async_endpoint())
+    assert json.loads(async_response.body) == {"day": "2025-02-01"}
+    assert async_endpoint.fast_json_serializer is not None
+
+
+def test_responses_returned_by_the_endpoint_pass_through():
+    not_modified = Response(status_code=304)
+
+    @fast_json.fast_json({"day": date})
+    def endpoint():
+        return not_modified
+
+    assert endpoint() is not_modified
+
+
+def test_disabled_fast_json_leaves_the_endpoint_alone(monkeypatch):
+    monkeypatch.setattr(fast_json, "FAST_JSON_ENABLED", False)
+
+    def endpoint():
+        return {"day": date(2025, 2, 1)}
+
+    assert fast_json.fast_json({"day": date})(endpoint) is endpoint
+
+
+def test_render_time_is_collected_only_inside_time_serialization():
+    serializer = compile_serializer(SCHEMA)
+    FastJSONResponse(PAYLOAD, serializer)
+    with time_serialization() as timer:
+        FastJSONResponse(PAYLOAD, serializer)
+        first = timer.seconds
+        FastJSONResponse(PAYLOAD, serializer)
+    assert 0 < first < timer.seconds
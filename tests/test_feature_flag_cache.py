@@ -0,0 +1,123 @@
+import os
+
+import pytest
+
+from tests.conftest import load_snippets
+
+
+class Settings:
+    """Stands in for the settings table behind is_beta_testing_enabled"""
+
+    def __init__(self, beta_testing: bool = False):
+        self.beta_testing = beta_testing
+        self.reads = 0
+
+    def is_beta_testing_enabled(self, db) -> bool:
+        self.reads += 1
+        return self.beta_testing
+
+
+@pytest.fixture
+def settings():
+    return Settings()
+
+
+@pytest.fixture
+def flags(settings):
+    snippets = load_snippets("feature_flag_cache.py", is_beta_testing_enabled=settings.is_beta_testing_enabled)
+    app = snippets.app
+
+    @app.post("/api/admin/subscription/toggle-beta")
+    def toggle_beta(fail: bool = False):
+        if fail:
+            raise snippets.HTTPException(status_code=400, detail="rejected")
+        settings.beta_testing = not settings.beta_testing
+        return {"beta_testing_enabled": settings.beta_testing}
+
+    @app.get("/flag")
+    def read_flag():
+        return {"beta_testing_enabled": snippets.cached_is_beta_testing_enabled()}
+
+    return snippets
+
+
+def _cache(flags, settings, ttl: float = 60):
+    return flags.FeatureFlagCache(settings.is_beta_testing_enabled, ttl=ttl, version_file=flags.FEATURE_FLAG_VERSION_FILE)
+
+
+def test_value_is_cached_for_the_ttl(flags, settings, monkeypatch):
+    cache = _cache(flags, settings, ttl=60)
+    clock = [1000.0]
+    monkeypatch.setattr(flags["time"], "monotonic", lambda: clock[0])
+
+    assert cache.get() is False
+    settings.beta_testing = True
+    clock[0] += 59
+    assert cache.get() is False
+    clock[0] += 2
+    assert cache.get() is True
+    assert (settings.reads, cache.hits, cache.misses) == (2, 1, 2)
+
+
+def test_broadcast_invalidation_reaches_other_workers(flags, settings):
+    worker_a = _cache(flags, settings)
+    worker_b = _cache(flags, settings)
+    assert worker_a.get() is False and worker_b.get() is False
+
+    settings.beta_testing = True
+    worker_a.invalidate()
+    assert worker_a.get() is True
+    assert worker_b.get() is True
+    assert worker_b.invalidations == 0
+
+
+def test_broadcast_is_seen_even_when_the_stamp_mtime_does_not_change(flags, settings):
+    worker_a = _cache(flags, settings)
+    worker_b = _cache(flags, settings)
+    worker_a.invalidate()
+    assert worker_b.get() is False
+    stamp = os.stat(flags.FEATURE_FLAG_VERSION_FILE)
+
+    settings.beta_testing = True
+    worker_a.invalidate()
+    # Same timestamp tick as the previous toggle
+    os.utime(flags.FEATURE_FLAG_VERSION_FILE, ns=(stamp.st_atime_ns, stamp.st_mtime_ns))
+    assert worker_b.get() is True
+
+
+def test_local_invalidation_leaves_other_workers_alone(flags, settings):
+    worker_a = _cache(flags, settings)
+    worker_b = _cache(flags, settings)
+    worker_a.get(), worker_b.get()
+
+    settings.beta_testing = True
+    worker_a.invalidate(broadcast=False)
+    assert worker_a.get() is True
+    assert worker_b.get() is False
+
+
+def test_stats(flags, settings):
+    cache = _cache(flags, settings)
+    cache.get(), cache.get(), cache.get()
+    cache.invalidate(broadcast=False)
+    assert cache.stats() == {"hits": 2, "misses": 1, "hit_rate": 0.6667, "invalidations": 1, "ttl_seconds": 60}
+
+
+def test_admin_toggle_invalidates_the_flag(flags, settings):
+    assert flags.request("GET", "/flag").json() == {"beta_testing_enabled": False}
+    assert flags.request("GET", "/flag").json() == {"beta_testing_enabled": False}
+    assert settings.reads == 1
+
+    assert flags.request("POST", "/api/admin/subscription/toggle-beta").status_code == 200
+    assert flags.request("GET", "/flag").json() == {"beta_testing_enabled": True}
+    assert settings.reads == 2
+    assert flags.beta_flag_cache.invalidations == 1
+
+
+def test_failed_admin_toggle_keeps_the_cache(flags, settings):
+    flags.request("GET", "/flag")
+    response = flags.request("POST", "/api/admin/subscription/toggle-beta", params={"fail": "true"})
+    assert response.status_code == 400
+    flags.request("GET", "/flag")
+    assert settings.reads == 1
+    assert flags.beta_flag_cache.invalidations == 0
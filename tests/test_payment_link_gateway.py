@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from tests.conftest import load_snippets
+
+
+@pytest.fixture
+def gateway_api():
+    snippets = load_snippets("payment_link_gateway.py")
+    snippets["RAZORPAY_BACKOFF_SECONDS"] = 0
+    yield snippets
+    snippets.payment_link_executor.shutdown(wait=True)
+    snippets.engine.dispose()
+
+
+def _link_data(amount: int = 315000) -> dict:
+    return {"amount": amount, "currency": "INR", "description": "Batch creation subscription"}
+
+
+def test_idempotency_key_is_stable_and_fits_reference_id(gateway_api):
+    key = gateway_api.payment_link_idempotency_key(1, "Algebra", "Maths", 1500, 30, 3150)
+    assert key == gateway_api.payment_link_idempotency_key(1, "Algebra", "Maths", 1500, 30, 3150)
+    assert key != gateway_api.payment_link_idempotency_key(1, "Algebra", "Maths", 1500, 31, 3150)
+    assert len(key) <= 40
+
+
+def test_retryable_errors_are_retried(gateway_api):
+    gateway = gateway_api.StubPaymentLinkGateway(fail_next=2)
+    link = asyncio.run(gateway_api.create_payment_link_async(_link_data(), "bc_retry", gateway))
+    assert (gateway.create_calls, link["reference_id"]) == (3, "bc_retry")
+
+
+def test_retries_give_up_after_the_last_attempt(gateway_api):
+    gateway = gateway_api.StubPaymentLinkGateway(fail_next=gateway_api.RAZORPAY_MAX_ATTEMPTS)
+    with pytest.raises(gateway_api.PaymentGatewayUnavailable):
+        asyncio.run(gateway_api.create_payment_link_async(_link_data(), "bc_down", gateway))
+
+
+def test_a_repeated_request_reuses_the_open_link(gateway_api):
+    gateway = gateway_api.StubPaymentLinkGateway()
+    first = asyncio.run(gateway_api.create_payment_link_async(_link_data(), "bc_same", gateway))
+    second = asyncio.run(gateway_api.create_payment_link_async(_link_data(), "bc_same", gateway))
+    assert second["id"] == first["id"]
+    assert len(gateway.created) == 1
+
+
+def test_a_closed_link_is_replaced_with_a_fresh_reference(gateway_api):
+    gateway = gateway_api.StubPaymentLinkGateway()
+    first = asyncio.run(gateway_api.create_payment_link_async(_link_data(), "bc_paid", gateway))
+    first["status"] = "paid"
+    second = asyncio.run(gateway_api.create_payment_link_async(_link_data(), "bc_paid", gateway))
+    assert second["id"] != first["id"]
+    assert second["reference_id"].startswith("bc_paid_")
+
+
+def test_concurrent_requests_share_one_gateway_call(gateway_api):
+    gateway = gateway_api.StubPaymentLinkGateway(latency=0.05)
+
+    async def create_twice():
+        return await asyncio.gather(*(
+            gateway_api.create_payment_link_async(_link_data(), "bc_double_click", gateway) for _ in range(2)
+        ))
+
+    first, second = asyncio.run(create_twice())
+    assert first["id"] == second["id"]
+    assert gateway.create_calls == 1
+    assert gateway_api._in_flight_payment_links == {}
+
+
+def test_the_stub_rejects_a_taken_reference(gateway_api):
+    gateway = gateway_api.StubPaymentLinkGateway()
+    gateway.create({**_link_data(), "reference_id": "bc_taken"})
+    with pytest.raises(gateway_api.DuplicateReferenceError) as raised:
+        gateway.create({**_link_data(), "reference_id": "bc_taken"})
+    assert raised.value.reference_id == "bc_taken"
+
+
+def test_other_gateway_errors_are_not_retried(gateway_api):
+    class RejectingGateway(gateway_api.StubPaymentLinkGateway):
+        def create(self, data):
+            self.create_calls += 1
+            raise gateway_api.PaymentGatewayError("amount must be at least INR 1.00")
+
+    gateway = RejectingGateway()
+    with pytest.raises(gateway_api.PaymentGatewayError, match="amount"):
+        asyncio.run(gateway_api.create_payment_link_async(_link_data(), "bc_rejected", gateway))
+    assert gateway.create_calls == 1
+
+
+def test_razorpay_errors_map_onto_gateway_errors(gateway_api):
+    razorpay = pytest.importorskip("razorpay")
+
+    class PaymentLinkClient:
+        def __init__(self, error, links=()):
+            self.error, self.links = error, list(links)
+
+        def create(self, data):
+            raise self.error
+
+        def all(self, options):
+            return {"payment_links": self.links}
+
+    def create(client):
+        gateway_api.RazorpayPaymentLinkGateway(client).create({**_link_data(), "reference_id": "bc_sdk"})
+
+    with pytest.raises(gateway_api.PaymentGatewayUnavailable):
+        create(PaymentLinkClient(razorpay.errors.ServerError("upstream down")))
+    with pytest.raises(gateway_api.DuplicateReferenceError):
+        create(PaymentLinkClient(razorpay.errors.BadRequestError("bad request"), [{"id": "plink_1"}]))
+    with pytest.raises(gateway_api.PaymentGatewayError) as raised:
+        create(PaymentLinkClient(razorpay.errors.BadRequestError("bad request")))
+    assert not isinstance(raised.value, gateway_api.DuplicateReferenceError)
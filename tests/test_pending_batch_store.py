@@ -0,0 +1,93 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from tests.conftest import MAIN_API_SNIPPETS, load_snippets
+
+CALLBACK = "/api/batch-creation/callback"
+
+
+@pytest.fixture
+def store():
+    snippets = load_snippets(*MAIN_API_SNIPPETS, "pending_batch_store.py", PAYMENT_GATEWAY_MODE="stub")
+    yield snippets
+    snippets.engine.dispose()
+
+
+@pytest.fixture
+def db(store):
+    session = store.session()
+    yield session
+    session.close()
+
+
+def _save(store, db, link_id: str = "plink_1", expires_at: datetime = None):
+    batch_data = {"teacher_id": 1, "name": "Algebra", "subject": "Maths", "fees": 1500, "max_students": 30,
+                  "subscription_fee": 3150}
+    return store.save_pending_batch(db, {"id": link_id, "reference_id": "ref_1"}, batch_data,
+                                    expires_at or store.pending_batch_expiry())
+
+
+def _callback(store, link_id: str = "plink_1", status: str = "paid"):
+    return store.request("GET", CALLBACK, params={
+        "razorpay_payment_id": "pay_1", "razorpay_payment_link_id": link_id,
+        "razorpay_payment_link_status": status, "razorpay_signature": "sig",
+    })
+
+
+def test_saving_the_same_link_twice_reuses_the_row(store, db):
+    first = _save(store, db)
+    second = _save(store, db)
+    assert first.id == second.id
+    assert db.query(store.models.PendingBatch).count() == 1
+
+
+def test_repeated_callbacks_create_one_batch(store, db):
+    _save(store, db)
+    for _ in range(3):
+        response = _callback(store)
+        assert response.status_code == 307
+        assert response.headers["location"].endswith("batch_payment=success")
+
+    batches = db.query(store.models.Batch).all()
+    assert [batch.name for batch in batches] == ["Algebra"]
+    pending = db.query(store.models.PendingBatch).one()
+    assert (pending.status, pending.batch_id, pending.payment_id) == ("promoted", batches[0].id, "pay_1")
+
+
+def test_callback_for_unpaid_or_unknown_links(store, db):
+    _save(store, db)
+    assert _callback(store, status="expired").headers["location"].endswith("batch_payment=failed")
+    assert _callback(store, link_id="plink_unknown").status_code == 404
+    assert db.query(store.models.Batch).count() == 0
+
+
+def test_sweep_expires_only_unpaid_overdue_requests(store, db):
+    past = datetime.utcnow() - timedelta(minutes=1)
+    _save(store, db, "plink_overdue", expires_at=past)
+    _save(store, db, "plink_open")
+    _save(store, db, "plink_paid", expires_at=past)
+    store.promote_pending_batch(db, "plink_paid", "pay_2")
+
+    assert store.sweep_expired_pending_batches(db) == 1
+    statuses = dict(db.query(store.models.PendingBatch.payment_link_id, store.models.PendingBatch.status))
+    assert statuses == {"plink_overdue": "expired", "plink_open": "pending", "plink_paid": "promoted"}
+
+    # A late payment for an expired request still creates the batch
+    assert store.promote_pending_batch(db, "plink_overdue", "pay_3")[1] is True
+
+
+@pytest.mark.parametrize("enabled", [False, True])
+def test_sweeper_is_started_only_when_enabled(store, enabled):
+    store["PENDING_BATCH_SWEEPER_ENABLED"] = enabled
+
+    async def start():
+        before = asyncio.all_tasks()
+        await store.start_pending_batch_sweeper()
+        started = asyncio.all_tasks() - before
+        for task in started:
+            task.cancel()
+        return len(started)
+
+    assert asyncio.run(start()) == int(enabled)
@@ -0,0 +1,115 @@
+import os
+
+import pytest
+
+import principal_cache as principal_cache_module
+from principal_cache import PrincipalCache, principal_subject, token_hash
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(principal_cache_module.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def version_file(tmp_path):
+    return str(tmp_path / "principal_cache.version")
+
+
+def _cache(version_file, **kwargs) -> PrincipalCache:
+    return PrincipalCache(version_file=version_file, **{"ttl": 30, "max_entries": 100, **kwargs})
+
+
+def test_tokens_are_cached_by_hash_per_kind(version_file):
+    cache = _cache(version_file)
+    hashed = token_hash("token-a")
+    assert hashed != "token-a" and len(hashed) == 64
+
+    assert cache.get("user", hashed) is None
+    cache.put("user", hashed, principal_subject("teacher", "t@example.com"), {"type": "teacher", "id": 1})
+    assert cache.get("user", hashed) == {"type": "teacher", "id": 1}
+    assert cache.get("teacher", hashed) is None
+    assert (cache.hits, cache.misses) == ({"user": 1}, {"user": 1, "teacher": 1})
+
+
+def test_entries_expire_with_the_ttl_or_the_token(version_file, clock):
+    cache = _cache(version_file)
+    cache.put("user", "long-lived", "teacher:a", "principal")
+    cache.put("user", "expiring", "teacher:b", "principal", token_expires_at=clock[0] + 5)
+
+    clock[0] += 6
+    assert cache.get("user", "expiring") is None
+    assert cache.get("user", "long-lived") == "principal"
+    clock[0] += 25
+    assert cache.get("user", "long-lived") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted(version_file):
+    cache = _cache(version_file, max_entries=2)
+    cache.put("user", "a", "teacher:a", "A")
+    cache.put("user", "b", "teacher:b", "B")
+    cache.get("user", "a")
+    cache.put("user", "c", "teacher:c", "C")
+    assert [cache.get("user", key) for key in ("a", "b", "c")] == ["A", None, "C"]
+    assert cache.evictions == 1
+
+
+def test_logout_drops_every_kind_of_one_token(version_file):
+    cache = _cache(version_file)
+    for kind in ("user", "teacher"):
+        cache.put(kind, "a", "teacher:a", kind)
+        cache.put(kind, "b", "teacher:a", kind)
+    cache.invalidate_token("a", broadcast=False)
+    assert [cache.get(kind, "a") for kind in ("user", "teacher")] == [None, None]
+    assert cache.get("user", "b") == "user"
+
+
+def test_subject_invalidation_drops_all_tokens_of_a_user(version_file):
+    cache = _cache(version_file)
+    cache.put("user", "phone", "teacher:a", "A")
+    cache.put("teacher", "laptop", "teacher:a", "A")
+    cache.put("user", "other", "teacher:b", "B")
+    cache.invalidate_subject("teacher:a", broadcast=False)
+    assert [cache.get("user", "phone"), cache.get("teacher", "laptop"), cache.get("user", "other")] == [None, None, "B"]
+
+
+def test_broadcast_clears_other_workers(version_file):
+    worker_a, worker_b = _cache(version_file), _cache(version_file)
+    worker_a.put("user", "a", "teacher:a", "A")
+    worker_b.put("user", "a", "teacher:a", "A")
+    worker_b.put("user", "b", "teacher:b", "B")
+
+    worker_a.invalidate_subject("teacher:a")
+    # Another worker cannot tell which subject changed, so it drops everything
+    assert worker_b.get("user", "b") is None
+    assert worker_b.stats()["entries"] == 0
+    # The invalidating worker already applied the change and keeps its other entries
+    worker_a.put("user", "c", "teacher:c", "C")
+    assert worker_a.get("user", "c") == "C"
+
+
+def test_broadcast_is_seen_even_when_the_stamp_mtime_does_not_change(version_file):
+    worker_a, worker_b = _cache(version_file), _cache(version_file)
+    worker_a.invalidate_subject("teacher:a")
+    worker_b.get("user", "a")
+    worker_b.put("user", "a", "teacher:a", "A")
+    stamp = os.stat(version_file)
+
+    worker_a.invalidate_subject("teacher:a")
+    # Same timestamp tick as the previous invalidation
+    os.utime(version_file, ns=(stamp.st_atime_ns, stamp.st_mtime_ns))
+    assert worker_b.get("user", "a") is None
+
+
+def test_stats(version_file):
+    cache = _cache(version_file)
+    cache.put("user", "a", "teacher:a", "A")
+    cache.get("user", "a"), cache.get("user", "a"), cache.get("teacher", "a")
+    cache.invalidate_token("a", broadcast=False)
+    assert cache.stats() == {
+        "hits": {"user": 2}, "misses": {"teacher": 1}, "hit_rate": 0.6667, "entries": 0,
+        "invalidations": 1, "evictions": 0, "ttl_seconds": 30
+    }
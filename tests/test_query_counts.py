@@ -0,0 +1,45 @@
+import pytest
+
+from tests.conftest import add_teacher_batches, count_statements
+
+CALCULATE_ALL_BATCHES = "/api/teacher/subscription/calculate-all-batches"
+
+
+def _calculate_all_batches_statements(main_api, batch_count: int) -> int:
+    add_teacher_batches(main_api, teacher_id=1, batch_count=batch_count, approved_per_batch=3)
+    main_api.as_teacher(1)
+    main_api.request("GET", CALCULATE_ALL_BATCHES)  # warm the beta flag cache
+
+    with count_statements(main_api.engine) as statements:
+        response = main_api.request("GET", CALCULATE_ALL_BATCHES)
+    assert response.status_code == 200
+    assert response.json()["total_batches"] == batch_count
+    return len(statements)
+
+
+@pytest.mark.parametrize("batch_count", [1, 25, 150])
+def test_calculate_all_batches_query_count_is_constant(main_api, batch_count):
+    assert _calculate_all_batches_statements(main_api, batch_count) == 1
+
+
+def test_approved_student_counts_use_one_grouped_query(main_api):
+    batch_ids = add_teacher_batches(main_api, teacher_id=1, batch_count=40, approved_per_batch=2)
+    db = main_api.session()
+    try:
+        with count_statements(main_api.engine) as statements:
+            counts = main_api.get_approved_student_counts(db, batch_ids + [batch_ids[0], 9999])
+    finally:
+        db.close()
+
+    assert len(statements) == 1
+    assert counts == {**{batch_id: 2 for batch_id in batch_ids}, 9999: 0}
+
+
+def test_approved_student_counts_skip_the_query_for_no_batches(main_api):
+    db = main_api.session()
+    try:
+        with count_statements(main_api.engine) as statements:
+            assert main_api.get_approved_student_counts(db, []) == {}
+    finally:
+        db.close()
+    assert statements == []
@@ -0,0 +1,109 @@
+import time
+
+import pytest
+
+from principal_cache import PrincipalCache
+from subscription_pricing import real_time_subscription_view
+from tests.conftest import count_statements, load_snippets
+
+CALCULATE = "/api/subscription/calculate-real-time"
+
+
+def test_calculation_runs_without_the_database(main_api):
+    main_api.as_teacher(1)
+    params = {"batch_fees": 1500, "student_limit": 30, "current_students": 12}
+    with count_statements(main_api.engine) as statements:
+        first = main_api.request("GET", CALCULATE, params=params)
+        second = main_api.request("GET", CALCULATE, params=params)
+
+    assert statements == []
+    assert first.status_code == 200
+    assert first.content == second.content
+    assert first.json() == {
+        "success": True,
+        "calculation": real_time_subscription_view(1500, 30, 12, "summary"),
+        "beta_testing_enabled": False,
+        "message": "Real-time subscription calculation completed"
+    }
+
+
+def test_full_detail_adds_the_explanations(main_api):
+    main_api.as_teacher(1)
+    calculation = main_api.request("GET", CALCULATE, params={
+        "batch_fees": 1500, "student_limit": 30, "detail": "full"
+    }).json()["calculation"]
+    assert calculation == real_time_subscription_view(1500, 30, 0, "full")
+    assert "calculation_steps" in calculation
+
+
+@pytest.mark.parametrize("params", [
+    {"batch_fees": -1, "student_limit": 30},
+    {"batch_fees": 1500, "student_limit": 0},
+    {"batch_fees": 1500, "student_limit": 30, "current_students": -1},
+])
+def test_invalid_inputs_are_rejected(main_api, params):
+    main_api.as_teacher(1)
+    assert main_api.request("GET", CALCULATE, params=params).status_code == 400
+
+
+SECRET_KEY = "stateless-auth-test-secret-key-of-32-bytes"
+
+
+@pytest.fixture
+def claims_api(tmp_path):
+    jwt = pytest.importorskip("jwt")
+    snippets = load_snippets("stateless_auth.py", "cached_auth.py", jwt=jwt, SECRET_KEY=SECRET_KEY, ALGORITHM="HS256")
+    snippets["principal_cache"] = PrincipalCache(version_file=str(tmp_path / "principal_cache.version"))
+    models = snippets.models
+
+    # The main app's get_current_user: the role is stored on the user, not in the token
+    def get_current_user(token, db):
+        claims = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+        teacher = db.query(models.Teacher).filter(models.Teacher.email == claims["sub"]).first()
+        return {"type": "teacher", "id": teacher.id} if teacher else {"type": "student", "id": 0}
+
+    snippets["get_current_user"] = get_current_user
+    db = snippets.session()
+    db.add(models.Teacher(id=1, email="t@example.com"))
+    db.commit()
+    db.close()
+
+    @snippets.app.get("/claims")
+    def read_claims(claims: dict = snippets.Depends(snippets.get_teacher_token_claims)):
+        return claims
+
+    yield snippets, jwt
+    snippets.engine.dispose()
+
+
+def _get_claims(snippets, token: str = None):
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    return snippets.request("GET", "/claims", headers=headers)
+
+
+def test_token_is_validated_without_a_user_lookup(claims_api):
+    snippets, jwt = claims_api
+    with count_statements(snippets.engine) as statements:
+        teacher = _get_claims(snippets, jwt.encode({"type": "teacher", "sub": "t@example.com"}, SECRET_KEY,
+                                                   algorithm="HS256"))
+    assert statements == []
+    assert teacher.json() == {"type": "teacher", "sub": "t@example.com"}
+    assert _get_claims(snippets, jwt.encode({"type": "student"}, SECRET_KEY, algorithm="HS256")).status_code == 403
+    wrong_key = "another-secret-key-of-at-least-32-bytes"
+    assert _get_claims(snippets, jwt.encode({"type": "teacher"}, wrong_key, algorithm="HS256")).status_code == 401
+    assert _get_claims(snippets).status_code == 401
+
+
+def test_tokens_without_a_type_claim_take_the_role_from_the_user(claims_api):
+    snippets, jwt = claims_api
+    token = jwt.encode({"sub": "t@example.com", "exp": int(time.time()) + 3600}, SECRET_KEY, algorithm="HS256")
+    with count_statements(snippets.engine) as statements:
+        first = _get_claims(snippets, token)
+    assert (first.status_code, first.json()["type"]) == (200, "teacher")
+    assert len(statements) == 1
+    with count_statements(snippets.engine) as statements:
+        assert _get_claims(snippets, token).status_code == 200
+    assert statements == []
+
+    student = jwt.encode({"sub": "s@example.com"}, SECRET_KEY, algorithm="HS256")
+    assert _get_claims(snippets, student).status_code == 403
@@ -0,0 +1,109 @@
+import fastapi.routing
+import pytest
+from sqlalchemy import create_engine, event, text
+from starlette.responses import JSONResponse
+
+from fast_json import FastJSONResponse
+from response_cache import response_cache
+from tests.conftest import MAIN_API_SNIPPETS, add_teacher_batches, load_snippets
+
+STATUS = "/api/teacher/subscription/status"
+METRICS_TOKEN = "metrics-scrape-token"
+
+
+@pytest.fixture
+def profiled():
+    response_cache.clear()
+    renders = (fastapi.routing.serialize_response, JSONResponse.render, FastJSONResponse.render)
+    snippets = load_snippets(*MAIN_API_SNIPPETS, "request_profiling.py")
+    snippets["METRICS_TOKEN"] = METRICS_TOKEN
+    # Loading the middleware must not patch FastAPI or Starlette for every app in the process
+    assert (fastapi.routing.serialize_response, JSONResponse.render, FastJSONResponse.render) == renders
+    yield snippets
+    snippets.engine.dispose()
+
+
+def _series(histogram, route: str, method: str = "GET", status: str = "200") -> dict:
+    return histogram.series[(route, method, status)]
+
+
+def test_sql_is_profiled_on_the_app_engine_only(profiled):
+    assert event.contains(profiled.engine, "after_cursor_execute", profiled._time_request_statement)
+
+    other_engine = create_engine("sqlite://")
+    try:
+        with profiled.track_request_queries() as queries:
+            with other_engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+        assert queries.count == 0
+    finally:
+        other_engine.dispose()
+
+
+def test_profiling_reads_the_query_count_of_the_request(profiled):
+    add_teacher_batches(profiled, teacher_id=1, batch_count=2, with_subscriptions=True)
+    profiled.as_teacher(1)
+    # First metrics read builds the summaries, so several statements run
+    response = profiled.request("GET", "/api/teacher/subscription/metrics")
+    series = _series(profiled.request_sql_statements, "/api/teacher/subscription/metrics")
+    assert series["sum"] == int(response.headers["x-query-count"]) > 2
+    assert _series(profiled.request_db_seconds, "/api/teacher/subscription/metrics")["sum"] > 0
+
+
+def test_slow_requests_log_their_statements(profiled):
+    profiled["SLOW_REQUEST_LOG_MS"] = 0.001
+    profiled["SLOW_REQUEST_MAX_STATEMENTS"] = 1
+    logged = []
+    profiled["log_event"] = lambda logger, level, event_name, **fields: logged.append((event_name, fields))
+    add_teacher_batches(profiled, teacher_id=1, batch_count=2, with_subscriptions=True)
+    profiled.as_teacher(1)
+    profiled.request("GET", STATUS)
+
+    [(event_name, fields)] = logged
+    assert (event_name, fields["sql_statements"], len(fields["statements"])) == ("slow_request", 2, 1)
+    assert fields["statements"][0]["parameters"].endswith("redacted>")
+
+
+def test_requests_are_recorded_per_route_method_and_status(profiled):
+    add_teacher_batches(profiled, teacher_id=1, batch_count=3, with_subscriptions=True)
+    profiled.as_teacher(1)
+    assert profiled.request("GET", STATUS).status_code == 200
+
+    statements = _series(profiled.request_sql_statements, STATUS)
+    assert (statements["count"], statements["sum"]) == (1, 2)
+    # The status route renders through @fast_json, so its serialization is timed
+    assert _series(profiled.request_serialization_seconds, STATUS)["sum"] > 0
+    assert _series(profiled.request_handler_seconds, STATUS)["count"] == 1
+
+    authorized = {"Authorization": f"Bearer {METRICS_TOKEN}"}
+    metrics = profiled.request("GET", "/metrics", headers=authorized).content.decode()
+    assert f'api_request_sql_statements_count{{route="{STATUS}",method="GET",status="200"}} 1' in metrics
+
+
+def test_failed_requests_are_recorded_as_500(profiled):
+    @profiled.app.get("/api/failing")
+    def failing(db=profiled.Depends(profiled.get_db)):
+        db.execute(text("SELECT 1"))
+        raise RuntimeError("handler failed")
+
+    with pytest.raises(RuntimeError):
+        profiled.request("GET", "/api/failing")
+
+    series = _series(profiled.request_sql_statements, "/api/failing", status="500")
+    assert (series["count"], series["sum"]) == (1, 1)
+    assert ("/api/failing", "GET", "200") not in profiled.request_sql_statements.series
+
+
+def test_client_errors_keep_their_status(profiled):
+    assert profiled.request("GET", STATUS).status_code == 401
+    assert _series(profiled.request_sql_statements, STATUS, status="401")["count"] == 1
+
+
+def test_metrics_require_the_token_whatever_the_client_address(profiled):
+    for headers in ({}, {"Authorization": "Bearer wrong"}, {"Authorization": METRICS_TOKEN}):
+        assert profiled.request("GET", "/metrics", headers=headers, client="127.0.0.1").status_code == 401
+    authorized = {"Authorization": f"Bearer {METRICS_TOKEN}"}
+    assert profiled.request("GET", "/metrics", headers=authorized, client="203.0.113.9").status_code == 200
+
+    profiled["METRICS_TOKEN"] = ""
+    assert profiled.request("GET", "/metrics", headers=authorized).status_code == 404
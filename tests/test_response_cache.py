@@ -0,0 +1,192 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+
+from response_cache import ResponseCache, cached_response, response_cache
+from tests.conftest import add_teacher_batches, call_asgi
+
+STATUS = "/api/teacher/subscription/status"
+STATUS_ROUTE = "get_teacher_subscription_status"
+
+
+@pytest.fixture
+def cache_app():
+    """A bare app whose endpoints are cached under a stamp the test controls"""
+    cache = ResponseCache(max_entries=2)
+    state = {"stamp": 1, "calls": 0}
+
+    def stamp(**_):
+        return state["stamp"]
+
+    app = FastAPI()
+
+    @app.get("/async")
+    @cached_response(stamp, cache=cache)
+    async def async_endpoint():
+        state["calls"] += 1
+        return {"calls": state["calls"]}
+
+    @app.get("/sync/{item_id}")
+    @cached_response(lambda item_id, **_: None if item_id == 0 else (item_id, state["stamp"]), cache=cache)
+    def sync_endpoint(item_id: int):
+        state["calls"] += 1
+        return {"item_id": item_id, "calls": state["calls"]}
+
+    def get(path, headers=None):
+        return asyncio.run(call_asgi(app, "GET", path, headers=headers))
+
+    return cache, state, get
+
+
+def test_hit_304_and_new_stamp(cache_app):
+    cache, state, get = cache_app
+    first = get("/async")
+    assert (first.status_code, first.json()) == (200, {"calls": 1})
+    assert first.headers["cache-control"] == "private, no-cache"
+    etag = first.headers["etag"]
+
+    repeat = get("/async")
+    assert (repeat.json(), repeat.headers["etag"]) == ({"calls": 1}, etag)
+
+    not_modified = get("/async", headers={"If-None-Match": etag})
+    assert (not_modified.status_code, not_modified.content, not_modified.headers["etag"]) == (304, b"", etag)
+    # Weak comparison: the strong form of the tag matches too
+    assert get("/async", headers={"If-None-Match": etag[2:]}).status_code == 304
+
+    state["stamp"] = 2
+    changed = get("/async", headers={"If-None-Match": etag})
+    assert (changed.status_code, changed.json()) == (200, {"calls": 2})
+    assert changed.headers["etag"] != etag
+    assert state["calls"] == 2
+
+
+def test_stats_count_each_outcome(cache_app):
+    cache, _, get = cache_app
+    etag = get("/async").headers["etag"]
+    get("/async")
+    get("/async", headers={"If-None-Match": etag})
+
+    stats = cache.stats()
+    assert (stats["entries"], stats["max_entries"]) == (1, 2)
+    [counters] = stats["routes"].values()
+    assert counters == {"hits": 1, "misses": 1, "not_modified": 1, "hit_rate": round(2 / 3, 4)}
+
+
+def test_none_stamp_bypasses_the_cache(cache_app):
+    cache, state, get = cache_app
+    assert [get("/sync/0").json()["calls"] for _ in range(2)] == [1, 2]
+    assert "etag" not in get("/sync/0").headers
+    assert cache.stats() == {"routes": {}, "entries": 0, "max_entries": 2}
+
+
+def test_lru_eviction_and_clear(cache_app):
+    cache, state, get = cache_app
+    for item_id in (1, 2, 1, 3):
+        get(f"/sync/{item_id}")
+    # /sync/1 was used more recently than /sync/2, so /sync/2 was evicted
+    assert state["calls"] == 3
+    assert get("/sync/1").json()["calls"] == 1
+    assert get("/sync/2").json()["calls"] == 4
+    assert cache.stats()["entries"] == 2
+
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+    assert get("/sync/1").json()["calls"] == 5
+
+
+def test_status_200_304_version_bump_new_etag(main_api):
+    [batch_id] = add_teacher_batches(main_api, teacher_id=1, batch_count=1, approved_per_batch=3,
+                                     with_subscriptions=True)
+    main_api.as_teacher(1)
+    # Counters outlive clear(), so earlier tests may have counted on this route already
+    before = response_cache.stats()["routes"].get(STATUS_ROUTE, {"hits": 0, "misses": 0, "not_modified": 0})
+
+    first = main_api.request("GET", STATUS)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert main_api.request("GET", STATUS).content == first.content
+    assert main_api.request("GET", STATUS, headers={"If-None-Match": etag}).status_code == 304
+
+    db = main_api.session()
+    try:
+        main_api.record_enrollment_change(db, batch_id, 1)
+        db.commit()
+    finally:
+        db.close()
+
+    changed = main_api.request("GET", STATUS, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert main_api.request("GET", STATUS, headers={"If-None-Match": changed.headers["etag"]}).status_code == 304
+
+    counters = response_cache.stats()["routes"][STATUS_ROUTE]
+    assert [counters[key] - before[key] for key in ("misses", "hits", "not_modified")] == [2, 1, 2]
+
+
+def test_batch_bump_invalidates_only_the_owning_teacher(main_api):
+    [batch_id] = add_teacher_batches(main_api, teacher_id=1, batch_count=1, with_subscriptions=True)
+    add_teacher_batches(main_api, teacher_id=2, batch_count=1, with_subscriptions=True)
+    etags = {}
+    for teacher_id in (1, 2):
+        main_api.as_teacher(teacher_id)
+        etags[teacher_id] = main_api.request("GET", STATUS).headers["etag"]
+
+    db = main_api.session()
+    try:
+        main_api.bump_teacher_status_version(db, batch_ids=[batch_id])
+        main_api.bump_teacher_status_version(db, batch_ids=[])
+        db.commit()
+        assert [db.get(main_api.models.Teacher, teacher_id).subscription_status_version
+                for teacher_id in (1, 2)] == [2, 1]
+    finally:
+        db.close()
+
+    main_api.as_teacher(1)
+    assert main_api.request("GET", STATUS, headers={"If-None-Match": etags[1]}).status_code == 200
+    main_api.as_teacher(2)
+    assert main_api.request("GET", STATUS, headers={"If-None-Match": etags[2]}).status_code == 304
+
+
+def _status_versions(main_api) -> list:
+    db = main_api.session()
+    try:
+        return [db.get(main_api.models.Teacher, teacher_id).subscription_status_version for teacher_id in (1, 2)]
+    finally:
+        db.close()
+
+
+def test_batch_rename_invalidates_the_status(main_api):
+    [batch_id] = add_teacher_batches(main_api, teacher_id=1, batch_count=1, with_subscriptions=True)
+    main_api.as_teacher(1)
+    etag = main_api.request("GET", STATUS).headers["etag"]
+
+    db = main_api.session()
+    try:
+        db.get(main_api.models.Batch, batch_id).name = "Algebra II"
+        db.commit()
+    finally:
+        db.close()
+
+    renamed = main_api.request("GET", STATUS, headers={"If-None-Match": etag})
+    assert renamed.status_code == 200
+    assert renamed.json()["subscriptions"][0]["batch_name"] == "Algebra II"
+
+
+def test_only_status_payload_edits_bump_the_version(main_api):
+    [batch_id] = add_teacher_batches(main_api, teacher_id=1, batch_count=1)
+    add_teacher_batches(main_api, teacher_id=2, batch_count=1)
+
+    db = main_api.session()
+    try:
+        batch = db.get(main_api.models.Batch, batch_id)
+        batch.description = "Not shown on the status page"
+        batch.name = batch.name
+        db.commit()
+        assert _status_versions(main_api) == [1, 1]
+
+        batch.teacher_id = 2
+        db.commit()
+    finally:
+        db.close()
+    assert _status_versions(main_api) == [2, 2]
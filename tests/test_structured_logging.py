@@ -0,0 +1,95 @@
+import io
+import json
+import logging
+import queue
+import sys
+
+import pytest
+from fastapi import FastAPI
+
+import structured_logging
+from structured_logging import BoundedQueueHandler, JsonFormatter, SamplingFilter, log_event
+
+
+def _record_with_exception(logger_name: str = "app.test") -> logging.LogRecord:
+    try:
+        raise ValueError("bad fee")
+    except ValueError:
+        exc_info = sys.exc_info()
+    record = logging.LogRecord(logger_name, logging.ERROR, __file__, 1, "failed for %s", ("batch 7",), exc_info)
+    record.event = "subscription_status_failed"
+    record.fields = {"batch_id": 7}
+    return record
+
+
+def test_prepare_renders_the_traceback_and_drops_live_objects():
+    record = _record_with_exception()
+    prepared = BoundedQueueHandler(queue.Queue()).prepare(record)
+
+    assert (prepared.msg, prepared.args, prepared.exc_info) == ("failed for batch 7", None, None)
+    assert "ValueError: bad fee" in prepared.exc_text
+    # The caller's record is left alone, as with the stdlib QueueHandler
+    assert record.exc_info is not None and record.args == ("batch 7",)
+
+
+def test_formatter_writes_the_prepared_traceback():
+    prepared = BoundedQueueHandler(queue.Queue()).prepare(_record_with_exception())
+    entry = json.loads(JsonFormatter().format(prepared))
+    assert entry["event"] == "subscription_status_failed"
+    assert entry["batch_id"] == 7
+    assert "ValueError: bad fee" in entry["exception"]
+
+
+def test_full_queue_drops_and_counts(monkeypatch):
+    monkeypatch.setitem(structured_logging._logging_stats, "dropped", {})
+    handler = BoundedQueueHandler(queue.Queue(maxsize=1))
+    handler.handle(logging.LogRecord("app.test", logging.INFO, __file__, 1, "one", None, None))
+    handler.handle(logging.LogRecord("app.test", logging.WARNING, __file__, 1, "two", None, None))
+    assert handler.queue.qsize() == 1
+    assert structured_logging.logging_stats()["dropped"] == {"WARNING": 1}
+
+
+def test_sampling_filter_keeps_unsampled_events():
+    record = logging.LogRecord("app.test", logging.INFO, __file__, 1, "x", None, None)
+    record.event = "subscription_calculation_result"
+    assert SamplingFilter({"subscription_calculation_result": 0.0}).filter(record) is False
+    assert SamplingFilter({"subscription_calculation_result": 1.0}).filter(record) is True
+    record.event = "other"
+    assert SamplingFilter({"subscription_calculation_result": 0.0}).filter(record) is True
+
+
+@pytest.fixture
+def log_output(monkeypatch):
+    """Stdout of the listener, with the listener stopped before and after the test"""
+    structured_logging.stop_log_listener()
+    while not structured_logging._log_queue.empty():
+        structured_logging._log_queue.get_nowait()
+    output = io.StringIO()
+    monkeypatch.setattr(structured_logging._stream_handler, "stream", output)
+    yield output
+    structured_logging.stop_log_listener()
+
+
+def test_listener_runs_between_app_startup_and_shutdown(log_output):
+    app = FastAPI()
+    structured_logging.install_log_listener(app)
+    logger = structured_logging.get_logger("test")
+
+    try:
+        raise ValueError("bad fee")
+    except ValueError:
+        log_event(logger, logging.ERROR, "subscription_status_failed", exc_info=True, batch_id=7)
+    # Nothing is written before startup
+    assert log_output.getvalue() == ""
+
+    for handler in app.router.on_startup:
+        handler()
+    for handler in app.router.on_startup:
+        handler()
+    for handler in app.router.on_shutdown:
+        handler()
+
+    [line] = log_output.getvalue().splitlines()
+    entry = json.loads(line)
+    assert (entry["event"], entry["batch_id"]) == ("subscription_status_failed", 7)
+    assert "ValueError: bad fee" in entry["exception"]
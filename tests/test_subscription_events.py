@@ -0,0 +1,92 @@
+import asyncio
+import threading
+
+import pytest
+
+from tests.conftest import add_teacher_batches
+
+
+@pytest.fixture
+def db(main_api):
+    session = main_api.session()
+    yield session
+    session.close()
+
+
+def _pending_events(main_api, db) -> list:
+    return [batch_id for (batch_id,) in db.query(main_api.models.SubscriptionEvent.batch_id).order_by(
+        main_api.models.SubscriptionEvent.id
+    )]
+
+
+def test_events_are_written_only_with_the_change(main_api, db):
+    [batch_id] = add_teacher_batches(main_api, teacher_id=1, batch_count=1)
+    main_api.record_enrollment_change(db, batch_id, 1)
+    db.rollback()
+    assert _pending_events(main_api, db) == []
+
+    main_api.record_enrollment_change(db, batch_id, 1)
+    db.commit()
+    assert _pending_events(main_api, db) == [batch_id]
+
+
+def test_a_burst_for_one_batch_is_applied_with_one_refresh(main_api, db, monkeypatch):
+    batch_ids = add_teacher_batches(main_api, teacher_id=1, batch_count=2, approved_per_batch=5)
+    main_api.get_teacher_summary(db, 1)
+    for _ in range(4):
+        main_api.record_enrollment_change(db, batch_ids[0], 1)
+    main_api.record_enrollment_change(db, batch_ids[1], -1)
+    db.commit()
+
+    refresh_batch_summary = main_api.refresh_batch_summary
+    refreshed = []
+
+    def counting_refresh(session, batch_id):
+        refreshed.append(batch_id)
+        refresh_batch_summary(session, batch_id)
+
+    monkeypatch.setitem(main_api, "refresh_batch_summary", counting_refresh)
+    assert main_api.drain_subscription_events(db) == 5
+    assert refreshed == batch_ids
+    assert _pending_events(main_api, db) == []
+
+    db.expire_all()
+    assert db.get(main_api.models.BatchSubscriptionSummary, batch_ids[0]).approved_count == 9
+    assert db.get(main_api.models.TeacherSubscriptionSummary, 1).approved_count == 13
+
+
+def test_events_are_processed_in_bounded_batches(main_api, db):
+    batch_ids = add_teacher_batches(main_api, teacher_id=1, batch_count=3)
+    for batch_id in batch_ids:
+        main_api.record_enrollment_change(db, batch_id, 1)
+    db.commit()
+
+    assert main_api.process_subscription_events(db, limit=2) == 2
+    assert _pending_events(main_api, db) == batch_ids[2:]
+    assert main_api.process_subscription_events(db, limit=2) == 1
+    assert main_api.process_subscription_events(db, limit=2) == 0
+
+
+def test_commit_wakes_the_consumer(main_api):
+    [batch_id] = add_teacher_batches(main_api, teacher_id=1, batch_count=1)
+    bus = main_api.subscription_event_bus
+
+    def commit_event():
+        db = main_api.session()
+        try:
+            main_api.record_enrollment_change(db, batch_id, 1)
+            db.commit()
+        finally:
+            db.close()
+
+    async def wait_for_commit():
+        bus.attach(asyncio.get_running_loop())
+        committer = threading.Thread(target=commit_event)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        committer.start()
+        await bus.wait(5)
+        committer.join()
+        return loop.time() - started
+
+    assert asyncio.run(wait_for_commit()) < 5
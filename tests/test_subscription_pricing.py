@@ -0,0 +1,262 @@
+import dataclasses
+import json
+import random
+from datetime import date
+
+import pytest
+
+import subscription_pricing
+from subscription_pricing import (
+    batch_subscription_fee_view,
+    clear_pricing_cache,
+    enhanced_subscription_fee_view,
+    SubscriptionQuote,
+    price_subscription,
+    quote_response_body,
+    real_time_subscription_view,
+    subscription_fee_view,
+    warm_pricing_table,
+)
+from tests.conftest import add_teacher_batches
+
+
+# The calculators as they were before they moved onto the pricing kernel
+
+def legacy_subscription_fee(batch_fees, student_count):
+    if batch_fees and batch_fees > 0:
+        commission_per_student = max(int(batch_fees * 7 / 100), 35)
+    else:
+        commission_per_student = 35
+    effective_student_count = max(student_count, 20)
+    return {
+        "commission_per_student": commission_per_student,
+        "student_count": effective_student_count,
+        "total_subscription": commission_per_student * effective_student_count,
+        "minimum_met": student_count >= 20,
+        "batch_fees": batch_fees,
+        "commission_rate": 7
+    }
+
+
+def legacy_enhanced_subscription_fee(batch_fees, student_count, student_limit=None):
+    if batch_fees and batch_fees > 0:
+        commission_per_student = max(int(batch_fees * 7 / 100), 35)
+    else:
+        commission_per_student = 35
+    effective_student_count = max(student_limit or student_count, 20)
+    return {
+        "commission_per_student": commission_per_student,
+        "student_count": effective_student_count,
+        "total_subscription": commission_per_student * effective_student_count,
+        "minimum_met": (student_limit or student_count) >= 20,
+        "batch_fees": batch_fees or 0,
+        "commission_rate": 7,
+        "min_students": 20,
+        "min_per_student": 35
+    }
+
+
+def legacy_real_time_subscription(batch_fees, student_limit, current_students=0):
+    seven_percent_amount = (batch_fees * 7) / 100 if batch_fees > 0 else 0
+    commission_per_student = max(seven_percent_amount, 35)
+    effective_student_count = max(student_limit, 20)
+    total_subscription = commission_per_student * effective_student_count
+    is_seven_percent_higher = seven_percent_amount > 35
+    return {
+        "batch_fees": batch_fees,
+        "student_limit": student_limit,
+        "current_students": current_students,
+        "seven_percent_amount": round(seven_percent_amount, 2),
+        "min_per_student": 35,
+        "commission_per_student": round(commission_per_student, 2),
+        "effective_student_count": effective_student_count,
+        "total_subscription": round(total_subscription, 2),
+        "is_seven_percent_higher": is_seven_percent_higher,
+        "calculation_steps": {
+            "step1": f"7% of ₹{batch_fees} = ₹{round(seven_percent_amount, 2)}",
+            "step2": f"max(₹{round(seven_percent_amount, 2)}, ₹35) = ₹{round(commission_per_student, 2)}",
+            "step3": f"₹{round(commission_per_student, 2)} × {effective_student_count} students = ₹{round(total_subscription, 2)}"
+        },
+        "logic_explanation": f"Commission per student = max(7% of batch fees, ₹35). Total subscription = Commission per student × max(student_limit, 20 students). {'7% of fees is higher' if is_seven_percent_higher else 'Minimum ₹35 is higher'}."
+    }
+
+
+def legacy_batch_subscription_fee(batch_fees, student_count, student_limit):
+    real_time = legacy_real_time_subscription(batch_fees, student_limit, student_count)
+    commission, students, total = (
+        real_time["commission_per_student"], real_time["effective_student_count"], real_time["total_subscription"]
+    )
+    return {
+        "commission_per_student": commission,
+        "student_count": students,
+        "total_subscription": total,
+        "minimum_met": student_count >= 20,
+        "batch_fees": batch_fees,
+        "commission_rate": 7,
+        "seven_percent_amount": real_time["seven_percent_amount"],
+        "min_per_student": 35,
+        "is_seven_percent_higher": real_time["is_seven_percent_higher"],
+        "calculation_steps": real_time["calculation_steps"],
+        "logic_explanation": real_time["logic_explanation"],
+        "batch_price_per_student": batch_fees,
+        "commission_calculation": f"max(7% of ₹{batch_fees}, ₹35) = ₹{commission} per student",
+        "total_calculation": f"₹{commission} × {students} students = ₹{total}",
+        "current_students": student_count,
+        "subscription_based_on": f"teacher-set limit of {student_limit} students"
+    }
+
+
+def _inputs(count: int = 3000):
+    rng = random.Random(11)
+    edges = [(fees, limit, current) for fees in (0, 1, 499, 500, 500.5, 514, 515, 1500, 2500.75)
+             for limit in (0, 19, 20, 21, 120) for current in (0, 20)]
+    randomized = [
+        (rng.choice([rng.randint(0, 10000), round(rng.uniform(0, 10000), 2)]), rng.randint(0, 150), rng.randint(0, 150))
+        for _ in range(count)
+    ]
+    return edges + randomized
+
+
+def _as_json(value) -> str:
+    return json.dumps(value, ensure_ascii=False, sort_keys=True)
+
+
+@pytest.fixture(autouse=True)
+def empty_pricing_cache():
+    clear_pricing_cache()
+    yield
+    clear_pricing_cache()
+
+
+def test_views_match_the_legacy_calculators():
+    for batch_fees, student_limit, current_students in _inputs():
+        assert _as_json(subscription_fee_view(batch_fees, current_students)) == \
+            _as_json(legacy_subscription_fee(batch_fees, current_students))
+        assert _as_json(enhanced_subscription_fee_view(batch_fees, current_students, student_limit)) == \
+            _as_json(legacy_enhanced_subscription_fee(batch_fees, current_students, student_limit))
+        assert _as_json(real_time_subscription_view(batch_fees, student_limit, current_students)) == \
+            _as_json(legacy_real_time_subscription(batch_fees, student_limit, current_students))
+        assert _as_json(batch_subscription_fee_view(batch_fees, current_students, student_limit)) == \
+            _as_json(legacy_batch_subscription_fee(batch_fees, current_students, student_limit))
+
+
+def test_enhanced_view_handles_missing_fees_and_limit():
+    assert enhanced_subscription_fee_view(None, 25)["batch_fees"] == 0
+    assert enhanced_subscription_fee_view(None, 25)["total_subscription"] == 35 * 25
+
+
+@pytest.mark.parametrize("batch_fees, student_basis, truncate, commission, total", [
+    (0, 0, False, 35, 700),
+    (499, 20, False, 35, 700),
+    (500, 20, False, 35.0, 700.0),
+    (1500, 30, False, 105.0, 3150.0),
+    (514, 20, True, 35, 700),
+    (515, 20, True, 36, 720),
+    (1500, 10, True, 105, 2100),
+])
+def test_price_subscription_rules(batch_fees, student_basis, truncate, commission, total):
+    price = price_subscription(batch_fees, student_basis, truncate_commission=truncate)
+    assert (price.commission_per_student, price.total_subscription) == (commission, total)
+    assert type(price.commission_per_student) is type(commission)
+
+
+def test_warmed_table_serves_prices_without_the_memo():
+    assert warm_pricing_table([(1500, 30), (None, None), (1500, 30)]) == 4
+    price = price_subscription(1500, 30)
+    assert subscription_pricing._cached_subscription_price.cache_info().currsize == 0
+    assert price == subscription_pricing._compute_subscription_price(1500, 30)
+    assert price_subscription(0, 0, truncate_commission=True).total_subscription == 700
+
+
+def test_memo_is_used_for_unwarmed_prices_and_cleared():
+    price_subscription(999, 45)
+    price_subscription(999, 45)
+    info = subscription_pricing._cached_subscription_price.cache_info()
+    assert (info.hits, info.misses) == (1, 1)
+
+    clear_pricing_cache()
+    assert subscription_pricing._cached_subscription_price.cache_info().currsize == 0
+    assert subscription_pricing._PRICING_TABLE == {}
+
+
+EXPLANATION_KEYS = {"calculation_steps", "logic_explanation"}
+BATCH_EXPLANATION_KEYS = EXPLANATION_KEYS | {"commission_calculation", "total_calculation", "subscription_based_on"}
+
+
+@pytest.mark.parametrize("batch_fees, student_limit, current_students", [(0, 0, 0), (499, 19, 5), (1500, 30, 12)])
+def test_summary_detail_drops_only_the_explanations(batch_fees, student_limit, current_students):
+    full = real_time_subscription_view(batch_fees, student_limit, current_students, "full")
+    summary = real_time_subscription_view(batch_fees, student_limit, current_students, "summary")
+    assert set(full) - set(summary) == EXPLANATION_KEYS
+    assert summary == {key: value for key, value in full.items() if key not in EXPLANATION_KEYS}
+
+    full = batch_subscription_fee_view(batch_fees, current_students, student_limit, "full")
+    summary = batch_subscription_fee_view(batch_fees, current_students, student_limit, "summary")
+    assert set(full) - set(summary) == BATCH_EXPLANATION_KEYS
+    assert summary == {key: value for key, value in full.items() if key not in BATCH_EXPLANATION_KEYS}
+
+
+def test_endpoints_take_the_detail_level(main_api):
+    [batch_id] = add_teacher_batches(main_api, teacher_id=1, batch_count=1, approved_per_batch=3)
+    main_api.as_teacher(1)
+    path = f"/api/subscription/calculate-batch/{batch_id}"
+
+    assert EXPLANATION_KEYS.isdisjoint(main_api.request("GET", path).json()["calculation"])
+    assert EXPLANATION_KEYS <= set(main_api.request("GET", path, params={"detail": "full"}).json()["calculation"])
+    assert main_api.request("GET", path, params={"detail": "verbose"}).status_code == 422
+
+
+@pytest.mark.parametrize("view, expected", [
+    ("subscription_fee", lambda: subscription_fee_view(1500, 12)),
+    ("enhanced", lambda: enhanced_subscription_fee_view(1500, 12, 30)),
+    ("batch", lambda: batch_subscription_fee_view(1500, 12, 30, "summary")),
+    ("real_time", lambda: real_time_subscription_view(1500, 30, 12, "summary")),
+])
+def test_quotes_match_their_views(view, expected):
+    quote = SubscriptionQuote(view, 1500, 12, 30, "summary")
+    assert quote.as_dict() == expected()
+    assert quote.total_subscription == expected()["total_subscription"]
+    assert json.loads(quote.to_json()) == expected()
+
+
+def test_quotes_are_immutable_and_encoded_once():
+    quote = SubscriptionQuote("real_time", 1500, 12, 30)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        quote.batch_fees = 0
+    assert quote.to_json() is SubscriptionQuote("real_time", 1500, 12, 30).to_json()
+    # The cached result is handed out read-only, so callers cannot corrupt the cache
+    values = quote.as_dict()
+    assert values is quote.as_dict()
+    with pytest.raises(TypeError):
+        values["total_subscription"] = 0
+    with pytest.raises(TypeError):
+        values["calculation_steps"]["step1"] = ""
+    assert quote.total_subscription == 3150.0
+
+
+@pytest.mark.parametrize("view, student_count, expected", [
+    ("subscription_fee", 12, (105, 20, 2100, False)),
+    ("enhanced", 12, (105, 30, 3150, True)),
+    ("batch", 12, (105.0, 30, 3150.0, False)),
+    ("real_time", 12, (105.0, 30, 3150.0, False)),
+    ("real_time", 25, (105.0, 30, 3150.0, True)),
+])
+def test_quotes_expose_typed_results(view, student_count, expected):
+    quote = SubscriptionQuote(view, 1500, student_count, 30, "summary")
+    assert (quote.commission_per_student, quote.effective_student_count, quote.total_subscription,
+            quote.minimum_met) == expected
+
+
+def test_int_and_float_fees_keep_their_json_types():
+    assert '"batch_fees":500,' in SubscriptionQuote("real_time", 500, 0, 20).to_json()
+    assert '"batch_fees":500.0' in SubscriptionQuote("real_time", 500.0, 0, 20).to_json()
+
+
+@pytest.mark.parametrize("envelope", [{}, {"batch_id": 7, "batch_name": "Algebra ₹", "due": date(2025, 2, 1)}])
+def test_response_body_matches_encoding_the_whole_payload(envelope):
+    first, second = SubscriptionQuote("batch", 1500, 12, 30), SubscriptionQuote("enhanced", 0, 25)
+    body = quote_response_body(envelope, calculation=first, previous=second)
+    expected = {**json.loads(json.dumps(envelope, default=str)), "calculation": first.as_dict(),
+                "previous": second.as_dict()}
+    assert json.loads(body) == expected
+    assert list(json.loads(body)) == list(expected)
@@ -0,0 +1,160 @@
+import asyncio
+import threading
+
+import pytest
+
+from subscription_pricing import price_subscription
+from tests.conftest import MAIN_API_SNIPPETS, add_teacher_batches, load_snippets
+
+
+@pytest.fixture
+def recalculation_api(tmp_path):
+    # A file database, so a second session really is a concurrent transaction
+    snippets = load_snippets(*MAIN_API_SNIPPETS, url=f"sqlite:///{tmp_path / 'recalculation.db'}")
+    yield snippets
+    snippets.engine.dispose()
+
+
+@pytest.fixture
+def batch_id(recalculation_api):
+    [batch_id] = add_teacher_batches(recalculation_api, teacher_id=1, batch_count=1, approved_per_batch=20,
+                                     with_subscriptions=True)
+    return batch_id
+
+
+def _price(student_count: int):
+    return price_subscription(1500, student_count, truncate_commission=True)
+
+
+def _approve_in_another_session(api, batch_id: int):
+    db = api.session()
+    try:
+        api.record_enrollment_change(db, batch_id, 1)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _subscription(api, batch_id: int):
+    db = api.session()
+    try:
+        return db.query(api.models.TeacherSubscription).filter(
+            api.models.TeacherSubscription.batch_id == batch_id
+        ).one()
+    finally:
+        db.close()
+
+
+def test_recalculation_stores_the_fee_and_bumps_the_version(recalculation_api, batch_id):
+    db = recalculation_api.session()
+    try:
+        count, quote = recalculation_api.recalculate_subscription(db, batch_id, _price)
+    finally:
+        db.close()
+    assert (count, quote.total_subscription) == (20, 2100)
+    subscription = _subscription(recalculation_api, batch_id)
+    assert (subscription.monthly_fee, subscription.student_count, subscription.version) == (2100, 20, 2)
+
+
+def test_an_approval_during_pricing_forces_a_retry(recalculation_api, batch_id):
+    counts = []
+
+    def price_while_approving(student_count):
+        counts.append(student_count)
+        if len(counts) == 1:
+            _approve_in_another_session(recalculation_api, batch_id)
+        return _price(student_count)
+
+    db = recalculation_api.session()
+    try:
+        count, _ = recalculation_api.recalculate_subscription(db, batch_id, price_while_approving)
+    finally:
+        db.close()
+    # The fee priced from the stale count was never stored
+    assert (counts, count) == ([20, 21], 21)
+    subscription = _subscription(recalculation_api, batch_id)
+    assert (subscription.student_count, subscription.monthly_fee) == (21, 105 * 21)
+
+
+def test_endless_contention_gives_409(recalculation_api, batch_id):
+    def price_while_approving(student_count):
+        _approve_in_another_session(recalculation_api, batch_id)
+        return _price(student_count)
+
+    db = recalculation_api.session()
+    try:
+        with pytest.raises(recalculation_api.HTTPException) as error:
+            recalculation_api.recalculate_subscription(db, batch_id, price_while_approving)
+    finally:
+        db.close()
+    assert error.value.status_code == 409
+
+
+def test_batch_without_a_subscription_is_only_priced(recalculation_api):
+    [batch_id] = add_teacher_batches(recalculation_api, teacher_id=1, batch_count=1, approved_per_batch=3)
+    db = recalculation_api.session()
+    try:
+        count, quote = recalculation_api.recalculate_subscription(db, batch_id, _price)
+    finally:
+        db.close()
+    assert (count, quote.total_subscription) == (3, 105 * 20)
+
+
+def test_concurrent_recalculations_share_one_computation(recalculation_api, batch_id):
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow_price(student_count):
+        calls.append(student_count)
+        started.set()
+        release.wait(5)
+        return _price(student_count)
+
+    async def recalculate_twice():
+        first = asyncio.ensure_future(recalculation_api.coalesced_subscription_recalculation(batch_id, slow_price))
+        await asyncio.to_thread(started.wait, 5)
+        second = asyncio.ensure_future(recalculation_api.coalesced_subscription_recalculation(batch_id, slow_price))
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(first, second)
+
+    first, second = asyncio.run(recalculate_twice())
+    assert first == second
+    assert calls == [20]
+    assert recalculation_api._in_flight_recalculations == {}
+
+
+def test_recalculate_endpoint(recalculation_api, batch_id):
+    recalculation_api.as_teacher(1)
+    body = recalculation_api.request("POST", f"/api/teacher/subscription/recalculate/{batch_id}").json()
+    assert (body["current_student_count"], body["subscription_calculation"]["total_subscription"]) == (20, 2100)
+
+    recalculation_api.as_teacher(2)
+    assert recalculation_api.request("POST", f"/api/teacher/subscription/recalculate/{batch_id}").status_code == 404
+
+
+def test_a_cancelled_caller_does_not_end_the_shared_job(recalculation_api, batch_id):
+    started, release = threading.Event(), threading.Event()
+
+    def slow_price(student_count):
+        started.set()
+        release.wait(5)
+        return _price(student_count)
+
+    async def cancel_the_first_caller():
+        first = asyncio.ensure_future(recalculation_api.coalesced_subscription_recalculation(batch_id, slow_price))
+        await asyncio.to_thread(started.wait, 5)
+        second = asyncio.ensure_future(recalculation_api.coalesced_subscription_recalculation(batch_id, slow_price))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+        return await second
+
+    count, quote = asyncio.run(cancel_the_first_caller())
+    assert (count, quote.total_subscription) == (20, 2100)
+    db = recalculation_api.session()
+    try:
+        subscription = db.query(recalculation_api.models.TeacherSubscription).filter_by(batch_id=batch_id).one()
+        assert (subscription.student_count, subscription.monthly_fee) == (20, 2100)
+    finally:
+        db.close()
@@ -0,0 +1,84 @@
+from datetime import date, timedelta
+
+import pytest
+
+from response_cache import response_cache
+from tests.conftest import MAIN_API_SNIPPETS, add_teacher_batches, count_statements, load_snippets
+
+STATUS = "/api/teacher/subscription/status"
+
+
+@pytest.fixture(params=["api_fixes.py", "enhanced_subscription_api.py"])
+def status_api(request):
+    """Both variants of the status endpoint"""
+    response_cache.clear()
+    snippets = load_snippets(*MAIN_API_SNIPPETS[:-1], request.param)
+    snippets.as_teacher(1)
+    yield snippets
+    snippets.engine.dispose()
+
+
+def _status_statements(status_api, subscription_count: int):
+    add_teacher_batches(status_api, teacher_id=1, batch_count=subscription_count, approved_per_batch=4,
+                        with_subscriptions=True)
+    with count_statements(status_api.engine) as statements:
+        response = status_api.request("GET", STATUS)
+    assert response.status_code == 200
+    assert response.json()["subscription_count"] == subscription_count
+    return statements, response
+
+
+@pytest.mark.parametrize("subscription_count", [1, 40])
+def test_status_query_count_is_constant(status_api, subscription_count):
+    statements, _ = _status_statements(status_api, subscription_count)
+    # The cache stamp (teacher status version) and the joined subscription fetch
+    assert len(statements) == 2
+
+
+def test_status_reports_the_request_query_count(status_api):
+    statements, response = _status_statements(status_api, 5)
+    assert response.headers["x-query-count"] == str(len(statements))
+
+
+def test_query_count_header_covers_every_statement_of_the_request(status_api):
+    add_teacher_batches(status_api, teacher_id=1, batch_count=3, with_subscriptions=True)
+    # First metrics read builds the teacher's summaries: several statements in one request
+    with count_statements(status_api.engine) as statements:
+        response = status_api.request("GET", "/api/teacher/subscription/metrics")
+    assert response.status_code == 200
+    assert len(statements) > 2
+    assert response.headers["x-query-count"] == str(len(statements))
+
+    route_stats = status_api.query_count_stats["/api/teacher/subscription/metrics"]
+    assert route_stats == {"requests": 1, "queries": len(statements), "max_queries": len(statements)}
+
+
+def test_status_payload(status_api):
+    add_teacher_batches(status_api, teacher_id=1, batch_count=2, approved_per_batch=25, fees=1500,
+                        student_limit=25, with_subscriptions=True)
+    db = status_api.session()
+    try:
+        not_due = db.query(status_api.models.TeacherSubscription).first()
+        not_due.next_billing_date = date.today() + timedelta(days=10)
+        not_due_id = not_due.id
+        db.commit()
+    finally:
+        db.close()
+
+    body = status_api.request("GET", STATUS).json()
+    assert body["has_subscription"] is True
+    assert (body["subscription_count"], body["due_count"]) == (2, 1)
+    subscriptions = {subscription["subscription_id"]: subscription for subscription in body["subscriptions"]}
+    assert subscriptions[not_due_id]["is_due"] is False
+    assert subscriptions[not_due_id]["payment_status"] == "paid"
+    for subscription in subscriptions.values():
+        assert subscription["student_count"] == 25
+        assert subscription["monthly_fee"] == 105 * 25
+        assert subscription["is_due"] is (subscription["subscription_id"] != not_due_id)
+
+
+def test_status_without_subscriptions(status_api):
+    add_teacher_batches(status_api, teacher_id=1, batch_count=2)
+    body = status_api.request("GET", STATUS).json()
+    assert body["has_subscription"] is False
+    assert body["subscriptions"] == []
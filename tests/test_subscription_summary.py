@@ -0,0 +1,146 @@
+import asyncio
+from datetime import date, datetime
+
+import pytest
+
+from tests.conftest import MAIN_API_SNIPPETS, add_teacher_batches, load_snippets
+
+
+@pytest.fixture
+def db(main_api):
+    session = main_api.session()
+    yield session
+    session.close()
+
+
+def _approve(main_api, db, batch_id: int, student_id: int):
+    models = main_api.models
+    db.add(models.BatchStudent(batch_id=batch_id, student_id=student_id, status=models.JoinRequestStatus.approved))
+    main_api.record_join_request_status_change(db, batch_id, models.JoinRequestStatus.pending,
+                                               models.JoinRequestStatus.approved)
+    db.commit()
+
+
+def test_first_read_builds_the_teacher_summary(main_api, db):
+    add_teacher_batches(main_api, teacher_id=1, batch_count=3, approved_per_batch=5, fees=1500, student_limit=30)
+    summary = main_api.get_teacher_summary(db, 1)
+    assert (summary.total_batches, summary.approved_count, summary.total_fees) == (3, 15, 4500)
+    assert summary.total_subscription_fees == 3 * 105 * 30
+
+
+def test_concurrent_first_reads_use_the_winning_rows(tmp_path):
+    # A file database, so the other reader's commit is a separate transaction
+    snippets = load_snippets(*MAIN_API_SNIPPETS, url=f"sqlite:///{tmp_path / 'summary.db'}")
+    add_teacher_batches(snippets, teacher_id=1, batch_count=2, approved_per_batch=5)
+    rebuild_teacher_summary = snippets.rebuild_teacher_summary
+
+    def rebuild_losing_the_race(db, teacher_id):
+        # The other reader commits its rows between our miss and our insert
+        other = snippets.session()
+        try:
+            rebuild_teacher_summary(other, teacher_id)
+            other.commit()
+        finally:
+            other.close()
+        _, teacher_summary = snippets._compute_teacher_summaries(db, teacher_id)
+        db.add(snippets.models.TeacherSubscriptionSummary(**teacher_summary))
+        db.flush()
+
+    snippets["rebuild_teacher_summary"] = rebuild_losing_the_race
+    db = snippets.session()
+    try:
+        summary = snippets.get_teacher_summary(db, 1)
+        assert (summary.total_batches, summary.approved_count) == (2, 10)
+        assert db.query(snippets.models.BatchSubscriptionSummary).count() == 2
+    finally:
+        db.close()
+        snippets.engine.dispose()
+
+
+def test_hooks_keep_the_summary_in_step(main_api, db):
+    batch_ids = add_teacher_batches(main_api, teacher_id=1, batch_count=2, approved_per_batch=5)
+    main_api.get_teacher_summary(db, 1)
+    models = main_api.models
+
+    _approve(main_api, db, batch_ids[0], 100)
+    assert main_api.drain_subscription_events(db) == 1
+
+    batch = models.Batch(name="New", fees=3000, student_limit=40, teacher_id=1)
+    db.add(batch)
+    db.flush()
+    main_api.record_batch_change(db, batch)
+    db.commit()
+
+    main_api.record_batch_deleted(db, batch_ids[1], 1)
+    db.query(models.BatchStudent).filter(models.BatchStudent.batch_id == batch_ids[1]).delete()
+    db.query(models.Batch).filter(models.Batch.id == batch_ids[1]).delete()
+    db.commit()
+    main_api.drain_subscription_events(db)
+
+    db.expire_all()
+    summary = db.get(models.TeacherSubscriptionSummary, 1)
+    assert (summary.total_batches, summary.approved_count, summary.total_fees) == (2, 6, 4500)
+    assert main_api.reconcile_subscription_summaries(db, repair=False)["mismatch_count"] == 0
+
+
+def test_reconcile_reports_and_repairs_drift(main_api, db):
+    add_teacher_batches(main_api, teacher_id=1, batch_count=2, approved_per_batch=5)
+    add_teacher_batches(main_api, teacher_id=2, batch_count=1, approved_per_batch=1)
+    main_api.get_teacher_summary(db, 1)
+    main_api.get_teacher_summary(db, 2)
+    models = main_api.models
+
+    drifted = db.get(models.TeacherSubscriptionSummary, 1)
+    drifted.approved_count = 99
+    db.commit()
+
+    report = main_api.reconcile_subscription_summaries(db, repair=False)
+    assert (report["teachers_checked"], report["mismatch_count"]) == (2, 1)
+    assert report["mismatches"][0]["teacher_id"] == 1
+    assert report["mismatches"][0]["stored"]["approved_count"] == 99
+    db.expire_all()
+    assert db.get(models.TeacherSubscriptionSummary, 1).approved_count == 99
+
+    assert main_api.reconcile_subscription_summaries(db)["mismatch_count"] == 1
+    db.expire_all()
+    assert db.get(models.TeacherSubscriptionSummary, 1).approved_count == 10
+    assert main_api.reconcile_subscription_summaries(db)["mismatch_count"] == 0
+
+
+def test_reconciler_runs_at_the_configured_hour(main_api):
+    main_api["SUMMARY_RECONCILE_HOUR"] = 3
+    assert main_api._seconds_until_reconcile(datetime(2026, 1, 1, 2, 30)) == 30 * 60
+    assert main_api._seconds_until_reconcile(datetime(2026, 1, 1, 3, 0)) == 24 * 3600
+
+
+@pytest.mark.parametrize("enabled", [False, True])
+def test_reconciler_is_started_only_when_enabled(main_api, enabled):
+    main_api["SUMMARY_RECONCILE_ENABLED"] = enabled
+
+    async def start():
+        before = asyncio.all_tasks()
+        await main_api.start_summary_reconciler()
+        started = asyncio.all_tasks() - before
+        for task in started:
+            task.cancel()
+        return len(started)
+
+    assert asyncio.run(start()) == int(enabled)
+
+
+def test_billing_due_dates_roll_into_the_summaries(main_api, db):
+    batch_ids = add_teacher_batches(main_api, teacher_id=1, batch_count=2, with_subscriptions=True)
+    main_api.get_teacher_summary(db, 1)
+    models = main_api.models
+    db.query(models.TeacherSubscription).filter(models.TeacherSubscription.batch_id == batch_ids[0]).update(
+        {"next_billing_date": date(2030, 1, 1)}
+    )
+    db.query(models.TeacherSubscription).filter(models.TeacherSubscription.batch_id == batch_ids[1]).update(
+        {"next_billing_date": date(2030, 2, 1)}
+    )
+    main_api.refresh_summary_due_dates(db, batch_ids)
+    db.commit()
+
+    db.expire_all()
+    assert db.get(models.TeacherSubscriptionSummary, 1).next_due_date == date(2030, 1, 1)
+    assert db.get(models.BatchSubscriptionSummary, batch_ids[1]).next_due_date == date(2030, 2, 1)